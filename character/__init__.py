@@ -2,7 +2,17 @@
 Character management modules.
 """
 
-from .dnd_character_agent import create_agent, character_data, _generate_character_sheet
+__all__ = [
+    'create_agent', 'character_data', '_generate_character_sheet',
+    'agenerate_character_sheets', 'generate_character_sheets', 'update_character',
+    'abuild_character_oneshot', 'astream_character_sheet', 'use_character'
+]
 
-__all__ = ['create_agent', 'character_data', '_generate_character_sheet']
 
+def __getattr__(name):
+    # Import the agent module on first attribute access (PEP 562) so that
+    # `import character` doesn't pay for it up front
+    if name in __all__:
+        from . import dnd_character_agent
+        return getattr(dnd_character_agent, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,147 @@
+"""
+Offline bulk character generation through the OpenAI Batch API.
+
+Every spec becomes one self-contained chat completion: the PHB rule data is
+inlined into the prompt and the model only returns the character's choices
+as JSON, so no tool calls are needed. The choices are then applied locally
+with the regular character tools, which keeps the rules (ability score
+increases, HP, AC, proficiencies...) exactly as the interactive agent
+computes them. Batch requests cost half as much as real-time calls and do
+not count against the per-minute rate limits.
+"""
+
+import io
+import time
+from typing import Any, Dict, Iterator, List
+
+import orjson
+
+from character import dnd_character_agent as agent
+
+
+# Batch jobs that ended without producing (more) output
+_TERMINAL_STATUSES = ("failed", "expired", "cancelled")
+
+
+def build_batch_requests(specs: List[Any], model: str = "gpt-4o-mini") -> List[Dict[str, Any]]:
+    """
+    Build one Batch API request line per spec.
+
+    Args:
+        specs: Character requests, either free text or dicts of choices.
+               A dict may carry an "id" used as the request's custom_id.
+        model: Chat model to run the batch on
+
+    Returns:
+        A list of request dicts ready to be written as JSONL.
+    """
+    requests = []
+    for i, spec in enumerate(specs):
+        custom_id = spec.get("id") if isinstance(spec, dict) else None
+        requests.append({
+            "custom_id": str(custom_id or f"character-{i}"),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "temperature": 0.7,
+                "response_format": agent.CHOICES_RESPONSE_FORMAT,
+                "messages": [
+                    {"role": "system", "content": agent._ONESHOT_PROMPT},
+                    {"role": "user", "content": agent._spec_text(spec)}
+                ]
+            }
+        })
+    return requests
+
+
+def _get_client(client=None):
+    """Return the given OpenAI client or create one from OPENAI_API_KEY."""
+    if client is not None:
+        return client
+    from openai import OpenAI
+
+    return OpenAI(api_key=agent._openai_api_key())
+
+
+def submit_character_batch(specs: List[Any], model: str = "gpt-4o-mini", client=None) -> str:
+    """
+    Upload the requests for `specs` and start a batch job.
+
+    Returns:
+        The batch ID, to be passed to iter_batch_results.
+    """
+    client = _get_client(client)
+    jsonl = "\n".join(agent._dumps(r) for r in build_batch_requests(specs, model))
+    input_file = client.files.create(
+        file=("characters.jsonl", io.BytesIO(jsonl.encode("utf-8"))),
+        purpose="batch"
+    )
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+
+def _parse_output_line(line: str) -> Dict[str, Any]:
+    """Parse one line of a batch output file into a result dict."""
+    record = orjson.loads(line)
+    result = {"custom_id": record["custom_id"]}
+    response = record.get("response") or {}
+    if record.get("error") or response.get("status_code") != 200:
+        result["error"] = record.get("error") or response.get("body")
+        return result
+    try:
+        choices = agent._parse_choices(response["body"]["choices"][0]["message"]["content"])
+        character = agent.apply_character_choices(choices)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        result["error"] = f"Could not parse character: {e}"
+        return result
+    result["character_data"] = character
+    result["character_sheet"] = agent._generate_character_sheet(character)
+    return result
+
+
+def iter_batch_results(batch_id: str, client=None, poll_interval: float = 5.0,
+                       max_poll_interval: float = 300.0) -> Iterator[Dict[str, Any]]:
+    """
+    Wait for a batch job to finish and yield its parsed characters.
+
+    Polls with exponential backoff (doubling up to `max_poll_interval`).
+
+    Yields:
+        Dicts with "custom_id" plus either "character_data" and
+        "character_sheet", or "error".
+    """
+    client = _get_client(client)
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status == "completed" or batch.status in _TERMINAL_STATUSES:
+            break
+        time.sleep(poll_interval)
+        poll_interval = min(poll_interval * 2, max_poll_interval)
+
+    if batch.status != "completed" and not (batch.output_file_id or batch.error_file_id):
+        raise RuntimeError(f"Batch {batch_id} ended with status '{batch.status}'")
+
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if line.strip():
+                yield _parse_output_line(line)
+
+
+def generate_character_sheets_batch_file(specs: List[Any], model: str = "gpt-4o-mini",
+                                         client=None, poll_interval: float = 5.0) -> Iterator[Dict[str, Any]]:
+    """
+    Generate many characters offline through the Batch API.
+
+    Submits one request per spec, waits for the job (this can take up to the
+    24h completion window) and yields each parsed character.
+    """
+    client = _get_client(client)
+    batch_id = submit_character_batch(specs, model=model, client=client)
+    yield from iter_batch_results(batch_id, client=client, poll_interval=poll_interval)
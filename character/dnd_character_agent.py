@@ -6,573 +6,64 @@ complete D&D 5e characters following Player's Handbook (PHB) rules only.
 """
 
 import os
-from dotenv import load_dotenv
-import random
+import asyncio
+import functools
 import json
-from typing import Dict, List, Optional, Tuple, Any
-from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_tools_agent
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.tools import tool
-from langchain_core.messages import HumanMessage, AIMessage
+import random
+import re
+import sys
+import threading
+import contextlib
+import hashlib
+import logging
+import warnings
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, List, Literal, Mapping, Optional, Tuple, TypedDict
+import fastjsonschema
+import numpy as np
+import orjson
+
+from character.prompt_compress import CSV_LEGEND, to_csv, flatten_subtables
+
+logger = logging.getLogger(__name__)
+
+# LangChain/OpenAI, dotenv and aiolimiter are imported lazily where used so the
+# rule data, calculators and sheet generator can be used without the LLM stack
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.tools import BaseTool
+
+
+def _dumps(obj: Any, sort_keys: bool = False) -> str:
+    """Serialize to compact JSON text with orjson.
+    
+    Non-string keys (e.g. class feature levels) are converted to strings,
+    read-only mappings and sets are serialized as objects and sorted lists,
+    and other unknown types fall back to str(). Use sort_keys for output that is used
+    as a cache key.
+    """
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=_json_default, option=option).decode()
+
 
-load_dotenv()
+def _json_default(obj: Any) -> Any:
+    """orjson fallback: read-only mappings as objects, sets as sorted lists."""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    return str(obj)
 
 # ============================================================================
 # PHB RULE DATA (Player's Handbook Only)
 # ============================================================================
 
-# PHB Classes with their features
-# Contains all 12 core classes from D&D 5e Player's Handbook with:
-# - Hit dice, saving throw proficiencies, skill choices
-# - Starting equipment options
-# - Class features by level
-PHB_CLASSES = {
-    "Barbarian": {
-        "hit_die": "d12",
-        "saving_throws": ["Strength", "Constitution"],
-        "skill_choices": 2,
-        "skills": ["Animal Handling", "Athletics", "Intimidation", "Nature", "Perception", "Survival"],
-        "armor": ["Light armor", "Medium armor", "Shields"],
-        "weapons": ["Simple weapons", "Martial weapons"],
-        "tools": [],
-        "starting_equipment": {
-            "options": [
-                "(a) a greataxe or (b) any martial melee weapon",
-                "(a) two handaxes or (b) any simple weapon",
-                "An explorer's pack and four javelins"
-            ]
-        },
-        "features": {
-            1: ["Rage", "Unarmored Defense"],
-            2: ["Reckless Attack", "Danger Sense"],
-            3: ["Primal Path", "Primal Knowledge"],
-        }
-    },
-    "Bard": {
-        "hit_die": "d8",
-        "saving_throws": ["Dexterity", "Charisma"],
-        "skill_choices": 3,
-        "skills": ["Athletics", "Acrobatics", "Sleight of Hand", "Stealth", "Arcana", "History", "Investigation", "Nature", "Religion", "Animal Handling", "Insight", "Medicine", "Perception", "Survival", "Deception", "Intimidation", "Performance", "Persuasion"],
-        "armor": ["Light armor"],
-        "weapons": ["Simple weapons", "Hand crossbows", "Longswords", "Rapiers", "Shortswords"],
-        "tools": ["Three musical instruments of your choice"],
-        "starting_equipment": {
-            "options": [
-                "(a) a rapier, (b) a longsword, or (c) any simple weapon",
-                "(a) a diplomat's pack or (b) an entertainer's pack",
-                "(a) a lute or (b) any other musical instrument",
-                "Leather armor and a dagger"
-            ]
-        },
-        "features": {
-            1: ["Spellcasting", "Bardic Inspiration (d6)"],
-            2: ["Jack of All Trades", "Song of Rest (d6)"],
-            3: ["Bard College", "Expertise"],
-        }
-    },
-    "Cleric": {
-        "hit_die": "d8",
-        "saving_throws": ["Wisdom", "Charisma"],
-        "skill_choices": 2,
-        "skills": ["History", "Insight", "Medicine", "Persuasion", "Religion"],
-        "armor": ["Light armor", "Medium armor", "Shields"],
-        "weapons": ["Simple weapons"],
-        "tools": [],
-        "starting_equipment": {
-            "options": [
-                "(a) a mace or (b) a warhammer (if proficient)",
-                "(a) scale mail, (b) leather armor, or (c) chain mail (if proficient)",
-                "(a) a light crossbow and 20 bolts or (b) any simple weapon",
-                "(a) a priest's pack or (b) an explorer's pack",
-                "A shield and a holy symbol"
-            ]
-        },
-        "features": {
-            1: ["Spellcasting", "Divine Domain"],
-            2: ["Channel Divinity (1/rest)", "Divine Domain feature"],
-        }
-    },
-    "Druid": {
-        "hit_die": "d8",
-        "saving_throws": ["Intelligence", "Wisdom"],
-        "skill_choices": 2,
-        "skills": ["Arcana", "Animal Handling", "Insight", "Medicine", "Nature", "Perception", "Religion", "Survival"],
-        "armor": ["Light armor", "Medium armor", "Shields (nonmetal)"],
-        "weapons": ["Clubs", "Daggers", "Darts", "Javelins", "Maces", "Quarterstaffs", "Scimitars", "Sickles", "Slings", "Spears"],
-        "tools": ["Herbalism kit"],
-        "starting_equipment": {
-            "options": [
-                "(a) a wooden shield or (b) any simple weapon",
-                "(a) a scimitar or (b) any simple melee weapon",
-                "Leather armor, an explorer's pack, and a druidic focus"
-            ]
-        },
-        "features": {
-            1: ["Spellcasting", "Druidic"],
-            2: ["Wild Shape", "Druid Circle"],
-        }
-    },
-    "Fighter": {
-        "hit_die": "d10",
-        "saving_throws": ["Strength", "Constitution"],
-        "skill_choices": 2,
-        "skills": ["Acrobatics", "Animal Handling", "Athletics", "History", "Insight", "Intimidation", "Perception", "Survival"],
-        "armor": ["All armor", "Shields"],
-        "weapons": ["Simple weapons", "Martial weapons"],
-        "tools": [],
-        "starting_equipment": {
-            "options": [
-                "(a) chain mail or (b) leather armor, longbow, and 20 arrows",
-                "(a) a martial weapon and a shield or (b) a martial weapon and two martial weapons",
-                "(a) a light crossbow and 20 bolts or (b) two handaxes",
-                "(a) a dungeoneer's pack or (b) an explorer's pack"
-            ]
-        },
-        "features": {
-            1: ["Fighting Style", "Second Wind"],
-            2: ["Action Surge (one use)"],
-            3: ["Martial Archetype"],
-        }
-    },
-    "Monk": {
-        "hit_die": "d8",
-        "saving_throws": ["Strength", "Dexterity"],
-        "skill_choices": 2,
-        "skills": ["Acrobatics", "Athletics", "History", "Insight", "Religion", "Stealth"],
-        "armor": [],
-        "weapons": ["Simple weapons", "Shortswords"],
-        "tools": [],
-        "starting_equipment": {
-            "options": [
-                "(a) a shortsword or (b) any simple weapon",
-                "(a) a dungeoneer's pack or (b) an explorer's pack",
-                "10 darts"
-            ]
-        },
-        "features": {
-            1: ["Unarmored Defense", "Martial Arts"],
-            2: ["Ki", "Unarmored Movement"],
-            3: ["Monastic Tradition", "Deflect Missiles"],
-        }
-    },
-    "Paladin": {
-        "hit_die": "d10",
-        "saving_throws": ["Wisdom", "Charisma"],
-        "skill_choices": 2,
-        "skills": ["Athletics", "Insight", "Intimidation", "Medicine", "Persuasion", "Religion"],
-        "armor": ["All armor", "Shields"],
-        "weapons": ["Simple weapons", "Martial weapons"],
-        "tools": [],
-        "starting_equipment": {
-            "options": [
-                "(a) a martial weapon and a shield or (b) two martial weapons",
-                "(a) five javelins or (b) any simple melee weapon",
-                "(a) a priest's pack or (b) an explorer's pack",
-                "Chain mail and a holy symbol"
-            ]
-        },
-        "features": {
-            1: ["Divine Sense", "Lay on Hands"],
-            2: ["Fighting Style", "Spellcasting", "Divine Smite"],
-            3: ["Divine Health", "Sacred Oath"],
-        }
-    },
-    "Ranger": {
-        "hit_die": "d10",
-        "saving_throws": ["Strength", "Dexterity"],
-        "skill_choices": 3,
-        "skills": ["Animal Handling", "Athletics", "Insight", "Investigation", "Nature", "Perception", "Stealth", "Survival"],
-        "armor": ["Light armor", "Medium armor", "Shields"],
-        "weapons": ["Simple weapons", "Martial weapons"],
-        "tools": [],
-        "starting_equipment": {
-            "options": [
-                "(a) scale mail or (b) leather armor",
-                "(a) two shortswords or (b) two simple melee weapons",
-                "(a) a dungeoneer's pack or (b) an explorer's pack",
-                "A longbow and a quiver of 20 arrows"
-            ]
-        },
-        "features": {
-            1: ["Favored Enemy", "Natural Explorer"],
-            2: ["Fighting Style", "Spellcasting"],
-            3: ["Ranger Archetype", "Primeval Awareness"],
-        }
-    },
-    "Rogue": {
-        "hit_die": "d8",
-        "saving_throws": ["Dexterity", "Intelligence"],
-        "skill_choices": 4,
-        "skills": ["Acrobatics", "Athletics", "Deception", "Insight", "Intimidation", "Investigation", "Perception", "Performance", "Persuasion", "Sleight of Hand", "Stealth"],
-        "armor": ["Light armor"],
-        "weapons": ["Simple weapons", "Hand crossbows", "Longswords", "Rapiers", "Shortswords"],
-        "tools": ["Thieves' tools"],
-        "starting_equipment": {
-            "options": [
-                "(a) a rapier or (b) a shortsword",
-                "(a) a shortbow and quiver of 20 arrows or (b) a shortsword",
-                "(a) a burglar's pack, (b) a dungeoneer's pack, or (c) an explorer's pack",
-                "Leather armor, two daggers, and thieves' tools"
-            ]
-        },
-        "features": {
-            1: ["Expertise", "Sneak Attack (1d6)", "Thieves' Cant"],
-            2: ["Cunning Action"],
-            3: ["Roguish Archetype"],
-        }
-    },
-    "Sorcerer": {
-        "hit_die": "d6",
-        "saving_throws": ["Constitution", "Charisma"],
-        "skill_choices": 2,
-        "skills": ["Arcana", "Deception", "Insight", "Intimidation", "Persuasion", "Religion"],
-        "armor": [],
-        "weapons": ["Daggers", "Darts", "Slings", "Quarterstaffs", "Light crossbows"],
-        "tools": [],
-        "starting_equipment": {
-            "options": [
-                "(a) a light crossbow and 20 bolts or (b) any simple weapon",
-                "(a) a component pouch or (b) an arcane focus",
-                "(a) a dungeoneer's pack or (b) an explorer's pack",
-                "Two daggers"
-            ]
-        },
-        "features": {
-            1: ["Spellcasting", "Sorcerous Origin"],
-            2: ["Font of Magic"],
-            3: ["Metamagic"],
-        }
-    },
-    "Warlock": {
-        "hit_die": "d8",
-        "saving_throws": ["Wisdom", "Charisma"],
-        "skill_choices": 2,
-        "skills": ["Arcana", "Deception", "History", "Intimidation", "Investigation", "Nature", "Religion"],
-        "armor": ["Light armor"],
-        "weapons": ["Simple weapons"],
-        "tools": [],
-        "starting_equipment": {
-            "options": [
-                "(a) a light crossbow and 20 bolts or (b) any simple weapon",
-                "(a) a component pouch or (b) an arcane focus",
-                "(a) a scholar's pack or (b) a dungeoneer's pack",
-                "Leather armor, any simple weapon, and two daggers"
-            ]
-        },
-        "features": {
-            1: ["Otherworldly Patron", "Pact Magic"],
-            2: ["Eldritch Invocations (2 known)"],
-            3: ["Pact Boon"],
-        }
-    },
-    "Wizard": {
-        "hit_die": "d6",
-        "saving_throws": ["Intelligence", "Wisdom"],
-        "skill_choices": 2,
-        "skills": ["Arcana", "History", "Insight", "Investigation", "Medicine", "Religion"],
-        "armor": [],
-        "weapons": ["Daggers", "Darts", "Slings", "Quarterstaffs", "Light crossbows"],
-        "tools": [],
-        "starting_equipment": {
-            "options": [
-                "(a) a quarterstaff or (b) a dagger",
-                "(a) a component pouch or (b) an arcane focus",
-                "(a) a scholar's pack or (b) an explorer's pack",
-                "A spellbook"
-            ]
-        },
-        "features": {
-            1: ["Spellcasting", "Arcane Recovery"],
-            2: ["Arcane Tradition"],
-        }
-    }
-}
-
-# PHB Backgrounds
-PHB_BACKGROUNDS = {
-    "Acolyte": {
-        "skill_proficiencies": ["Insight", "Religion"],
-        "languages": ["Two of your choice"],
-        "equipment": ["A holy symbol", "A prayer book or prayer wheel", "5 sticks of incense", "Vestments", "A set of common clothes", "A belt pouch containing 15 gp"],
-        "feature": "Shelter of the Faithful",
-        "personality_traits": [
-            "I idolize a particular hero of my faith and constantly refer to that person's deeds and example.",
-            "I can find common ground between the fiercest enemies, empathizing with them and always working toward peace.",
-            "I see omens in every event and action. The gods try to speak to us, we just need to listen.",
-            "Nothing can shake my optimistic attitude.",
-            "I quote (or misquote) sacred texts and proverbs in almost every situation.",
-            "I am tolerant (or intolerant) of other faiths and respect (or condemn) the worship of other gods.",
-            "I've enjoyed fine food, drink, and high society among my temple's elite. Rough living grates on me.",
-            "I've spent so long in the temple that I have little practical experience dealing with people in the outside world."
-        ],
-        "ideals": [
-            "Tradition. The ancient traditions of worship and sacrifice must be preserved and upheld. (Lawful)",
-            "Charity. I always try to help those in need, no matter what the personal cost. (Good)",
-            "Change. We must help bring about the changes the gods are constantly working in the world. (Chaotic)",
-            "Power. I hope to one day rise to the top of my faith's religious hierarchy. (Lawful)",
-            "Faith. I trust that my deity will guide my actions. I have faith that if I work hard, things will go well. (Lawful)",
-            "Aspiration. I seek to prove myself worthy of my god's favor by matching my actions against their teachings. (Any)"
-        ],
-        "bonds": [
-            "I would die to recover an ancient relic of my faith that was lost long ago.",
-            "I will someday get revenge on the corrupt temple hierarchy who branded me a heretic.",
-            "I owe my life to the priest who took me in when my parents died.",
-            "Everything I do is for the common people.",
-            "I will do anything to protect the temple where I served.",
-            "I seek to preserve a sacred text that my enemies consider heretical and seek to destroy."
-        ],
-        "flaws": [
-            "I judge others harshly, and myself even more severely.",
-            "I put too much trust in those who wield power within my temple's hierarchy.",
-            "My piety sometimes leads me to blindly trust those that profess faith in my god.",
-            "I am inflexible in my thinking.",
-            "I am suspicious of strangers and expect the worst of them.",
-            "Once I pick a goal, I become obsessed with it to the detriment of everything else in my life."
-        ]
-    },
-    "Criminal": {
-        "skill_proficiencies": ["Deception", "Stealth"],
-        "tool_proficiencies": ["One type of gaming set", "Thieves' tools"],
-        "equipment": ["A crowbar", "A set of dark common clothes including a hood", "A belt pouch containing 15 gp"],
-        "feature": "Criminal Contact",
-        "personality_traits": [
-            "I always have a plan for what to do when things go wrong.",
-            "I am always calm, no matter what the situation. I never raise my voice or let my emotions control me.",
-            "The first thing I do in a new place is note the locations of everything valuable—or where such things could be hidden.",
-            "I would rather make a new friend than a new enemy.",
-            "I am incredibly slow to trust. Those who seem the fairest often have the most to hide.",
-            "I don't pay attention to the risks in a situation. Never tell me the odds.",
-            "The best way to get me to do something is to tell me I can't do it.",
-            "I blow up at the slightest insult."
-        ],
-        "ideals": [
-            "Honor. I don't steal from others in the trade. (Lawful)",
-            "Freedom. Chains are meant to be broken, as are those who would forge them. (Chaotic)",
-            "Charity. I steal from the wealthy so that I can help people in need. (Good)",
-            "Greed. I will do whatever it takes to become wealthy. (Evil)",
-            "People. I'm loyal to my friends, not to any ideals, and everyone else can take a trip down the Styx for all I care. (Neutral)",
-            "Redemption. There's a spark of good in everyone. (Good)"
-        ],
-        "bonds": [
-            "I'm trying to pay off an old debt I owe to a generous benefactor.",
-            "My ill-gotten gains go to support my family.",
-            "Something important was taken from me, and I aim to steal it back.",
-            "I will become the greatest thief that ever lived.",
-            "I'm guilty of a terrible crime. I hope I can redeem myself for it.",
-            "Someone I loved died because of a mistake I made. That will never happen again."
-        ],
-        "flaws": [
-            "When I see something valuable, I can't think about anything but how to steal it.",
-            "When faced with a choice between money and my friends, I usually choose the money.",
-            "If there's a plan, I'll forget it. If I don't forget it, I'll ignore it.",
-            "I have a 'tell' that reveals when I'm lying.",
-            "I turn tail and run when things look bad.",
-            "An innocent person is in prison for a crime that I committed. I'm okay with that."
-        ]
-    },
-    "Folk Hero": {
-        "skill_proficiencies": ["Animal Handling", "Survival"],
-        "tool_proficiencies": ["One type of artisan's tools", "Vehicles (land)"],
-        "equipment": ["A set of artisan's tools (one of your choice)", "A shovel", "An iron pot", "A set of common clothes", "A belt pouch containing 10 gp"],
-        "feature": "Rustic Hospitality",
-        "personality_traits": [
-            "I judge people by their actions, not their words.",
-            "If someone is in trouble, I'm always ready to lend help.",
-            "When I set my mind to something, I follow through no matter what gets in my way.",
-            "I have a strong sense of fair play and always try to find the most equitable solution to arguments.",
-            "I'm confident in my own abilities and do what I can to instill confidence in others.",
-            "Thinking is for other people. I prefer action.",
-            "I misuse long words in an attempt to sound smarter.",
-            "I get bored easily. When am I going to get on with my destiny?"
-        ],
-        "ideals": [
-            "Respect. People deserve to be treated with dignity and respect. (Good)",
-            "Fairness. No one should get preferential treatment before the law, and no one is above the law. (Lawful)",
-            "Freedom. Tyrants must not be allowed to oppress the people. (Chaotic)",
-            "Might. If I become strong, I will take what I want—what I deserve. (Evil)",
-            "Sincerity. There's no good in pretending to be something I'm not. (Neutral)",
-            "Destiny. Nothing and no one can steer me away from my higher calling. (Any)"
-        ],
-        "bonds": [
-            "I have a family, but I have no idea where they are. One day, I hope to see them again.",
-            "I worked the land, I love the land, and I will protect the land.",
-            "A proud noble once gave me a horrible beating, and I will take my revenge on any bully I encounter.",
-            "My tools are symbols of my past life, and I carry them so that I will never forget my roots.",
-            "I protect those who cannot protect themselves.",
-            "I wish my childhood sweetheart had come with me to pursue my destiny."
-        ],
-        "flaws": [
-            "The tyrant who rules my land will stop at nothing to see me killed.",
-            "I'm convinced of the significance of my destiny, and blind to my shortcomings and the risk of failure.",
-            "The people who knew me when I was young know my shameful secret, so I can never go home again.",
-            "I have a weakness for the vices of the city, especially hard drink.",
-            "Secretly, I believe that things would be better if I were a tyrant lording over the land.",
-            "I have trouble trusting in my allies."
-        ]
-    },
-    "Noble": {
-        "skill_proficiencies": ["History", "Persuasion"],
-        "tool_proficiencies": ["One type of gaming set"],
-        "languages": ["One of your choice"],
-        "equipment": ["Fine clothes", "A signet ring", "A scroll of pedigree", "A purse containing 25 gp"],
-        "feature": "Position of Privilege",
-        "personality_traits": [
-            "My eloquent flattery makes everyone I talk to feel like the most wonderful and important person in the world.",
-            "The common folk love me for my kindness and generosity.",
-            "No one could doubt by looking at my regal bearing that I am a cut above the unwashed masses.",
-            "I take great pains to always look my best and follow the latest fashions.",
-            "I don't like to get my hands dirty, and I won't be caught dead in unsuitable accommodations.",
-            "Despite my noble birth, I do not place myself above other folk. We all have the same blood.",
-            "My favor, once lost, is lost forever.",
-            "If you do me an injury, I will crush you, ruin your name, and salt your fields."
-        ],
-        "ideals": [
-            "Respect. Respect is due to me because of my position, but all people regardless of station deserve to be treated with dignity. (Good)",
-            "Responsibility. It is my duty to respect the authority of those above me, just as those below me must respect mine. (Lawful)",
-            "Independence. I must prove that I can handle myself without the coddling of my family. (Chaotic)",
-            "Power. If I can attain more power, no one will tell me what to do. (Evil)",
-            "Family. Blood runs thicker than water. (Any)",
-            "Noble Obligation. It is my duty to protect and care for the people beneath me. (Good)"
-        ],
-        "bonds": [
-            "I will face any challenge to win the approval of my family.",
-            "My house's alliance with another noble family must be sustained at all costs.",
-            "Nothing is more important than the other members of my family.",
-            "I am in love with the heir of a family that my family despises.",
-            "My loyalty to my sovereign is unwavering.",
-            "The common folk must see me as a hero of the people."
-        ],
-        "flaws": [
-            "I secretly believe that everyone is beneath me.",
-            "I hide a truly scandalous secret that could ruin my family forever.",
-            "I too often hear veiled insults and threats in every word addressed to me, and I'm quick to anger.",
-            "I have an insatiable desire for carnal pleasures.",
-            "In fact, the world does revolve around me.",
-            "By my words and actions, I often bring shame to my family."
-        ]
-    },
-    "Sage": {
-        "skill_proficiencies": ["Arcana", "History"],
-        "languages": ["Two of your choice"],
-        "equipment": ["A bottle of black ink", "A quill", "A small knife", "A letter from a dead colleague posing a question you have not yet been able to answer", "A set of common clothes", "A belt pouch containing 10 gp"],
-        "feature": "Researcher",
-        "personality_traits": [
-            "I use polysyllabic words that convey the impression of great erudition.",
-            "I've read every book in the world's greatest libraries—or I like to boast that I have.",
-            "I'm used to helping out those who aren't as smart as I am, and I patiently explain anything and everything to others.",
-            "There's nothing I like more than a good mystery.",
-            "I'm willing to listen to every side of an argument before I make my own judgment.",
-            "I... speak... slowly... when talking... to idiots... which... almost... everyone... is... compared... to me.",
-            "I am horribly, horribly awkward in social situations.",
-            "I'm convinced that people are always trying to steal my secrets."
-        ],
-        "ideals": [
-            "Knowledge. The path to power and self-improvement is through knowledge. (Neutral)",
-            "Beauty. What is beautiful points us beyond itself toward what is true. (Good)",
-            "Logic. Emotions must not cloud our logical thinking. (Lawful)",
-            "No Limits. Nothing should fetter the infinite possibility inherent in all existence. (Chaotic)",
-            "Power. Knowledge is the path to power and domination. (Evil)",
-            "Self-Improvement. The goal of a life of study is the betterment of oneself. (Any)"
-        ],
-        "bonds": [
-            "It is my duty to protect my students.",
-            "I have an ancient text that holds terrible secrets that must not fall into the wrong hands.",
-            "I work to preserve a library, university, scriptorium, or monastery.",
-            "My life's work is a series of tomes related to a specific field of lore.",
-            "I've been searching my whole life for the answer to a certain question.",
-            "I sold my soul for knowledge. I hope to do great deeds and win it back."
-        ],
-        "flaws": [
-            "I am easily distracted by the promise of information.",
-            "Most people scream and run when they see a demon. I stop and take notes on its anatomy.",
-            "Unlocking an ancient mystery is worth the price of a civilization.",
-            "I overlook obvious solutions in favor of complicated ones.",
-            "I speak without really thinking through my words, invariably insulting others.",
-            "I can't keep a secret to save my life, or anyone else's."
-        ]
-    },
-    "Soldier": {
-        "skill_proficiencies": ["Athletics", "Intimidation"],
-        "tool_proficiencies": ["One type of gaming set", "Vehicles (land)"],
-        "equipment": ["An insignia of rank", "A trophy taken from a fallen enemy", "A set of bone dice or deck of cards", "A set of common clothes", "A belt pouch containing 10 gp"],
-        "feature": "Military Rank",
-        "personality_traits": [
-            "I'm always polite and respectful.",
-            "I'm haunted by memories of war. I can't get the images of violence out of my mind.",
-            "I've lost too many friends, and I'm slow to make new ones.",
-            "I'm full of inspiring and cautionary tales from my military experience relevant to almost every combat situation.",
-            "I can stare down a hell hound without flinching.",
-            "I enjoy being strong and like breaking things.",
-            "I have a crude sense of humor.",
-            "I face problems head-on. A simple, direct solution is the best path to success."
-        ],
-        "ideals": [
-            "Greater Good. Our lot is to lay down our lives in defense of others. (Good)",
-            "Responsibility. I do what I must and obey just authority. (Lawful)",
-            "Independence. When people follow orders blindly, they embrace a kind of tyranny. (Chaotic)",
-            "Might. In life as in war, the stronger force wins. (Evil)",
-            "Live and Let Live. Ideals aren't worth killing over or going to war for. (Neutral)",
-            "Nation. My city, nation, or people are all that matter. (Any)"
-        ],
-        "bonds": [
-            "I would still lay down my life for the people I served with.",
-            "Someone saved my life on the battlefield. To this day, I will never leave a friend behind.",
-            "My honor is my life.",
-            "I'll never forget the crushing defeat my company suffered or the enemies who dealt it.",
-            "Those who fight beside me are those worth dying for.",
-            "I fight for those who cannot fight for themselves."
-        ],
-        "flaws": [
-            "The monstrous enemy we faced in battle still leaves me quivering with fear.",
-            "I have little respect for anyone who is not a proven warrior.",
-            "I made a terrible mistake in battle that cost many lives—and I would do anything to keep that mistake secret.",
-            "My hatred of my enemies is blind and unreasoning.",
-            "I obey the law, even if the law causes misery.",
-            "I'd rather eat my armor than admit when I'm wrong."
-        ]
-    },
-    "Urchin": {
-        "skill_proficiencies": ["Sleight of Hand", "Stealth"],
-        "tool_proficiencies": ["Disguise kit", "Thieves' tools"],
-        "equipment": ["A small knife", "A map of the city you grew up in", "A pet mouse", "A token to remember your parents by", "A set of common clothes", "A belt pouch containing 10 gp"],
-        "feature": "City Secrets",
-        "personality_traits": [
-            "I hide scraps of food and trinkets away in my pockets.",
-            "I ask a lot of questions.",
-            "I like to squeeze into small places where no one else can get to me.",
-            "I sleep with my back to a wall or tree, with everything I own wrapped in a bundle in my arms.",
-            "I eat like a pig and have bad manners.",
-            "I think anyone who's nice to me is hiding evil intent.",
-            "I don't like to bathe.",
-            "I bluntly say what other people are hinting at or hiding."
-        ],
-        "ideals": [
-            "Respect. All people, rich or poor, deserve respect. (Good)",
-            "Community. We have to take care of each other, because no one else is going to do it. (Lawful)",
-            "Change. The low are lifted up, and the high and mighty are brought down. Change is the nature of things. (Chaotic)",
-            "Retribution. The rich need to be shown what life and death are like in the gutters. (Evil)",
-            "People. I help the people who help me—that's what keeps us alive. (Neutral)",
-            "Aspiration. I'm going to prove that I'm worthy of a better life. (Any)"
-        ],
-        "bonds": [
-            "My town or city is my home, and I'll fight to defend it.",
-            "I sponsor an orphanage to keep others from enduring what I was forced to endure.",
-            "I owe my survival to another urchin who taught me to live on the streets.",
-            "I owe a debt I can never repay to the person who took pity on me.",
-            "I escaped my life of poverty by robbing an important person, and I'm wanted for it.",
-            "No one else should have to endure the hardships I've been through."
-        ],
-        "flaws": [
-            "If I'm outnumbered, I will run away from a fight.",
-            "Gold seems like a lot of money to me, and I'll do just about anything for more of it.",
-            "I will never fully trust anyone other than myself.",
-            "I'd rather kill someone in their sleep than fight fair.",
-            "It's not stealing if I need it more than someone else.",
-            "People who can't take care of themselves get what they deserve."
-        ]
-    }
-}
+# PHB Classes (hit dice, proficiencies, starting equipment, features by level)
+# and Backgrounds live in the pure data module phb_data
+from character.phb_data import BACKGROUND_DEFS, CLASS_DEFS, PHB_CLASSES, PHB_BACKGROUNDS, SKILL_NAMES, freeze, intern_strings
 
 # PHB Species (Races) with ability score increases and traits
 PHB_SPECIES = {
@@ -689,13 +180,105 @@ ALIGNMENTS = [
     "Lawful Evil", "Neutral Evil", "Chaotic Evil"
 ]
 
+# Interned (one str object per name, shared with the class and background
+# tables) and deeply read-only like them
+PHB_SPECIES = freeze(intern_strings(PHB_SPECIES))
+ALIGNMENTS = freeze(intern_strings(ALIGNMENTS))
+# Hashed membership for validation; ALIGNMENTS keeps the display order
+_ALIGNMENTS_SET = frozenset(ALIGNMENTS)
+
+# Pre-serialized rule data
+# Tool responses and prompts reuse these compact JSON strings instead of
+# re-serializing the same nested dicts on every request.
+_PHB_TABLES = {
+    "classes": PHB_CLASSES,
+    "backgrounds": PHB_BACKGROUNDS,
+    "species": PHB_SPECIES
+}
+_PHB_JSON = {
+    table: _dumps(data)
+    for table, data in _PHB_TABLES.items()
+}
+_PHB_ENTRY_JSON = {
+    table: {name: _dumps(entry) for name, entry in data.items()}
+    for table, data in _PHB_TABLES.items()
+}
+# CSV encodings for tables embedded in prompts (about half the tokens of the
+# JSON); subspecies become rows of their own with a "species" parent column
+_PHB_CSV = {
+    "classes": to_csv(PHB_CLASSES),
+    "backgrounds": to_csv(PHB_BACKGROUNDS),
+    "species": to_csv(flatten_subtables(PHB_SPECIES, "subspecies", "species"))
+}
+
+
+
+def get_class(name: str) -> str:
+    """Return the pre-serialized JSON for a PHB class."""
+    return _PHB_ENTRY_JSON["classes"][name]
+
+
+def get_background(name: str) -> str:
+    """Return the pre-serialized JSON for a PHB background."""
+    return _PHB_ENTRY_JSON["backgrounds"][name]
+
+
+def get_species(name: str) -> str:
+    """Return the pre-serialized JSON for a PHB species."""
+    return _PHB_ENTRY_JSON["species"][name]
+
 # ============================================================================
 # CHARACTER DATA MODEL
 # ============================================================================
 
-# Global character data structure (used by agent tools)
-# This stores the current character being created in a session
-character_data: Dict[str, Any] = {
+# Static shape of a character record (functional syntax: "class" is a keyword)
+CharacterDict = TypedDict("CharacterDict", {
+    "name": Optional[str],
+    "class": Optional[str],
+    "level": int,
+    "species": Optional[str],
+    "subspecies": Optional[str],
+    "background": Optional[str],
+    "alignment": Optional[str],
+    "experience_points": int,
+    "ability_scores": Dict[str, Optional[int]],
+    "ability_modifiers": Dict[str, Optional[int]],
+    "saving_throw_proficiencies": List[str],
+    "skill_proficiencies": List[str],
+    "armor_proficiencies": List[str],
+    "weapon_proficiencies": List[str],
+    "tool_proficiencies": List[str],
+    "language_proficiencies": List[str],
+    "passive_perception": Optional[int],
+    "passive_investigation": Optional[int],
+    "passive_insight": Optional[int],
+    "armor_class": Optional[int],
+    "initiative": Optional[int],
+    "speed": Optional[int],
+    "hit_points": Optional[int],
+    "hit_dice": Optional[str],
+    "equipment": List[str],
+    "personality_trait": Optional[str],
+    "ideal": Optional[str],
+    "bond": Optional[str],
+    "flaw": Optional[str],
+    "background_feature": Optional[str],
+    "class_features": List[str],
+    "subclass": Optional[str],
+    "species_traits": List[str],
+    "age": Optional[int],
+    "height": Optional[str],
+    "weight": Optional[str],
+    "eyes": Optional[str],
+    "skin": Optional[str],
+    "hair": Optional[str],
+    "backstory": Optional[str],
+    "generation_method": Optional[str],
+    "species_increases_applied": bool
+})
+
+# Empty character record; copied for every new character
+_EMPTY_CHARACTER: CharacterDict = {
     "name": None,
     "class": None,
     "level": 1,
@@ -750,9 +333,206 @@ character_data: Dict[str, Any] = {
     "skin": None,
     "hair": None,
     "backstory": None,
-    "generation_method": None
+    "generation_method": None,
+    # Whether ability_scores already include the species' increases
+    "species_increases_applied": False
 }
 
+
+# Template fields holding a mutable dict or list, which each record needs
+# its own copy of
+_MUTABLE_FIELDS = tuple(k for k, v in _EMPTY_CHARACTER.items() if isinstance(v, (dict, list)))
+
+
+def new_character_data() -> CharacterDict:
+    """Return a fresh, empty character record.
+    
+    Copies the template's top-level dict (already sized for every field, so
+    no incremental resizes) and gives each mutable field its own copy;
+    cheaper than a deepcopy walk.
+    """
+    record = _EMPTY_CHARACTER.copy()
+    for field in _MUTABLE_FIELDS:
+        record[field] = _EMPTY_CHARACTER[field].copy()
+    return record
+
+
+# Character record bound to the current context. Every CharacterAgent owns
+# a record and binds it for its turns; concurrent builds (see
+# agenerate_character_sheets) each bind their own. asyncio tasks and the
+# executor threads LangChain runs sync tools in both inherit the binding.
+_current_character: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_character", default=None)
+
+# Record the tools use when called outside any binding (e.g. from a script)
+_default_character: Dict[str, Any] = new_character_data()
+
+# Most recently bound record, only kept for the deprecated `character_data`
+_last_character: Dict[str, Any] = _default_character
+
+
+# Bumped by every update_character call, so a rendered sheet can tell
+# whether any record changed since
+_character_version = 0
+
+# Last sheet rendered for a bound record: (record, version, sheet). One
+# tuple so readers never see a torn entry; holding the record keeps its id
+# from being reused by a new one.
+_sheet_cache: Optional[Tuple[Dict[str, Any], int, str]] = None
+
+
+def _character() -> Dict[str, Any]:
+    """Return the character record tools should read and modify."""
+    data = _current_character.get()
+    return _default_character if data is None else data
+
+
+@contextlib.contextmanager
+def use_character(character: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Bind a character record to the current context for the duration of a block.
+    
+    Tools called inside the block (directly or by an agent) read and modify
+    this record only, so separate sessions never see each other's data.
+    
+    Args:
+        character: Record to bind; a new empty one if omitted
+    
+    Yields:
+        The bound record.
+    """
+    global _last_character
+    if character is None:
+        character = new_character_data()
+    token = _current_character.set(character)
+    _last_character = character
+    try:
+        yield character
+    finally:
+        _current_character.reset(token)
+
+
+def __getattr__(name):
+    # The old module-level `character_data` global is gone; keep the name
+    # working (read-only, most recent session) for existing imports
+    if name == "character_data":
+        warnings.warn(
+            "character_data is deprecated; bind a record with use_character() "
+            "or use CharacterAgent.character",
+            DeprecationWarning,
+            stacklevel=2
+        )
+        return _last_character
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# The six abilities in character sheet order
+ABILITIES = ("Strength", "Dexterity", "Constitution", "Intelligence", "Wisdom", "Charisma")
+
+# JSON Schema for a character record. Types and ranges only: which class,
+# species, etc. are allowed is checked by the tools against the PHB tables,
+# and records loaded from storage may carry extra keys.
+_NULLABLE_STR = {"type": ["string", "null"]}
+_NULLABLE_INT = {"type": ["integer", "null"]}
+_STR_LIST = {"type": "array", "items": {"type": "string"}}
+
+CHAR_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "name": _NULLABLE_STR,
+        "class": _NULLABLE_STR,
+        "level": {"type": "integer", "minimum": 1, "maximum": 20},
+        "species": _NULLABLE_STR,
+        "subspecies": _NULLABLE_STR,
+        "background": _NULLABLE_STR,
+        "alignment": _NULLABLE_STR,
+        "experience_points": {"type": "integer", "minimum": 0},
+        "ability_scores": {
+            "type": "object",
+            "properties": {
+                ability: {"type": ["integer", "null"], "minimum": 1, "maximum": 30}
+                for ability in ABILITIES
+            }
+        },
+        "ability_modifiers": {
+            "type": "object",
+            "properties": {
+                ability: {"type": ["integer", "null"], "minimum": -5, "maximum": 10}
+                for ability in ABILITIES
+            }
+        },
+        "saving_throw_proficiencies": _STR_LIST,
+        "skill_proficiencies": _STR_LIST,
+        "armor_proficiencies": _STR_LIST,
+        "weapon_proficiencies": _STR_LIST,
+        "tool_proficiencies": _STR_LIST,
+        "language_proficiencies": _STR_LIST,
+        "passive_perception": _NULLABLE_INT,
+        "passive_investigation": _NULLABLE_INT,
+        "passive_insight": _NULLABLE_INT,
+        "armor_class": _NULLABLE_INT,
+        "initiative": _NULLABLE_INT,
+        "speed": _NULLABLE_INT,
+        "hit_points": {"type": ["integer", "null"], "minimum": 1},
+        "hit_dice": _NULLABLE_STR,
+        "equipment": _STR_LIST,
+        "personality_trait": _NULLABLE_STR,
+        "ideal": _NULLABLE_STR,
+        "bond": _NULLABLE_STR,
+        "flaw": _NULLABLE_STR,
+        "background_feature": _NULLABLE_STR,
+        "class_features": _STR_LIST,
+        "subclass": _NULLABLE_STR,
+        "species_traits": _STR_LIST,
+        "age": {"type": ["integer", "null"], "minimum": 0},
+        "height": _NULLABLE_STR,
+        "weight": _NULLABLE_STR,
+        "eyes": _NULLABLE_STR,
+        "skin": _NULLABLE_STR,
+        "hair": _NULLABLE_STR,
+        "backstory": _NULLABLE_STR,
+        "generation_method": _NULLABLE_STR,
+        "species_increases_applied": {"type": "boolean"}
+    }
+}
+
+# Compiled once at import; calling it is a plain Python function call
+_validate_character = fastjsonschema.compile(CHAR_SCHEMA)
+
+
+def update_character(**patch) -> Dict[str, Any]:
+    """
+    Validate and apply a set of field updates to the current character.
+
+    The patched fields are checked against CHAR_SCHEMA before anything is
+    written, so a bad value leaves the character unchanged. Only the patch
+    is validated (the schema requires no fields): a record loaded from
+    storage with a legacy out-of-schema value can still be edited, and the
+    bad field fixed, by the tools.
+
+    Ability modifiers are derived state: whenever a patch sets
+    "ability_scores", "ability_modifiers" is recomputed from them, so the
+    two can never drift apart. Such a patch also counts as new base scores
+    (species_increases_applied becomes False) unless it sets that flag itself.
+
+    Args:
+        **patch: Top-level character fields to replace
+
+    Returns:
+        The updated character record.
+
+    Raises:
+        fastjsonschema.JsonSchemaValueException: If the patched record is invalid.
+    """
+    global _character_version
+    character = _character()
+    if "ability_scores" in patch:
+        patch["ability_modifiers"] = _ability_modifiers(patch["ability_scores"])
+        patch.setdefault("species_increases_applied", False)
+    _validate_character(patch)
+    character.update(patch)
+    _character_version += 1
+    return character
+
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
@@ -763,6 +543,17 @@ POINT_BUY_COSTS = {
     8: 0, 9: 1, 10: 2, 11: 3, 12: 4, 13: 5, 14: 7, 15: 9
 }
 
+# Same costs indexed by score - 8
+_POINT_BUY_COST = tuple(POINT_BUY_COSTS[score] for score in range(8, 16))
+
+
+def point_buy_cost(score: int) -> Optional[int]:
+    """Point buy cost of a score, or None if it cannot be bought (outside 8-15)."""
+    if isinstance(score, int) and 8 <= score <= 15:
+        return _POINT_BUY_COST[score - 8]
+    return None
+
+
 # Standard array
 STANDARD_ARRAY = [15, 14, 13, 12, 10, 8]
 
@@ -773,64 +564,189 @@ XP_BY_LEVEL = {
     15: 165000, 16: 195000, 17: 225000, 18: 265000, 19: 305000, 20: 355000
 }
 
+# XP needed for each level, ascending (index i -> level i + 1)
+_XP_THRESHOLDS = np.array([XP_BY_LEVEL[level] for level in sorted(XP_BY_LEVEL)], dtype=np.int32)
+
+
+def level_from_xp(xp: int) -> int:
+    """Return the level reached with `xp` experience points (1-20)."""
+    return max(1, int(np.searchsorted(_XP_THRESHOLDS, xp, side="right")))
+
+
+def level_from_xp_batch(xp: np.ndarray) -> np.ndarray:
+    """Vectorized level_from_xp over an array of XP totals."""
+    return np.maximum(np.searchsorted(_XP_THRESHOLDS, xp, side="right"), 1)
+
+
+# Hit die size and average HP per level after the first (rounded up), by class
+_HIT_DIE_BY_CLASS = {name: class_def.hit_die_size for name, class_def in CLASS_DEFS.items()}
+_HP_PER_LEVEL_BY_CLASS = {name: hit_die // 2 + 1 for name, hit_die in _HIT_DIE_BY_CLASS.items()}
+
+# Proficiency bonus by level (index 0 unused)
+_PROF_BONUS = (0, 2, 2, 2, 2, 3, 3, 3, 3, 4, 4, 4, 4, 5, 5, 5, 5, 6, 6, 6, 6)
+
+# Ability modifier for every legal score (0-30)
+_ABILITY_MOD_LUT = tuple((score - 10) // 2 for score in range(31))
+
+
+def _ability_modifiers(scores: Dict[str, Optional[int]]) -> Dict[str, Optional[int]]:
+    """Modifiers for a scores dict; unset (None) scores stay None."""
+    # Not a Numba candidate: six string-keyed lookups per call, so JIT
+    # dispatch and first-call compilation would cost more than the work.
+    # Bulk paths use the packed arrays in character.store instead.
+    return {
+        ability: None if score is None else calculate_ability_modifier(score)
+        for ability, score in scores.items()
+    }
+
+
+# Signed display text of every modifier a legal score can have (-5 to +10)
+_MOD_STR = {mod: f"{mod:+d}" for mod in range(-5, 11)}
+
+
+def format_modifier(mod: int) -> str:
+    """Return a modifier as signed text, e.g. "+2" or "-1"."""
+    text = _MOD_STR.get(mod)
+    return text if text is not None else f"{mod:+d}"
+
 
 def calculate_ability_modifier(score: int) -> int:
     """Calculate the ability modifier for a given ability score.
     
-    Formula: (score - 10) // 2
+    Formula: (score - 10) // 2, read from a table for legal scores (0-30)
     """
+    if 0 <= score < len(_ABILITY_MOD_LUT):
+        return _ABILITY_MOD_LUT[score]
     return (score - 10) // 2
 
 
+# Shared random generator for dice rolls
+_RNG = np.random.default_rng()
+
+
+def roll_ability_scores_batch(n: int = 1) -> np.ndarray:
+    """Roll `n` sets of six ability scores (4d6 drop lowest) in one vectorized call.
+    
+    Draws an n x 6 x 4 block of d6 results, sorts each group of four dice
+    and sums the three highest.
+    
+    Returns:
+        An (n, 6) int array, one row per character.
+    """
+    rolls = _RNG.integers(1, 7, size=(n, 6, 4), dtype=np.int8)
+    rolls.sort(axis=2)
+    return rolls[:, :, 1:].sum(axis=2, dtype=np.int16)
+
+
+# Raw random bits for single die rolls, where numpy's per-call overhead
+# would dominate
+_randbits = random.Random().getrandbits
+
+
+def _roll_d6() -> int:
+    """Roll one d6 from 3 random bits (rejecting 6 and 7 keeps it unbiased)."""
+    value = _randbits(3)
+    while value >= 6:
+        value = _randbits(3)
+    return value + 1
+
+
 def roll_4d6_drop_lowest() -> int:
     """Roll 4d6 and drop the lowest die."""
-    rolls = [random.randint(1, 6) for _ in range(4)]
-    rolls.sort()
-    return sum(rolls[1:])
+    rolls = [_roll_d6(), _roll_d6(), _roll_d6(), _roll_d6()]
+    return sum(rolls) - min(rolls)
+
 
+def roll_ability_score_set() -> List[int]:
+    """Roll six ability scores (4d6 drop lowest each)."""
+    return roll_ability_scores_batch(1)[0].tolist()
 
+
+@functools.lru_cache(maxsize=4096)
 def calculate_hit_points(class_name: str, level: int, constitution_modifier: int) -> Tuple[int, str]:
     """Calculate hit points based on class, level, and Constitution modifier.
     
     First level: max hit die + CON mod
     Subsequent levels: average of hit die (rounded up) + CON mod
     """
-    hit_die_map = {
-        "Barbarian": 12, "Fighter": 10, "Paladin": 10, "Ranger": 10,
-        "Bard": 8, "Cleric": 8, "Druid": 8, "Monk": 8, "Rogue": 8, "Warlock": 8,
-        "Sorcerer": 6, "Wizard": 6
-    }
-    
-    hit_die = hit_die_map.get(class_name, 8)
-    hp_per_level = (hit_die // 2) + 1  # Average rounded up
-    
-    if level == 1:
-        total_hp = hit_die + constitution_modifier
-    else:
-        total_hp = hit_die + constitution_modifier + (hp_per_level * (level - 1))
+    hit_die = _HIT_DIE_BY_CLASS.get(class_name, 8)
+    total_hp = hit_die + constitution_modifier
+    if level > 1:
+        total_hp += _HP_PER_LEVEL_BY_CLASS.get(class_name, 5) * (level - 1)
     
     hit_dice_str = f"{level}d{hit_die}"
     
     return max(1, total_hp), hit_dice_str
 
 
+# PHB armor: canonical name -> (base AC, DEX modifier cap); None = uncapped,
+# 0 = DEX not applied (heavy armor)
+_ARMOR_TABLE: Dict[str, Tuple[int, Optional[int]]] = {
+    # Light
+    "padded": (11, None), "leather": (11, None), "studded leather": (12, None),
+    # Medium
+    "hide": (12, 2), "chain shirt": (13, 2), "scale mail": (14, 2),
+    "breastplate": (14, 2), "half plate": (15, 2),
+    # Heavy
+    "ring mail": (14, 0), "chain mail": (16, 0), "splint": (17, 0), "plate": (18, 0),
+}
+# Short names players use for the same armor
+_ARMOR_TABLE.update({
+    "studded": _ARMOR_TABLE["studded leather"],
+    "scale": _ARMOR_TABLE["scale mail"],
+    "chain": _ARMOR_TABLE["chain mail"],
+})
+
+
 def calculate_armor_class(dexterity_modifier: int, armor: str = None) -> int:
     """Calculate Armor Class.
     
     Default: 10 + DEX mod (unarmored)
-    With armor: depends on armor type (simplified for now)
+    With armor: the armor's base AC plus the DEX mod, capped for medium (+2)
+    and ignored for heavy armor. Unknown armor counts as unarmored.
     """
+    entry = None
     if armor:
-        # Simplified armor calculations
-        if "leather" in armor.lower():
-            return 11 + min(dexterity_modifier, 0)  # Max DEX mod applies
-        elif "chain" in armor.lower() or "scale" in armor.lower():
-            return 16  # No DEX mod for heavy armor
-        elif "studded" in armor.lower():
-            return 12 + min(dexterity_modifier, 0)
-    return 10 + dexterity_modifier
+        name = armor.strip().lower()
+        if name.endswith(" armor"):
+            name = name[:-len(" armor")]
+        entry = _ARMOR_TABLE.get(name)
+    if entry is None:
+        return 10 + dexterity_modifier
+    base, dex_cap = entry
+    if dex_cap is None:
+        return base + dexterity_modifier
+    if dex_cap == 0:  # heavy armor ignores DEX, even a penalty
+        return base
+    return base + min(dexterity_modifier, dex_cap)
+
+
+# One bit per PHB skill / saving throw, for proficiency sets packed into an int
+_SKILL_BIT = {skill: 1 << i for i, skill in enumerate(SKILL_NAMES)}
+_SAVE_BIT = {ability: 1 << i for i, ability in enumerate(ABILITIES)}
+
+
+def proficiency_mask(names: List[str], bits: Dict[str, int] = _SKILL_BIT) -> int:
+    """Pack proficiency names into a bitmask (names outside `bits` are ignored).
+    
+    Merging sets is then `a | b` and "has any of these" is `mask & wanted`.
+    
+    Args:
+        names: Proficiency names, e.g. a record's "skill_proficiencies"
+        bits: _SKILL_BIT (default) or _SAVE_BIT
+    """
+    mask = 0
+    for name in names:
+        mask |= bits.get(name, 0)
+    return mask
+
 
+def has_proficiency(mask: int, name: str, bits: Dict[str, int] = _SKILL_BIT) -> bool:
+    """Test one proficiency in a mask built by proficiency_mask."""
+    return bool(mask & bits.get(name, 0))
 
+
+@functools.lru_cache(maxsize=256)
 def calculate_passive_skill(ability_modifier: int, proficiency_bonus: int, has_proficiency: bool) -> int:
     """Calculate passive skill score (10 + ability mod + proficiency if proficient)."""
     base = 10 + ability_modifier
@@ -841,45 +757,131 @@ def calculate_passive_skill(ability_modifier: int, proficiency_bonus: int, has_p
 
 def get_proficiency_bonus(level: int) -> int:
     """Get proficiency bonus based on level."""
+    if 1 <= level < len(_PROF_BONUS):
+        return _PROF_BONUS[level]
     return 2 + ((level - 1) // 4)
 
 
-def apply_species_ability_increases(base_scores: Dict[str, int], species: str, subspecies: str = None) -> Dict[str, int]:
-    """Apply species ability score increases to base scores."""
-    scores = base_scores.copy()
-    
-    if species not in PHB_SPECIES:
-        return scores
+def _species_asi_totals() -> Dict[Tuple[str, Optional[str]], Dict[str, int]]:
+    """Merge base, species and subspecies ability increases per (species, subspecies)."""
+    totals = {}
+    for species, species_data in PHB_SPECIES.items():
+        species_total: Dict[str, int] = {}
+        for key in ("ability_score_increases_base", "ability_score_increases"):
+            for ability, increase in species_data.get(key, {}).items():
+                species_total[ability] = species_total.get(ability, 0) + increase
+        totals[(species, None)] = species_total
+        for subspecies in species_data.get("subspecies", ()):
+            subspecies_total = dict(species_total)
+            for ability, increase in species_data[subspecies].get("ability_score_increases", {}).items():
+                subspecies_total[ability] = subspecies_total.get(ability, 0) + increase
+            totals[(species, subspecies)] = subspecies_total
+    return totals
+
+
+# Total ability score increases keyed by (species, subspecies or None)
+_SPECIES_ASI_TOTAL = _species_asi_totals()
+
+# Species plus subspecies traits, and species languages, flattened into one
+# tuple of (interned) names per _SPECIES_ASI_TOTAL key
+_SPECIES_TRAITS: Dict[Tuple[str, Optional[str]], Tuple[str, ...]] = {
+    (species, subspecies): PHB_SPECIES[species].get("traits", ())
+    + (PHB_SPECIES[species][subspecies].get("traits", ()) if subspecies else ())
+    for species, subspecies in _SPECIES_ASI_TOTAL
+}
+_SPECIES_LANGUAGES: Dict[str, Tuple[str, ...]] = {
+    species: species_data.get("languages", ()) for species, species_data in PHB_SPECIES.items()
+}
+
+
+def _species_speed(species: str, subspecies: Optional[str]) -> int:
+    """Walking speed of a species row (Wood Elves get +5 ft)."""
+    base_speed = PHB_SPECIES[species].get("speed", 30)
+    if species == "Elf" and subspecies == "Wood Elf":
+        return base_speed + 5
+    return base_speed
+
+
+# Struct-of-arrays view of the species table for bulk generation: one row
+# per (species, subspecies or None) key, in _SPECIES_ASI_TOTAL order
+_ABILITY_IDX = {ability: i for i, ability in enumerate(ABILITIES)}
+_SPECIES_KEYS = tuple(_SPECIES_ASI_TOTAL)
+_SPECIES_ROW = {key: row for row, key in enumerate(_SPECIES_KEYS)}
+_SPECIES_SPEED = np.array([_species_speed(*key) for key in _SPECIES_KEYS], dtype=np.uint8)
+_SPECIES_SIZE = tuple(PHB_SPECIES[species].get("size", "Medium") for species, _ in _SPECIES_KEYS)
+_SPECIES_ASI = np.zeros((len(_SPECIES_KEYS), len(ABILITIES)), dtype=np.int8)
+for _row, _key in enumerate(_SPECIES_KEYS):
+    for _ability, _increase in _SPECIES_ASI_TOTAL[_key].items():
+        _SPECIES_ASI[_row, _ABILITY_IDX[_ability]] = _increase
+del _row, _key, _ability, _increase
+for _array in (_SPECIES_SPEED, _SPECIES_ASI):
+    _array.flags.writeable = False
+del _array
+
+
+def species_row(species: str, subspecies: str = None) -> int:
+    """
+    Index of a species (and subspecies) into the species arrays.
     
-    species_data = PHB_SPECIES[species]
+    An unknown subspecies maps to the species-level row.
     
-    # Apply base increases
-    if "ability_score_increases_base" in species_data:
-        for ability, increase in species_data["ability_score_increases_base"].items():
-            scores[ability] = scores.get(ability, 0) + increase
+    Raises:
+        KeyError: If the species is not a PHB species.
+    """
+    row = _SPECIES_ROW.get((species, subspecies))
+    return row if row is not None else _SPECIES_ROW[(species, None)]
+
+
+def apply_species_ability_increases_batch(base_scores: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Vectorized apply_species_ability_increases for many characters.
     
-    # Apply species-specific increases
-    if "ability_score_increases" in species_data:
-        for ability, increase in species_data["ability_score_increases"].items():
-            scores[ability] = scores.get(ability, 0) + increase
+    Args:
+        base_scores: (n, 6) scores in ABILITIES column order
+        rows: (n,) species rows from species_row()
     
-    # Apply subspecies increases
-    if subspecies and subspecies in species_data:
-        if "ability_score_increases" in species_data[subspecies]:
-            for ability, increase in species_data[subspecies]["ability_score_increases"].items():
-                scores[ability] = scores.get(ability, 0) + increase
+    Returns:
+        A new (n, 6) array of increased scores.
+    """
+    return np.asarray(base_scores) + _SPECIES_ASI[rows]
+
+
+def _species_deltas(species: str, subspecies: Optional[str]) -> Optional[Dict[str, int]]:
+    """Total ability increases of a species (an unknown subspecies adds nothing)."""
+    deltas = _SPECIES_ASI_TOTAL.get((species, subspecies))
+    if deltas is None:
+        deltas = _SPECIES_ASI_TOTAL.get((species, None))
+    return deltas
+
+
+def apply_species_ability_increases(base_scores: Dict[str, int], species: str, subspecies: str = None) -> Dict[str, int]:
+    """Apply species ability score increases to base scores.
     
-    return scores
+    `base_scores` is never modified. When the species grants no increases
+    (or is unknown) it is returned as is rather than copied, so treat the
+    result as read-only or copy it before mutating.
+    """
+    if not _species_deltas(species, subspecies):
+        return base_scores
+    return dict(_species_scores_cached(tuple(base_scores.items()), species, subspecies))
 
 
+@functools.lru_cache(maxsize=512)
+def _species_scores_cached(base_items: Tuple[Tuple[str, int], ...], species: str,
+                           subspecies: Optional[str]) -> Tuple[Tuple[str, int], ...]:
+    """Cached core of apply_species_ability_increases on hashable (ability, score) pairs."""
+    scores = dict(base_items)
+    deltas = _species_deltas(species, subspecies)
+    for ability, increase in deltas.items():
+        scores[ability] = scores.get(ability, 0) + increase
+    return tuple(scores.items())
+
+
+@functools.lru_cache(maxsize=64)
 def get_species_speed(species: str, subspecies: str = None) -> int:
     """Get speed for species."""
     if species in PHB_SPECIES:
-        base_speed = PHB_SPECIES[species].get("speed", 30)
-        # Wood Elf has +5 speed
-        if species == "Elf" and subspecies == "Wood Elf":
-            return base_speed + 5
-        return base_speed
+        return int(_SPECIES_SPEED[species_row(species, subspecies)])
     return 30
 
 
@@ -887,11 +889,114 @@ def get_species_speed(species: str, subspecies: str = None) -> int:
 # LANGCHAIN TOOLS
 # ============================================================================
 
-# These functions are decorated with @tool to make them available to the
-# LangChain agent. The agent can call these tools to perform character
-# creation operations based on user input.
+# These functions are registered with @_register_tool to make them available
+# to the LangChain agent. The agent can call these tools to perform character
+# creation operations based on user input. They stay plain functions until
+# create_agent wraps them with LangChain's @tool.
+
+# Raw tool functions in registration order
+_TOOLS: List[Callable] = []
+
+
+def _register_tool(func: Callable) -> Callable:
+    """Register a function as an agent tool (wrapped with @tool in create_agent).
+
+    A character update rejected by the schema is reported back to the model
+    as an error message instead of aborting the agent run.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except fastjsonschema.JsonSchemaValueException as e:
+            return f"Error: invalid character data ({e.message})."
+
+    _TOOLS.append(wrapper)
+    return wrapper
+
+
+class _UncachedReply(Exception):
+    """Carries a tool reply out of the lookup cache without storing it."""
+    
+    def __init__(self, reply: str):
+        super().__init__(reply)
+        self.reply = reply
+
+
+def cached_tool(func):
+    """Memoize a pure lookup tool in a bounded LRU cache.
+    
+    Apply below @_register_tool so the cache wraps the raw function and the tool
+    schema is still derived from the original signature. "Error: ..." replies
+    (e.g. for a misspelled class name) are not cached. Never use this on
+    tools that modify the character.
+    """
+    @functools.lru_cache(maxsize=64)
+    def cached(*args, **kwargs):
+        reply = func(*args, **kwargs)
+        if reply.startswith("Error:"):
+            raise _UncachedReply(reply)
+        return reply
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return cached(*args, **kwargs)
+        except _UncachedReply as e:
+            return e.reply
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
 
-@tool
+@_register_tool
+@cached_tool
+def get_class_details(class_name: str) -> str:
+    """Look up a PHB class: hit die, proficiencies, skill choices, starting equipment and features.
+    
+    Args:
+        class_name: The PHB class to look up (e.g., "Fighter")
+    
+    Returns:
+        The class rules as JSON.
+    """
+    if class_name not in PHB_CLASSES:
+        return f"Error: '{class_name}' is not a valid PHB class. Valid classes: {', '.join(PHB_CLASSES.keys())}"
+    return get_class(class_name)
+
+
+@_register_tool
+@cached_tool
+def get_species_details(species: str) -> str:
+    """Look up a PHB species: ability score increases, size, speed, languages, traits and subspecies.
+    
+    Args:
+        species: The PHB species to look up (e.g., "Elf")
+    
+    Returns:
+        The species rules as JSON.
+    """
+    if species not in PHB_SPECIES:
+        return f"Error: '{species}' is not a valid PHB species. Valid species: {', '.join(PHB_SPECIES.keys())}"
+    return get_species(species)
+
+
+@_register_tool
+@cached_tool
+def get_background_details(background: str) -> str:
+    """Look up a PHB background: proficiencies, equipment, feature and suggested trait/ideal/bond/flaw options.
+    
+    Args:
+        background: The PHB background to look up (e.g., "Sage")
+    
+    Returns:
+        The background rules as JSON.
+    """
+    if background not in PHB_BACKGROUNDS:
+        return f"Error: '{background}' is not a valid PHB background. Valid backgrounds: {', '.join(PHB_BACKGROUNDS.keys())}"
+    return get_background(background)
+
+
+@_register_tool
 def roll_ability_scores() -> str:
     """Roll ability scores using the standard 4d6 drop lowest method.
     
@@ -901,34 +1006,27 @@ def roll_ability_scores() -> str:
     Returns:
         A formatted string showing all six ability scores and their modifiers.
     """
-    scores = {}
-    modifiers = {}
-    
-    for ability in ["Strength", "Dexterity", "Constitution", 
-                    "Intelligence", "Wisdom", "Charisma"]:
-        score = roll_4d6_drop_lowest()
-        scores[ability] = score
-        modifiers[ability] = calculate_ability_modifier(score)
+    scores = dict(zip(ABILITIES, roll_ability_score_set()))
     
-    # Store in character data
-    character_data["ability_scores"] = scores
-    character_data["ability_modifiers"] = modifiers
-    character_data["generation_method"] = "rolled"
+    # Store in character data (modifiers are derived by update_character)
+    character = update_character(
+        ability_scores=scores,
+        generation_method="rolled"
+    )
+    modifiers = character["ability_modifiers"]
     
     # Format output
-    result = "Rolled Ability Scores:\n"
-    result += "-" * 40 + "\n"
-    for ability in ["Strength", "Dexterity", "Constitution", 
-                    "Intelligence", "Wisdom", "Charisma"]:
+    parts = ["Rolled Ability Scores:\n", "-" * 40 + "\n"]
+    for ability in ABILITIES:
         score = scores[ability]
         mod = modifiers[ability]
-        mod_str = f"+{mod}" if mod >= 0 else str(mod)
-        result += f"{ability:15} {score:2} (modifier: {mod_str:>3})\n"
+        mod_str = format_modifier(mod)
+        parts.append(f"{ability:15} {score:2} (modifier: {mod_str:>3})\n")
     
-    return result
+    return "".join(parts)
 
 
-@tool
+@_register_tool
 def generate_point_buy_scores(
     strength: int = None,
     dexterity: int = None,
@@ -972,46 +1070,40 @@ def generate_point_buy_scores(
         "Charisma": charisma if charisma is not None else 8
     }
     
-    # Validate scores are in valid range
+    # Validate and price every score in one pass (no cost = outside 8-15)
+    costs = {}
     for ability, score in scores.items():
-        if score < 8 or score > 15:
+        cost = point_buy_cost(score)
+        if cost is None:
             return f"Error: {ability} score of {score} is invalid. Scores must be between 8 and 15 for point buy."
-    
-    # Calculate total point cost
-    total_cost = 0
-    modifiers = {}
-    for ability, score in scores.items():
-        if score not in POINT_BUY_COSTS:
-            return f"Error: {ability} score of {score} is invalid. Valid scores for point buy are 8-15."
-        total_cost += POINT_BUY_COSTS[score]
-        modifiers[ability] = calculate_ability_modifier(score)
+        costs[ability] = cost
+    total_cost = sum(costs.values())
     
     # Check if within budget
     if total_cost > 27:
         return f"Error: Total point cost ({total_cost}) exceeds the 27-point budget. Please adjust scores."
     
-    # Store in character data
-    character_data["ability_scores"] = scores
-    character_data["ability_modifiers"] = modifiers
-    character_data["generation_method"] = "point_buy"
+    # Store in character data (modifiers are derived by update_character)
+    character = update_character(
+        ability_scores=scores,
+        generation_method="point_buy"
+    )
+    modifiers = character["ability_modifiers"]
     
     # Format output
-    result = "Point Buy Ability Scores:\n"
-    result += "-" * 50 + "\n"
-    for ability in ["Strength", "Dexterity", "Constitution", 
-                    "Intelligence", "Wisdom", "Charisma"]:
+    parts = ["Point Buy Ability Scores:\n", "-" * 50 + "\n"]
+    for ability in ABILITIES:
         score = scores[ability]
         mod = modifiers[ability]
-        cost = POINT_BUY_COSTS[score]
-        mod_str = f"+{mod}" if mod >= 0 else str(mod)
-        result += f"{ability:15} {score:2} (modifier: {mod_str:>3}, cost: {cost:2} points)\n"
-    result += "-" * 50 + "\n"
-    result += f"Total points spent: {total_cost} / 27\n"
+        mod_str = format_modifier(mod)
+        parts.append(f"{ability:15} {score:2} (modifier: {mod_str:>3}, cost: {costs[ability]:2} points)\n")
+    parts.append("-" * 50 + "\n")
+    parts.append(f"Total points spent: {total_cost} / 27\n")
     
-    return result
+    return "".join(parts)
 
 
-@tool
+@_register_tool
 def generate_standard_array_scores(
     strength: int = None,
     dexterity: int = None,
@@ -1054,30 +1146,25 @@ def generate_standard_array_scores(
     if provided_scores != STANDARD_ARRAY:
         return f"Error: Scores must match the standard array exactly: {STANDARD_ARRAY}. You provided: {provided_scores}"
     
-    # Calculate modifiers
-    modifiers = {}
-    for ability, score in scores.items():
-        modifiers[ability] = calculate_ability_modifier(score)
-    
-    # Store in character data
-    character_data["ability_scores"] = scores
-    character_data["ability_modifiers"] = modifiers
-    character_data["generation_method"] = "standard_array"
+    # Store in character data (modifiers are derived by update_character)
+    character = update_character(
+        ability_scores=scores,
+        generation_method="standard_array"
+    )
+    modifiers = character["ability_modifiers"]
     
     # Format output
-    result = "Standard Array Ability Scores:\n"
-    result += "-" * 40 + "\n"
-    for ability in ["Strength", "Dexterity", "Constitution", 
-                    "Intelligence", "Wisdom", "Charisma"]:
+    parts = ["Standard Array Ability Scores:\n", "-" * 40 + "\n"]
+    for ability in ABILITIES:
         score = scores[ability]
         mod = modifiers[ability]
-        mod_str = f"+{mod}" if mod >= 0 else str(mod)
-        result += f"{ability:15} {score:2} (modifier: {mod_str:>3})\n"
+        mod_str = format_modifier(mod)
+        parts.append(f"{ability:15} {score:2} (modifier: {mod_str:>3})\n")
     
-    return result
+    return "".join(parts)
 
 
-@tool
+@_register_tool
 def set_character_name(name: str) -> str:
     """Set the character's name.
     
@@ -1087,11 +1174,18 @@ def set_character_name(name: str) -> str:
     Returns:
         Confirmation message with the character's name.
     """
-    character_data["name"] = name
+    update_character(name=name)
     return f"Character name set to: {name}"
 
 
-@tool
+@functools.lru_cache(maxsize=256)
+def _class_features_for(class_name: str, level: int) -> Tuple[str, ...]:
+    """All features a class has gained by `level`, in level order (12 x 20 inputs)."""
+    return tuple(feature for level_features in CLASS_DEFS[class_name].features[1:level + 1]
+                 for feature in level_features)
+
+
+@_register_tool
 def set_character_class(class_name: str, level: int = 1) -> str:
     """Set the character's class and level.
     
@@ -1111,23 +1205,22 @@ def set_character_class(class_name: str, level: int = 1) -> str:
     if level < 1 or level > 20:
         return "Error: Level must be between 1 and 20."
     
-    character_data["class"] = class_name
-    character_data["level"] = level
-    character_data["experience_points"] = XP_BY_LEVEL.get(level, 0)
-    
     # Apply class features
-    class_info = PHB_CLASSES[class_name]
-    features = []
-    for feat_level in sorted(class_info["features"].keys()):
-        if level >= feat_level:
-            features.extend(class_info["features"][feat_level])
-    character_data["class_features"] = features
-    character_data["saving_throw_proficiencies"] = class_info["saving_throws"]
+    class_def = CLASS_DEFS[class_name]
+    features = list(_class_features_for(class_name, level))
+    
+    update_character(**{
+        "class": class_name,
+        "level": level,
+        "experience_points": XP_BY_LEVEL.get(level, 0),
+        "class_features": features,
+        "saving_throw_proficiencies": list(class_def.saving_throws)
+    })
     
     return f"Character class set to: {class_name} (Level {level})"
 
 
-@tool
+@_register_tool
 def set_character_species(species: str, subspecies: str = None) -> str:
     """Set the character's species (race) and optional subspecies.
     
@@ -1142,6 +1235,7 @@ def set_character_species(species: str, subspecies: str = None) -> str:
     Returns:
         Confirmation message with species information.
     """
+    character = _character()
     if species not in PHB_SPECIES:
         return f"Error: '{species}' is not a valid PHB species. Valid species: {', '.join(PHB_SPECIES.keys())}"
     
@@ -1154,37 +1248,32 @@ def set_character_species(species: str, subspecies: str = None) -> str:
     elif subspecies:
         return f"Error: {species} does not have subspecies."
     
-    character_data["species"] = species
-    character_data["subspecies"] = subspecies
+    patch = {"species": species, "subspecies": subspecies}
     
     # Apply species ability score increases if ability scores are set
-    if any(character_data["ability_scores"].values()):
-        base_scores = character_data["ability_scores"].copy()
-        updated_scores = apply_species_ability_increases(base_scores, species, subspecies)
-        character_data["ability_scores"] = updated_scores
-        
-        # Recalculate modifiers
-        for ability, score in updated_scores.items():
-            character_data["ability_modifiers"][ability] = calculate_ability_modifier(score)
+    scores = character["ability_scores"]
+    if any(scores.values()):
+        if character.get("species_increases_applied") and character["species"]:
+            # Undo the previous species' increases so they don't stack
+            old = _species_deltas(character["species"], character["subspecies"]) or {}
+            scores = {a: None if s is None else s - old.get(a, 0) for a, s in scores.items()}
+        patch["ability_scores"] = apply_species_ability_increases(scores, species, subspecies)
+        patch["species_increases_applied"] = True
     
     # Set speed
-    character_data["speed"] = get_species_speed(species, subspecies)
+    patch["speed"] = get_species_speed(species, subspecies)
     
-    # Set species traits
-    traits = species_data.get("traits", [])
-    if subspecies and subspecies in species_data:
-        traits.extend(species_data[subspecies].get("traits", []))
-    character_data["species_traits"] = traits
+    # Set species traits and languages
+    patch["species_traits"] = list(_SPECIES_TRAITS[(species, subspecies or None)])
+    patch["language_proficiencies"] = list(_SPECIES_LANGUAGES[species])
     
-    # Set languages
-    languages = species_data.get("languages", [])
-    character_data["language_proficiencies"] = languages
+    update_character(**patch)
     
     species_display = f"{subspecies} {species}" if subspecies else species
     return f"Character species set to: {species_display}"
 
 
-@tool
+@_register_tool
 def set_character_background(background: str) -> str:
     """Set the character's background.
     
@@ -1196,32 +1285,26 @@ def set_character_background(background: str) -> str:
     Returns:
         Confirmation message with background information.
     """
+    character = _character()
     if background not in PHB_BACKGROUNDS:
         return f"Error: '{background}' is not a valid PHB background. Valid backgrounds: {', '.join(PHB_BACKGROUNDS.keys())}"
     
-    character_data["background"] = background
-    
-    bg_data = PHB_BACKGROUNDS[background]
-    
-    # Add background skill proficiencies
-    if "skill_proficiencies" in bg_data:
-        character_data["skill_proficiencies"].extend(bg_data["skill_proficiencies"])
-    
-    # Add tool proficiencies
-    if "tool_proficiencies" in bg_data:
-        character_data["tool_proficiencies"].extend(bg_data["tool_proficiencies"])
-    
-    # Add languages
-    if "languages" in bg_data:
-        character_data["language_proficiencies"].extend(bg_data["languages"])
+    bg = BACKGROUND_DEFS[background]
+    patch = {
+        "background": background,
+        "skill_proficiencies": character["skill_proficiencies"] + list(bg.skill_proficiencies),
+        # Tool proficiencies and languages are empty for some backgrounds
+        "tool_proficiencies": character["tool_proficiencies"] + list(bg.tool_proficiencies),
+        "language_proficiencies": character["language_proficiencies"] + list(bg.languages),
+        "background_feature": bg.feature
+    }
     
-    # Set background feature
-    character_data["background_feature"] = bg_data.get("feature", "")
+    update_character(**patch)
     
     return f"Character background set to: {background}"
 
 
-@tool
+@_register_tool
 def set_alignment(alignment: str) -> str:
     """Set the character's alignment.
     
@@ -1235,14 +1318,14 @@ def set_alignment(alignment: str) -> str:
     Returns:
         Confirmation message with alignment.
     """
-    if alignment not in ALIGNMENTS:
+    if alignment not in _ALIGNMENTS_SET:
         return f"Error: '{alignment}' is not a valid alignment. Valid alignments: {', '.join(ALIGNMENTS)}"
     
-    character_data["alignment"] = alignment
+    update_character(alignment=alignment)
     return f"Character alignment set to: {alignment}"
 
 
-@tool
+@_register_tool
 def set_background_personality(personality_trait: str = None, ideal: str = None, bond: str = None, flaw: str = None) -> str:
     """Set background personality details (trait, ideal, bond, flaw).
     
@@ -1258,14 +1341,13 @@ def set_background_personality(personality_trait: str = None, ideal: str = None,
     Returns:
         Confirmation message.
     """
-    if personality_trait:
-        character_data["personality_trait"] = personality_trait
-    if ideal:
-        character_data["ideal"] = ideal
-    if bond:
-        character_data["bond"] = bond
-    if flaw:
-        character_data["flaw"] = flaw
+    details = {
+        "personality_trait": personality_trait,
+        "ideal": ideal,
+        "bond": bond,
+        "flaw": flaw
+    }
+    update_character(**{field: value for field, value in details.items() if value})
     
     result = "Background personality details updated:\n"
     if personality_trait:
@@ -1280,7 +1362,7 @@ def set_background_personality(personality_trait: str = None, ideal: str = None,
     return result.strip()
 
 
-@tool
+@_register_tool
 def set_physical_description(age: int = None, height: str = None, weight: str = None, 
                              eyes: str = None, skin: str = None, hair: str = None) -> str:
     """Set optional physical description details.
@@ -1296,23 +1378,20 @@ def set_physical_description(age: int = None, height: str = None, weight: str =
     Returns:
         Confirmation message.
     """
-    if age:
-        character_data["age"] = age
-    if height:
-        character_data["height"] = height
-    if weight:
-        character_data["weight"] = weight
-    if eyes:
-        character_data["eyes"] = eyes
-    if skin:
-        character_data["skin"] = skin
-    if hair:
-        character_data["hair"] = hair
+    details = {
+        "age": age,
+        "height": height,
+        "weight": weight,
+        "eyes": eyes,
+        "skin": skin,
+        "hair": hair
+    }
+    update_character(**{field: value for field, value in details.items() if value})
     
     return "Physical description updated."
 
 
-@tool
+@_register_tool
 def set_backstory(backstory: str) -> str:
     """Set the character's backstory.
     
@@ -1322,15 +1401,16 @@ def set_backstory(backstory: str) -> str:
     Returns:
         Confirmation message.
     """
-    character_data["backstory"] = backstory
+    update_character(backstory=backstory)
     return "Character backstory set."
 
 
-@tool
+@_register_tool
 def finalize_character() -> str:
     """Finalize and calculate all derived stats for the character.
     
-    This should be called after all basic information is set. It calculates:
+    Call this after the basic information is set and again after any edit,
+    then show the result with get_character_sheet. It calculates:
     - Final ability scores (with species increases)
     - Ability modifiers
     - Saving throw proficiencies
@@ -1342,204 +1422,244 @@ def finalize_character() -> str:
     Returns:
         A formatted summary of the finalized character.
     """
+    character = _character()
     # Apply species ability increases if not already applied
-    if character_data["species"] and any(character_data["ability_scores"].values()):
-        base_scores = character_data["ability_scores"].copy()
+    if (not character.get("species_increases_applied") and character["species"]
+            and any(character["ability_scores"].values())):
         updated_scores = apply_species_ability_increases(
-            base_scores, 
-            character_data["species"], 
-            character_data["subspecies"]
+            character["ability_scores"], 
+            character["species"], 
+            character["subspecies"]
         )
-        character_data["ability_scores"] = updated_scores
-        
-        # Recalculate modifiers
-        for ability, score in updated_scores.items():
-            character_data["ability_modifiers"][ability] = calculate_ability_modifier(score)
+        update_character(ability_scores=updated_scores, species_increases_applied=True)
+    
+    patch = {}
     
     # Calculate proficiency bonus
-    level = character_data["level"]
+    level = character["level"]
     proficiency_bonus = get_proficiency_bonus(level)
     
     # Calculate HP
-    if character_data["class"] and character_data["ability_modifiers"]["Constitution"] is not None:
-        con_mod = character_data["ability_modifiers"]["Constitution"]
-        hp, hit_dice = calculate_hit_points(character_data["class"], level, con_mod)
-        character_data["hit_points"] = hp
-        character_data["hit_dice"] = hit_dice
+    if character["class"] and character["ability_modifiers"]["Constitution"] is not None:
+        con_mod = character["ability_modifiers"]["Constitution"]
+        patch["hit_points"], patch["hit_dice"] = calculate_hit_points(character["class"], level, con_mod)
     
     # Calculate AC (simplified - assumes light armor or unarmored)
-    if character_data["ability_modifiers"]["Dexterity"] is not None:
-        dex_mod = character_data["ability_modifiers"]["Dexterity"]
-        character_data["armor_class"] = calculate_armor_class(dex_mod)
+    if character["ability_modifiers"]["Dexterity"] is not None:
+        dex_mod = character["ability_modifiers"]["Dexterity"]
+        patch["armor_class"] = calculate_armor_class(dex_mod)
     
     # Calculate Initiative
-    if character_data["ability_modifiers"]["Dexterity"] is not None:
-        character_data["initiative"] = character_data["ability_modifiers"]["Dexterity"]
+    if character["ability_modifiers"]["Dexterity"] is not None:
+        patch["initiative"] = character["ability_modifiers"]["Dexterity"]
     
     # Calculate passive skills
-    wis_mod = character_data["ability_modifiers"].get("Wisdom", 0)
-    int_mod = character_data["ability_modifiers"].get("Intelligence", 0)
+    wis_mod = character["ability_modifiers"].get("Wisdom", 0)
+    int_mod = character["ability_modifiers"].get("Intelligence", 0)
     
-    has_perception = "Perception" in character_data["skill_proficiencies"]
-    has_investigation = "Investigation" in character_data["skill_proficiencies"]
-    has_insight = "Insight" in character_data["skill_proficiencies"]
+    skills = proficiency_mask(character["skill_proficiencies"])
+    has_perception = has_proficiency(skills, "Perception")
+    has_investigation = has_proficiency(skills, "Investigation")
+    has_insight = has_proficiency(skills, "Insight")
     
-    character_data["passive_perception"] = calculate_passive_skill(wis_mod, proficiency_bonus, has_perception)
-    character_data["passive_investigation"] = calculate_passive_skill(int_mod, proficiency_bonus, has_investigation)
-    character_data["passive_insight"] = calculate_passive_skill(wis_mod, proficiency_bonus, has_insight)
+    patch["passive_perception"] = calculate_passive_skill(wis_mod, proficiency_bonus, has_perception)
+    patch["passive_investigation"] = calculate_passive_skill(int_mod, proficiency_bonus, has_investigation)
+    patch["passive_insight"] = calculate_passive_skill(wis_mod, proficiency_bonus, has_insight)
     
     # Set speed if not set
-    if not character_data["speed"]:
-        character_data["speed"] = get_species_speed(character_data["species"], character_data["subspecies"])
+    if not character["speed"]:
+        patch["speed"] = get_species_speed(character["species"], character["subspecies"])
+    
+    update_character(**patch)
     
     return "Character finalized! All derived stats have been calculated. Use get_character_sheet to view the complete character."
 
 
-def _generate_character_sheet() -> str:
+def _generate_character_sheet(character: Optional[Dict[str, Any]] = None) -> str:
     """Generate a complete, formatted character sheet in Markdown format.
     
     This is a helper function that can be called directly (not as a tool).
+    The current record's sheet is cached until the next update_character
+    call; explicitly passed records are always rendered afresh, since their
+    owner may have edited them directly.
+    
+    Args:
+        character: Character record to render (default: the current one)
     
     Returns:
         A formatted character sheet with all character information.
     """
-    result = "=" * 60 + "\n"
-    result += "D&D 5e CHARACTER SHEET\n"
-    result += "=" * 60 + "\n\n"
+    global _sheet_cache
+    if character is None:
+        character = _character()
+        cached = _sheet_cache
+        if cached is not None and cached[0] is character and cached[1] == _character_version:
+            return cached[2]
+        version = _character_version
+        sheet = _render_character_sheet(character)
+        _sheet_cache = (character, version, sheet)
+        return sheet
+    return _render_character_sheet(character)
+
+
+def _render_character_sheet(character: Dict[str, Any]) -> str:
+    """Render one character record as a Markdown sheet (see _generate_character_sheet)."""
+    parts: List[str] = ["=" * 60 + "\n", "D&D 5e CHARACTER SHEET\n", "=" * 60 + "\n\n"]
     
     # Basic Information
-    result += "**Character Name:** " + (character_data["name"] or "Not set") + "\n\n"
+    parts.append("**Character Name:** " + (character["name"] or "Not set") + "\n\n")
     
     class_level = ""
-    if character_data["class"]:
-        class_level = f"{character_data['class']} {character_data['level']}"
+    if character["class"]:
+        class_level = f"{character['class']} {character['level']}"
     else:
         class_level = "Not set"
-    result += f"**Class & Level:** {class_level}\n\n"
+    parts.append(f"**Class & Level:** {class_level}\n\n")
     
     species_display = ""
-    if character_data["species"]:
-        if character_data["subspecies"]:
-            species_display = f"{character_data['subspecies']} {character_data['species']}"
+    if character["species"]:
+        if character["subspecies"]:
+            species_display = f"{character['subspecies']} {character['species']}"
         else:
-            species_display = character_data["species"]
+            species_display = character["species"]
     else:
         species_display = "Not set"
-    result += f"**Species:** {species_display}\n\n"
+    parts.append(f"**Species:** {species_display}\n\n")
     
-    result += f"**Background:** {character_data['background'] or 'Not set'}\n\n"
-    result += f"**Alignment:** {character_data['alignment'] or 'Not set'}\n\n"
-    result += f"**Experience Points:** {character_data['experience_points']}\n\n"
+    parts.append(f"**Background:** {character['background'] or 'Not set'}\n\n")
+    parts.append(f"**Alignment:** {character['alignment'] or 'Not set'}\n\n")
+    parts.append(f"**Experience Points:** {character['experience_points']}\n\n")
     
     # Ability Scores
-    scores = character_data["ability_scores"]
-    modifiers = character_data["ability_modifiers"]
+    scores = character["ability_scores"]
+    modifiers = character["ability_modifiers"]
     
     if any(scores.values()):
-        result += "**Ability Scores:**\n"
+        parts.append("**Ability Scores:**\n")
         abil_str = []
-        for ability in ["Strength", "Dexterity", "Constitution", "Intelligence", "Wisdom", "Charisma"]:
+        for ability in ABILITIES:
             score = scores.get(ability)
             mod = modifiers.get(ability)
             if score is not None:
-                mod_str = f"+{mod}" if mod >= 0 else str(mod)
+                mod_str = format_modifier(mod)
                 abil_str.append(f"**{ability[:3].upper()}:** {score} ({mod_str})")
-        result += " ".join(abil_str) + "\n\n"
+        parts.append(" ".join(abil_str) + "\n\n")
     
     # Skills
-    if character_data["skill_proficiencies"]:
-        result += "**Skills:** " + ", ".join(character_data["skill_proficiencies"]) + "\n\n"
+    if character["skill_proficiencies"]:
+        parts.append("**Skills:** " + ", ".join(character["skill_proficiencies"]) + "\n\n")
     
     # Combat Stats
-    result += "**Combat Stats:**\n"
-    if character_data["armor_class"] is not None:
-        result += f"  AC: {character_data['armor_class']}\n"
-    if character_data["initiative"] is not None:
-        init_str = f"+{character_data['initiative']}" if character_data['initiative'] >= 0 else str(character_data['initiative'])
-        result += f"  Initiative: {init_str}\n"
-    if character_data["speed"]:
-        result += f"  Speed: {character_data['speed']} ft\n"
-    if character_data["hit_points"]:
-        result += f"  HP: {character_data['hit_points']} ({character_data['hit_dice']})\n"
-    result += "\n"
+    parts.append("**Combat Stats:**\n")
+    if character["armor_class"] is not None:
+        parts.append(f"  AC: {character['armor_class']}\n")
+    if character["initiative"] is not None:
+        parts.append(f"  Initiative: {format_modifier(character['initiative'])}\n")
+    if character["speed"]:
+        parts.append(f"  Speed: {character['speed']} ft\n")
+    if character["hit_points"]:
+        parts.append(f"  HP: {character['hit_points']} ({character['hit_dice']})\n")
+    parts.append("\n")
     
     # Equipment
-    if character_data["equipment"]:
-        result += f"**Equipment:** {', '.join(character_data['equipment'])}\n\n"
+    if character["equipment"]:
+        parts.append(f"**Equipment:** {', '.join(character['equipment'])}\n\n")
     
     # Background Details
-    if character_data["personality_trait"]:
-        result += f"**Trait:** {character_data['personality_trait']}\n\n"
-    if character_data["ideal"]:
-        result += f"**Ideal:** {character_data['ideal']}\n\n"
-    if character_data["bond"]:
-        result += f"**Bond:** {character_data['bond']}\n\n"
-    if character_data["flaw"]:
-        result += f"**Flaw:** {character_data['flaw']}\n\n"
-    if character_data["background_feature"]:
-        result += f"**Background Feature:** {character_data['background_feature']}\n\n"
+    if character["personality_trait"]:
+        parts.append(f"**Trait:** {character['personality_trait']}\n\n")
+    if character["ideal"]:
+        parts.append(f"**Ideal:** {character['ideal']}\n\n")
+    if character["bond"]:
+        parts.append(f"**Bond:** {character['bond']}\n\n")
+    if character["flaw"]:
+        parts.append(f"**Flaw:** {character['flaw']}\n\n")
+    if character["background_feature"]:
+        parts.append(f"**Background Feature:** {character['background_feature']}\n\n")
     
     # Features
-    if character_data["class_features"]:
-        result += f"**Features:** {', '.join(character_data['class_features'])}\n\n"
+    if character["class_features"]:
+        parts.append(f"**Features:** {', '.join(character['class_features'])}\n\n")
     
     # Languages
-    if character_data["language_proficiencies"]:
-        result += f"**Languages:** {', '.join(character_data['language_proficiencies'])}\n\n"
+    if character["language_proficiencies"]:
+        parts.append(f"**Languages:** {', '.join(character['language_proficiencies'])}\n\n")
     
     # Passive Skills
-    if character_data["passive_perception"]:
-        result += f"**Passive Perception:** {character_data['passive_perception']}\n"
-    if character_data["passive_investigation"]:
-        result += f"**Passive Investigation:** {character_data['passive_investigation']}\n"
-    if character_data["passive_insight"]:
-        result += f"**Passive Insight:** {character_data['passive_insight']}\n"
+    if character["passive_perception"]:
+        parts.append(f"**Passive Perception:** {character['passive_perception']}\n")
+    if character["passive_investigation"]:
+        parts.append(f"**Passive Investigation:** {character['passive_investigation']}\n")
+    if character["passive_insight"]:
+        parts.append(f"**Passive Insight:** {character['passive_insight']}\n")
     
-    result += "\n" + "=" * 60 + "\n"
+    parts.append("\n" + "=" * 60 + "\n")
     
-    return result
+    return "".join(parts)
 
 
-@tool
+@_register_tool
 def get_character_sheet() -> str:
     """Get a complete, formatted character sheet in Markdown format.
     
+    Show it after finalize_character, then offer to export the character.
+    
     Returns:
         A formatted character sheet with all character information.
     """
     return _generate_character_sheet()
 
 
-@tool
-def export_character_json(filename: str = None) -> str:
+# Characters that may not appear in a filename derived from a character name
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w -]+")
+
+
+def _safe_filename(name: Optional[str], ext: str) -> str:
+    """Turn a character name into a filename ending in `ext` ("character" if nothing is left)."""
+    stem = _UNSAFE_FILENAME_CHARS.sub("", name or "").strip()
+    return (stem or "character") + ext
+
+
+def _write_json(character: Dict[str, Any], filename: str, pretty: bool = True) -> None:
+    """Write a character record to `filename` as JSON (indented unless `pretty` is False)."""
+    option = orjson.OPT_NON_STR_KEYS
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    with open(filename, 'wb') as f:
+        f.write(orjson.dumps(character, default=_json_default, option=option))
+
+
+def _write_markdown(sheet: str, filename: str) -> None:
+    """Write a rendered character sheet to `filename`."""
+    with open(filename, 'w') as f:
+        f.write(sheet)
+
+
+@_register_tool
+def export_character_json(filename: str = None, pretty: bool = True) -> str:
     """Export the character to a JSON file.
     
     Args:
         filename: Optional filename (default: character_name.json or character.json)
+        pretty: Indent the JSON for reading; False writes compact JSON
     
     Returns:
         Confirmation message with file path.
     """
+    character = _character()
     if not filename:
-        name = character_data.get("name", "character")
-        # Sanitize filename
-        filename = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).strip()
-        if not filename:
-            filename = "character"
-        filename += ".json"
-    
-    if not filename.endswith(".json"):
+        filename = _safe_filename(character.get("name"), ".json")
+    elif not filename.endswith(".json"):
         filename += ".json"
     
     try:
-        with open(filename, 'w') as f:
-            json.dump(character_data, f, indent=2)
+        _write_json(character, filename, pretty)
         return f"Character exported to {filename}"
     except Exception as e:
         return f"Error exporting character: {e}"
 
 
-@tool
+@_register_tool
 def export_character_markdown(filename: str = None) -> str:
     """Export the character to a Markdown file.
     
@@ -1549,137 +1669,1060 @@ def export_character_markdown(filename: str = None) -> str:
     Returns:
         Confirmation message with file path.
     """
+    character = _character()
     if not filename:
-        name = character_data.get("name", "character")
-        # Sanitize filename
-        filename = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).strip()
-        if not filename:
-            filename = "character"
-        filename += ".md"
-    
-    if not filename.endswith(".md"):
+        filename = _safe_filename(character.get("name"), ".md")
+    elif not filename.endswith(".md"):
         filename += ".md"
     
     try:
-        sheet = get_character_sheet()
-        with open(filename, 'w') as f:
-            f.write(sheet)
+        _write_markdown(get_character_sheet(), filename)
         return f"Character exported to {filename}"
     except Exception as e:
         return f"Error exporting character: {e}"
 
 
-def create_agent() -> AgentExecutor:
+def _export_filenames(character: Dict[str, Any], basename: Optional[str]) -> Tuple[str, str]:
+    """Return the JSON and Markdown filenames of an export of `character`."""
+    stem = _safe_filename(basename or character.get("name"), "")
+    return stem + ".json", stem + ".md"
+
+
+async def aexport_character_all(basename: str = None) -> List[str]:
     """
-    Create and configure the LangChain agent with all character creation tools.
+    Write the current character as JSON and as Markdown at the same time.
     
-    Sets up the OpenAI LLM, defines all available tools, and creates
-    the agent executor with a system prompt that guides the character
-    creation workflow.
+    Both files are written on worker threads, so their disk IO overlaps.
+    
+    Args:
+        basename: Filename without extension (default: from the character name)
+    
+    Returns:
+        The two filenames written.
     """
+    character = _character()
+    json_file, markdown_file = _export_filenames(character, basename)
+    await asyncio.gather(
+        asyncio.to_thread(_write_json, character, json_file),
+        asyncio.to_thread(_write_markdown, _generate_character_sheet(), markdown_file)
+    )
+    return [json_file, markdown_file]
+
+
+@_register_tool
+def export_character_all(basename: str = None) -> str:
+    """Export the character to both a JSON and a Markdown file.
+    
+    Args:
+        basename: Optional filename without extension (default: the character name)
+    
+    Returns:
+        Confirmation message with both file paths.
+    """
+    character = _character()
+    json_file, markdown_file = _export_filenames(character, basename)
+    try:
+        _write_json(character, json_file)
+        _write_markdown(_generate_character_sheet(), markdown_file)
+        return f"Character exported to {json_file} and {markdown_file}"
+    except Exception as e:
+        return f"Error exporting character: {e}"
+
+
+async def _aexport_character_all_tool(basename: str = None) -> str:
+    """Async body of the export_character_all tool (used by the async executor)."""
+    try:
+        files = await aexport_character_all(basename)
+        return f"Character exported to {' and '.join(files)}"
+    except Exception as e:
+        return f"Error exporting character: {e}"
+
+
+export_character_all.coroutine = _aexport_character_all_tool
+
+
+# ============================================================================
+# AGENT PROMPT
+# ============================================================================
+
+# Static system prompt: a short directive plus the PHB reference tables
+# (step-by-step guidance lives in the tool docstrings).
+# It must stay byte-identical across calls so OpenAI's prompt caching can
+# reuse it (the cache needs a 1024+ token prefix); never interpolate
+# per-session values into it. The current character goes in a separate
+# message after the chat history (see CharacterAgent.arun).
+SYSTEM_PREFIX = """You are a D&D 5e character creation and editing assistant. Use Player's Handbook (PHB) rules and content only - no homebrew.
+Guide the user step by step: name, class and level, species, background, alignment, ability scores, then optional personality, looks and backstory.
+Use the tools for every action; issue independent lookups as parallel tool calls.
+Confirm important choices, and keep existing data when editing unless asked to change it.
+
+PHB REFERENCE
+{legend}
+
+CLASSES:
+{classes}
+SPECIES:
+{species}
+BACKGROUNDS: {backgrounds}
+ALIGNMENTS: {alignments}""".format(
+    legend=CSV_LEGEND,
+    classes=_PHB_CSV["classes"],
+    species=_PHB_CSV["species"],
+    backgrounds=", ".join(PHB_BACKGROUNDS),
+    alignments=", ".join(ALIGNMENTS)
+)
+
+
+def _character_state_text(character: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Describe the filled-in fields of a character for the agent, or None if untouched."""
+    character = character if character is not None else _character()
+    filled = {}
+    for field, value in character.items():
+        if isinstance(value, dict):
+            value = {k: v for k, v in value.items() if v is not None}
+        if value not in (None, "", [], {}) and value != _EMPTY_CHARACTER.get(field):
+            filled[field] = value
+    if not filled:
+        return None
+    return "Current character state: " + _dumps(filled, sort_keys=True)
+
+
+@functools.cache
+def _load_env_once() -> None:
+    """Copy .env values into os.environ once per process, never overriding set vars.
+    
+    Like core.db.load_dev_env, this only happens when USE_DOTENV=1 (local
+    development), so one flag decides for the whole app.
+    """
+    if os.environ.get("USE_DOTENV") != "1":
+        return
+    from dotenv import dotenv_values
+    for key, value in dotenv_values().items():
+        os.environ.setdefault(key, value or "")
+
+
+def _openai_api_key() -> str:
+    """Return the OpenAI API key, reading .env only if it isn't already set."""
+    if "OPENAI_API_KEY" not in os.environ:
+        _load_env_once()
     
-    # Check for API key
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
-        raise ValueError("OPENAI_API_KEY environment variable not found. Please set it in your .env file.")
+        raise ValueError("OPENAI_API_KEY environment variable not found. Please set it, or put it in a .env file and set USE_DOTENV=1.")
+    return api_key
+
+
+@functools.lru_cache(maxsize=None)
+def _cache_usage_logger_class():
+    """Build the callback class lazily so LangChain stays an on-demand import."""
+    from langchain_core.callbacks import BaseCallbackHandler
     
-    # Initialize the LLM
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0.7,
-        api_key=api_key
-    )
+    class CacheUsageLogger(BaseCallbackHandler):
+        """Log how many prompt tokens OpenAI served from its prompt cache."""
+        
+        def on_llm_end(self, response, **kwargs):
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt_tokens = usage.get("prompt_tokens")
+            cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+            if prompt_tokens is None:
+                # Streamed calls only report usage on the final message
+                message = getattr(response.generations[0][0], "message", None)
+                metadata = getattr(message, "usage_metadata", None) or {}
+                prompt_tokens = metadata.get("input_tokens")
+                cached_tokens = (metadata.get("input_token_details") or {}).get("cache_read")
+            if prompt_tokens is not None:
+                logger.info("LLM call: %s prompt tokens, %s served from cache", prompt_tokens, cached_tokens or 0)
+    
+    return CacheUsageLogger
+
+
+# System prompt for the narrative model (see CharacterAgent.awrite_narrative)
+_NARRATIVE_PROMPT = (
+    "You are a fantasy author writing for D&D 5e players. Given a character "
+    "record as JSON, write a vivid backstory of two or three short paragraphs "
+    "that fits its class, species, background, alignment and personality. "
+    "Reply with the backstory text only."
+)
+
+
+# The process-wide event loop agent turns run on (see _agent_loop)
+_agent_loop_instance: Optional[asyncio.AbstractEventLoop] = None
+_agent_loop_lock = threading.Lock()
+
+
+def _agent_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the long-lived event loop that runs agent turns, starting it on first use.
+    
+    The loop runs forever in a daemon thread. Synchronous callers (the web
+    app, the CLI) submit their coroutines to it instead of creating and
+    closing a loop per call with asyncio.run.
+    """
+    global _agent_loop_instance
+    with _agent_loop_lock:
+        if _agent_loop_instance is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="dnd-agent-loop", daemon=True).start()
+            _agent_loop_instance = loop
+        return _agent_loop_instance
+
+
+def _run_on_agent_loop(coro):
+    """
+    Run `coro` on the agent loop and block until it returns its result.
+    
+    Raises:
+        RuntimeError: If called from a running event loop (await the async
+                      API, e.g. CharacterAgent.arun, instead).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run_coroutine_threadsafe(coro, _agent_loop()).result()
+    coro.close()
+    raise RuntimeError("Called the synchronous agent API from a running event loop; await the async API (e.g. arun) instead.")
+
+
+def _on_agent_loop(func: Callable) -> Callable:
+    """
+    Make an async function always execute on the agent loop.
+    
+    The cached ChatOpenAI clients (and the executors holding them) pool
+    async HTTP connections, which belong to the loop that opened them, so
+    every coroutine using them runs on the agent loop. Awaited from another
+    loop, the call is handed over and awaited from there.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = _agent_loop()
+        if asyncio.get_running_loop() is loop:
+            return await func(*args, **kwargs)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(func(*args, **kwargs), loop))
+    return wrapper
+
+
+def _streams_on_agent_loop(func: Callable) -> Callable:
+    """Like _on_agent_loop, for async generators: items are relayed to the caller's loop."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = _agent_loop()
+        caller = asyncio.get_running_loop()
+        if caller is loop:
+            async for item in func(*args, **kwargs):
+                yield item
+            return
+        
+        queue = asyncio.Queue()
+        end = object()
+        
+        async def relay():
+            error = None
+            try:
+                async for item in func(*args, **kwargs):
+                    caller.call_soon_threadsafe(queue.put_nowait, (item, None))
+            except Exception as e:
+                error = e
+            caller.call_soon_threadsafe(queue.put_nowait, (end, error))
+        
+        future = asyncio.run_coroutine_threadsafe(relay(), loop)
+        try:
+            while True:
+                item, error = await queue.get()
+                if item is end:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            future.cancel()
+    return wrapper
+
+
+# Set while the current task holds an LLM slot, so nested calls of one
+# request (e.g. a streamed _agenerate) don't take a second one
+_llm_slot_held: ContextVar[bool] = ContextVar("llm_slot_held", default=False)
+
+
+class _LLMLimits:
+    """
+    Concurrency cap plus request-rate limit (token bucket) for LLM requests.
+    
+    Acquired per chat-completion request by the limited chat models (see
+    _limited_chat_model_class), not per agent turn. All of them run on the
+    agent loop (see _on_agent_loop), so one semaphore and one limiter,
+    created there on first use, limit every session in the process.
+    """
+    
+    def __init__(self, max_concurrency: int, rpm: int):
+        self.max_concurrency = max_concurrency
+        self.rpm = rpm
+        self._semaphore = None
+        self._limiter = None
+    
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Wait for a free slot and rate-limit capacity, then hold the slot."""
+        if _llm_slot_held.get():
+            yield
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            if self.rpm:
+                from aiolimiter import AsyncLimiter
+                self._limiter = AsyncLimiter(self.rpm, 60)
+        async with self._semaphore:
+            if self._limiter is not None:
+                await self._limiter.acquire()
+            token = _llm_slot_held.set(True)
+            try:
+                yield
+            finally:
+                _llm_slot_held.reset(token)
+
+
+@functools.lru_cache(maxsize=None)
+def _llm_limits(max_concurrency: Optional[int] = None, rpm: Optional[int] = None) -> _LLMLimits:
+    """Return the shared limits for these settings.
+    
+    Defaults come from DND_MAX_CONCURRENCY (8) and DND_RPM (0 = no rate limit).
+    """
+    if max_concurrency is None:
+        max_concurrency = int(os.getenv("DND_MAX_CONCURRENCY", "8"))
+    if rpm is None:
+        rpm = int(os.getenv("DND_RPM", "0"))
+    return _LLMLimits(max_concurrency, rpm)
+
+
+# Instruction for the cheap model that condenses older chat history
+_HISTORY_SUMMARY_PROMPT = (
+    "Summarize the D&D character-creation decisions so far in at most 200 tokens. "
+    "Keep every choice the user made and any open questions."
+)
+
+
+class CharacterAgent:
+    """
+    Async-first wrapper around the character creation AgentExecutor.
+    
+    Each turn is driven through `AgentExecutor.ainvoke`, so the OpenAI
+    round-trips run on the event loop and every tool call returned in a
+    single assistant message is dispatched concurrently (the executor's
+    async step gathers all agent actions of one message). The async methods
+    always execute on the shared agent loop (see _on_agent_loop), whichever
+    loop awaits them, since the cached executor's HTTP clients belong to it.
+    
+    The executor runs on a cheap model; when smart routing is enabled a
+    stronger `narrative_llm` is kept for the one creative step, the backstory.
+    
+    Long chat histories are compressed before each turn: once there are more
+    than 2 * `history_keep` messages, everything but the last `history_keep`
+    is replaced by a summary written by `summary_llm`, so the prompt stays
+    bounded instead of re-sending the whole transcript every turn. Without a
+    `summary_llm` the history is a sliding window of the last
+    2 * `history_keep` messages instead.
+    
+    Each agent owns its session's `character` record and binds it for its
+    turns, unless the caller already bound one (as batch builds do).
+    
+    Every chat-completion request of its models (one per tool round of a
+    turn) waits on the limits they were built with (see create_agent), which
+    are shared by all agents created with the same settings, so fan-out
+    converges to the configured throughput instead of hitting 429s.
+    """
+    
+    history_keep = 10
+    
+    def __init__(self, executor: "AgentExecutor", narrative_llm=None, summary_llm=None,
+                 character: Optional[Dict[str, Any]] = None):
+        self.executor = executor
+        self.narrative_llm = narrative_llm
+        self.summary_llm = summary_llm
+        self.character = character if character is not None else new_character_data()
+        # Summaries keyed by a hash of the messages they replace, so a retried
+        # turn doesn't summarize the same history again
+        self._summaries: Dict[str, str] = {}
+    
+    def _bind(self):
+        """Bind this session's character unless the context already has one."""
+        if _current_character.get() is not None:
+            return contextlib.nullcontext()
+        return use_character(self.character)
+    
+    async def _acompress_history(self, chat_history: List) -> None:
+        """Replace all but the last `history_keep` messages with a summary, in place."""
+        if len(chat_history) <= 2 * self.history_keep:
+            return
+        if self.summary_llm is None:
+            del chat_history[:-2 * self.history_keep]
+            return
+        from langchain_core.messages import HumanMessage, SystemMessage
+        
+        older = chat_history[:-self.history_keep]
+        transcript = "\n".join(f"{message.type}: {message.content}" for message in older)
+        key = hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+        summary = self._summaries.get(key)
+        if summary is None:
+            response = await self.summary_llm.ainvoke([
+                SystemMessage(content=_HISTORY_SUMMARY_PROMPT),
+                HumanMessage(content=transcript)
+            ])
+            summary = response.content
+            if len(self._summaries) >= 64:
+                self._summaries.clear()
+            self._summaries[key] = summary
+        chat_history[:-self.history_keep] = [SystemMessage(content=f"Session so far: {summary}")]
+    
+    async def _aturn_inputs(self, user_input: str, chat_history: Optional[List]) -> Dict[str, Any]:
+        """Build the executor inputs for one turn, compressing the history first."""
+        from langchain_core.messages import SystemMessage
+        
+        if chat_history:
+            await self._acompress_history(chat_history)
+        inputs = {
+            "input": user_input,
+            "chat_history": chat_history or []
+        }
+        state = _character_state_text()
+        if state:
+            inputs["character_state"] = [SystemMessage(content=state)]
+        return inputs
+    
+    @_on_agent_loop
+    async def arun(self, user_input: str, chat_history: Optional[List] = None) -> str:
+        """Run one conversational turn asynchronously and return the agent's reply.
+        
+        A long `chat_history` list is compressed in place (see class docstring).
+        """
+        with self._bind():
+            inputs = await self._aturn_inputs(user_input, chat_history)
+            response = await self.executor.ainvoke(inputs, {"callbacks": [_cache_usage_logger_class()()]})
+        return response["output"]
+    
+    @_streams_on_agent_loop
+    async def astream(self, user_input: str, chat_history: Optional[List] = None) -> AsyncIterator[str]:
+        """Run one turn like `arun`, yielding the model's text as tokens arrive.
+        
+        Tool calls still run in between; only text content is yielded.
+        """
+        with self._bind():
+            inputs = await self._aturn_inputs(user_input, chat_history)
+            async for event in self.executor.astream_events(
+                inputs, {"callbacks": [_cache_usage_logger_class()()]}, version="v2"
+            ):
+                if event["event"] == "on_chat_model_stream":
+                    content = event["data"]["chunk"].content
+                    if content:
+                        yield content
+    
+    def run(self, user_input: str, chat_history: Optional[List] = None) -> str:
+        """Synchronous wrapper around `arun` for callers without an event loop.
+        
+        The turn runs on the shared agent loop (see _agent_loop), so no event
+        loop is created per call.
+        """
+        return _run_on_agent_loop(self.arun(user_input, chat_history))
+    
+    def invoke(self, inputs: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """Backward-compatible passthrough to `AgentExecutor.invoke`."""
+        with self._bind():
+            return self.executor.invoke(inputs, **kwargs)
+    
+    @_on_agent_loop
+    async def awrite_narrative(self) -> Optional[str]:
+        """
+        Write the current character's backstory with the narrative model.
+        
+        Meant to run once after the tools have filled in the rule fields.
+        Does nothing when smart routing is disabled.
+        
+        Returns:
+            The new backstory, or None if there is no narrative model.
+        """
+        if self.narrative_llm is None:
+            return None
+        from langchain_core.messages import HumanMessage, SystemMessage
+        
+        with self._bind():
+            response = await self.narrative_llm.ainvoke([
+                SystemMessage(content=_NARRATIVE_PROMPT),
+                HumanMessage(content=_dumps(_character(), sort_keys=True))
+            ])
+            update_character(backstory=response.content)
+        return response.content
+
+
+@functools.lru_cache(maxsize=None)
+def _configure_llm_cache() -> None:
+    """
+    Install LangChain's global LLM response cache, once per process.
+    
+    Identical prompt + model parameters are then answered from the cache
+    instead of OpenAI. With REDIS_URL set the cache is shared through Redis
+    (for several gunicorn workers); otherwise it is a local SQLite file,
+    DND_LLM_CACHE_PATH (default ".dnd_agent_cache.db"). DND_LLM_CACHE=0
+    disables it.
+    """
+    if os.environ.get("DND_LLM_CACHE", "1") == "0":
+        return
+    from langchain_core.globals import set_llm_cache
+    
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        try:
+            import redis
+        except ImportError:
+            logger.warning("REDIS_URL is set but redis is not installed; using the SQLite LLM cache")
+        else:
+            from langchain_community.cache import RedisCache
+            
+            set_llm_cache(RedisCache(redis.Redis.from_url(redis_url)))
+            return
+    
+    from langchain_community.cache import SQLiteCache
+    
+    set_llm_cache(SQLiteCache(database_path=os.getenv("DND_LLM_CACHE_PATH", ".dnd_agent_cache.db")))
+
+
+@functools.lru_cache(maxsize=None)
+def _limited_chat_model_class():
+    """Build the rate-limited ChatOpenAI subclass lazily (LangChain is an on-demand import)."""
+    from langchain_openai import ChatOpenAI
+    from pydantic import PrivateAttr
     
-    # Define all tools
-    tools = [
-        roll_ability_scores,
-        generate_point_buy_scores,
-        generate_standard_array_scores,
-        set_character_name,
-        set_character_class,
-        set_character_species,
-        set_character_background,
-        set_alignment,
-        set_background_personality,
-        set_physical_description,
-        set_backstory,
-        finalize_character,
-        get_character_sheet,
-        export_character_json,
-        export_character_markdown
-    ]
-    
-    # Create the prompt template
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a helpful D&D 5e character creation and editing assistant following Player's Handbook (PHB) rules only.
-
-Your role is to guide users through creating or editing complete, rule-compliant D&D 5e characters.
-
-WORKFLOW FOR NEW CHARACTERS:
-1. Ask the user for basic information:
-   - Character name
-   - Class and level (default level 1)
-   - Species (race) and subspecies if applicable
-   - Background
-   - Alignment
-
-2. Ask how they want to determine ability scores:
-   - Roll (4d6 drop lowest) - use roll_ability_scores
-   - 27 point buy - use generate_point_buy_scores and help allocate points
-   - Standard array (15, 14, 13, 12, 10, 8) - use generate_standard_array_scores
-
-3. After ability scores are set, if species is set, the system will automatically apply racial ability score increases.
-
-4. Ask for optional details:
-   - Background personality (trait, ideal, bond, flaw) - you can suggest options from the background or allow custom
-   - Physical description (age, height, weight, eyes, skin, hair)
-   - Backstory
-
-5. Call finalize_character to calculate all derived stats.
-
-6. Display the complete character sheet using get_character_sheet.
-
-7. Offer to export the character (JSON or Markdown).
-
-WORKFLOW FOR EDITING EXISTING CHARACTERS:
-- If the character already has data, you can see it in the current character_data
-- Ask the user what they'd like to change
-- Use the appropriate tools to modify fields (e.g., set_character_name, set_character_class, etc.)
-- You can also suggest improvements or additions to features that aren't yet in the sheet
-- After making changes, call finalize_character to recalculate derived stats
-- Show the updated character sheet using get_character_sheet
-
-IMPORTANT RULES:
-- Only use PHB classes, backgrounds, and species - no homebrew
-- Follow PHB rules exactly for ability scores, proficiencies, and features
-- Be friendly and conversational
-- Guide users step-by-step through the process
-- Always confirm important choices
-- After setting key information, show a summary using get_character_sheet
-- When editing, preserve existing data unless the user wants to change it
-
-Always use the available tools to perform actions."""),
+    class LimitedChatOpenAI(ChatOpenAI):
+        """ChatOpenAI that holds an _LLMLimits slot for each request it sends.
+        
+        Cache hits are answered before _agenerate/_astream and take no slot.
+        """
+        
+        # Private, so the limits stay out of the LLM cache key
+        _llm_limits: Optional[_LLMLimits] = PrivateAttr(default=None)
+        
+        async def _agenerate(self, *args, **kwargs):
+            async with self._llm_limits.slot():
+                return await super()._agenerate(*args, **kwargs)
+        
+        async def _astream(self, *args, **kwargs):
+            async with self._llm_limits.slot():
+                async for chunk in super()._astream(*args, **kwargs):
+                    yield chunk
+    
+    return LimitedChatOpenAI
+
+
+def _limited_chat_model(limits: _LLMLimits, **kwargs):
+    """Create a ChatOpenAI client whose async requests wait on `limits`."""
+    llm = _limited_chat_model_class()(api_key=_openai_api_key(), **kwargs)
+    llm._llm_limits = limits
+    return llm
+
+
+@functools.lru_cache(maxsize=8)
+def _chat_model_cached(model: str, temperature: float, limits: Optional[_LLMLimits] = None):
+    """Return a shared plain chat client for `model` and `temperature`.
+    
+    Its requests wait on `limits` (default: _llm_limits()).
+    """
+    return _limited_chat_model(limits or _llm_limits(), model=model, temperature=temperature)
+
+
+@functools.lru_cache(maxsize=None)
+def _langchain_tools() -> Tuple["BaseTool", ...]:
+    """
+    Wrap every registered tool as a LangChain tool, once per process.
+    
+    A tool function with a `coroutine` attribute gets it as its async
+    implementation, which the async executor awaits instead of running the
+    sync function on a worker thread.
+    
+    All executors share these objects, so the tool schemas sent to OpenAI
+    serialize identically on every call and stay part of the cached prompt
+    prefix.
+    """
+    from langchain_core.tools import tool
+    
+    tools = []
+    for func in _TOOLS:
+        wrapped = tool(func)
+        wrapped.coroutine = getattr(func, "coroutine", None)
+        tools.append(wrapped)
+    return tuple(tools)
+
+
+@functools.lru_cache(maxsize=None)
+def _agent_prompt() -> "ChatPromptTemplate":
+    """
+    Build the agent's prompt template, once per process (templates are immutable).
+    
+    SYSTEM_PREFIX is sent verbatim on every call so OpenAI can serve it from
+    its prompt cache; per-session data goes into the later messages.
+    """
+    from langchain_core.messages import SystemMessage
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    
+    return ChatPromptTemplate.from_messages([
+        SystemMessage(content=SYSTEM_PREFIX),
         MessagesPlaceholder(variable_name="chat_history"),
+        MessagesPlaceholder(variable_name="character_state", optional=True),
         ("human", "{input}"),
         MessagesPlaceholder(variable_name="agent_scratchpad")
     ])
+
+
+@functools.lru_cache(maxsize=8)
+def _build_executor_cached(model: str, temperature: float, tool_names: Tuple[str, ...],
+                           limits: _LLMLimits) -> "AgentExecutor":
+    """
+    Build the tool-calling AgentExecutor once per (model, temperature, tool set).
+    
+    Binding the tool schemas and compiling the prompt only has to happen once
+    per process. The executor keeps no per-session state (chat history and
+    the character are passed in on every call), so every session can share it.
+    
+    Args:
+        model: Chat model driving the agent
+        temperature: Sampling temperature
+        tool_names: Names of the registered tools to expose
+        limits: Limits every request of the agent's LLM waits on
+    
+    Returns:
+        A ready AgentExecutor.
+    """
+    from langchain.agents import AgentExecutor, create_openai_tools_agent
+    
+    # Initialize the LLM
+    # parallel_tool_calls lets one assistant message carry several independent
+    # tool calls, which the async executor then runs together
+    llm = _limited_chat_model(
+        limits,
+        model=model,
+        temperature=temperature,
+        streaming=True,
+        stream_usage=True,
+        model_kwargs={"parallel_tool_calls": True}
+    )
+    
+    # Select from the shared wrappers, keeping registration order
+    tools = [t for t in _langchain_tools() if t.name in tool_names]
     
     # Create the agent
-    agent = create_openai_tools_agent(llm, tools, prompt)
+    agent = create_openai_tools_agent(llm, tools, _agent_prompt())
     
     # Create the executor
-    agent_executor = AgentExecutor(
+    return AgentExecutor(
         agent=agent,
         tools=tools,
         verbose=True,
         handle_parsing_errors=True
     )
+
+
+def create_agent(cheap_model: str = "gpt-4o-mini", strong_model: str = "gpt-4o",
+                 character: Optional[Dict[str, Any]] = None,
+                 max_concurrency: Optional[int] = None, rpm: Optional[int] = None,
+                 tool_temperature: float = 0.0,
+                 history_mode: Optional[Literal["summary", "window"]] = None) -> CharacterAgent:
+    """
+    Create a character creation agent for one session.
+    
+    The executor (LLM, bound tools and prompt) is built once per model and
+    shared; each call only creates the lightweight CharacterAgent wrapper.
+    
+    Rule lookups and tool calls are driven by `cheap_model` with greedy
+    decoding (`tool_temperature` 0), since routing needs no creativity and
+    deterministic replies repeat well in the LLM cache. Unless
+    DND_USE_SMART_ROUTING is "0", `strong_model` is also set up, at a high
+    temperature, for the narrative pass (CharacterAgent.awrite_narrative).
+    
+    Args:
+        cheap_model: Model for the tool-driving agent
+        strong_model: Model for the creative backstory
+        character: The session's character record (edited in place);
+                   a new empty one if omitted
+        max_concurrency: Maximum LLM requests in flight across agents with these
+                         limits (default: DND_MAX_CONCURRENCY or 8)
+        rpm: Maximum LLM requests per minute, 0 for no limit
+             (default: DND_RPM or 0)
+        tool_temperature: Sampling temperature of the tool-driving agent
+        history_mode: How long chat histories are shortened: "summary"
+                      (older messages condensed by `cheap_model`) or
+                      "window" (older messages dropped, no extra LLM call)
+                      (default: DND_HISTORY_MODE or "summary")
+    
+    Returns:
+        A CharacterAgent whose `arun` awaits the executor and whose
+        `run` is a thin synchronous wrapper.
+    """
+    _configure_llm_cache()
+    limits = _llm_limits(max_concurrency, rpm)
+    tool_names = tuple(sorted(func.__name__ for func in _TOOLS))
+    agent_executor = _build_executor_cached(cheap_model, tool_temperature, tool_names, limits)
+    
+    # Smart routing: the premium model is only used for the narrative
+    narrative_llm = None
+    if os.environ.get("DND_USE_SMART_ROUTING", "1") != "0":
+        narrative_llm = _chat_model_cached(strong_model, 0.9, limits)
+    
+    # Condenses long chat histories; without it they are a sliding window
+    # (see CharacterAgent)
+    if history_mode is None:
+        history_mode = os.environ.get("DND_HISTORY_MODE", "summary")
+    if history_mode not in ("summary", "window"):
+        raise ValueError(f"Unknown history mode '{history_mode}', expected 'summary' or 'window'")
+    summary_llm = _chat_model_cached(cheap_model, 0.0, limits) if history_mode == "summary" else None
+    
+    return CharacterAgent(agent_executor, narrative_llm, summary_llm, character)
+
+
+# ============================================================================
+# BATCH GENERATION
+# ============================================================================
+
+# Appended to every batch spec so the agent builds without asking questions
+_BATCH_INSTRUCTIONS = (
+    "Create this character in one go without asking the user any questions. "
+    "Make any choices that are not specified yourself, following PHB rules, "
+    "then call finalize_character."
+)
+
+# Fields a one-shot build asks the model for; everything else is derived
+# by the tools from these choices
+CHOICE_FIELDS = (
+    "name", "class", "level", "species", "subspecies", "background", "alignment",
+    "ability_scores", "personality_trait", "ideal", "bond", "flaw",
+    "age", "height", "weight", "eyes", "skin", "hair", "backstory"
+)
+
+# Rule tables in the order they are worth including in a prompt
+_REFERENCE_SECTIONS = (
+    ("classes", "PHB CLASSES"),
+    ("species", "PHB SPECIES"),
+    ("backgrounds", "PHB BACKGROUNDS")
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _phb_token_counts() -> Dict[str, int]:
+    """
+    Token count of each prompt section of the PHB reference (o200k_base).
+    
+    Counted once per process on first use, so budget checks never re-encode
+    the tables. tiktoken comes with langchain-openai and may download the
+    encoding the first time, which is why this isn't done at import.
+    """
+    import tiktoken
+    
+    encoding = tiktoken.get_encoding("o200k_base")
+    counts = {
+        table: len(encoding.encode(f"{title}:\n{_PHB_CSV[table]}\n"))
+        for table, title in _REFERENCE_SECTIONS
+    }
+    counts["_base"] = len(encoding.encode(f"{CSV_LEGEND}\n\nALIGNMENTS: {', '.join(ALIGNMENTS)}"))
+    return counts
+
+
+def build_phb_reference(max_tokens: Optional[int] = None) -> str:
+    """
+    Assemble the PHB rule reference for a prompt.
+    
+    Args:
+        max_tokens: Optional token budget. Tables are added greedily in
+                    priority order (classes, species, backgrounds) while they
+                    fit, using the precomputed counts.
     
-    return agent_executor
+    Returns:
+        The legend, the selected CSV tables and the alignments.
+    """
+    remaining = None
+    if max_tokens is not None:
+        counts = _phb_token_counts()
+        remaining = max_tokens - counts["_base"]
+    
+    parts = [f"{CSV_LEGEND}\n\n"]
+    for table, title in _REFERENCE_SECTIONS:
+        if remaining is not None:
+            if counts[table] > remaining:
+                continue
+            remaining -= counts[table]
+        parts.append(f"{title}:\n{_PHB_CSV[table]}\n")
+    parts.append(f"ALIGNMENTS: {', '.join(ALIGNMENTS)}")
+    return "".join(parts)
+
+
+# Full rule reference for prompts that build a character without tools
+PHB_REFERENCE = build_phb_reference()
+
+_ONESHOT_PROMPT = (
+    "You are a D&D 5e character creator following Player's Handbook (PHB) rules only.\n"
+    "Create the requested character in one go, making any choices that are not "
+    "specified yourself. Assign the standard array (15, 14, 13, 12, 10, 8) to the "
+    "six abilities, before species increases; set subspecies to null when the "
+    "species has none. Use only the classes, species, backgrounds and "
+    "alignments below.\n"
+    f"{PHB_REFERENCE}"
+)
+
+
+_NULLABLE_CHOICE_STR = {"type": ["string", "null"]}
+
+# Strict JSON Schema for the model's choices. Structured Outputs (strict
+# mode) needs every property required and no extra keys; optional fields are
+# nullable instead. Numbers are enums (strict mode has no minimum/maximum):
+# levels 1-20 and standard array scores. That the scores are a permutation
+# of the array is checked locally by generate_standard_array_scores.
+CHOICES_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": list(CHOICE_FIELDS),
+    "properties": {
+        "name": {"type": "string"},
+        "class": {"type": "string", "enum": list(PHB_CLASSES)},
+        "level": {"type": "integer", "enum": list(range(1, 21))},
+        "species": {"type": "string", "enum": list(PHB_SPECIES)},
+        "subspecies": _NULLABLE_CHOICE_STR,
+        "background": {"type": "string", "enum": list(PHB_BACKGROUNDS)},
+        "alignment": {"type": "string", "enum": list(ALIGNMENTS)},
+        "ability_scores": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": list(ABILITIES),
+            "properties": {
+                ability: {"type": "integer", "enum": sorted(set(STANDARD_ARRAY))}
+                for ability in ABILITIES
+            }
+        },
+        "personality_trait": {"type": "string"},
+        "ideal": {"type": "string"},
+        "bond": {"type": "string"},
+        "flaw": {"type": "string"},
+        "age": {"type": ["integer", "null"]},
+        "height": _NULLABLE_CHOICE_STR,
+        "weight": _NULLABLE_CHOICE_STR,
+        "eyes": _NULLABLE_CHOICE_STR,
+        "skin": _NULLABLE_CHOICE_STR,
+        "hair": _NULLABLE_CHOICE_STR,
+        "backstory": {"type": "string"}
+    }
+}
+
+# response_format for every call that returns character choices (one-shot,
+# streaming and the Batch API)
+CHOICES_RESPONSE_FORMAT: Dict[str, Any] = {
+    "type": "json_schema",
+    "json_schema": {"name": "CharacterChoices", "strict": True, "schema": CHOICES_SCHEMA}
+}
+
+_validate_choices = fastjsonschema.compile(CHOICES_SCHEMA)
+
+
+def _spec_text(spec) -> str:
+    """Render a spec (free text or a dict of choices) as a character request."""
+    if isinstance(spec, dict):
+        choices = {k: v for k, v in spec.items() if k != "id"}
+        return "Create a D&D 5e character with " + ", ".join(f"{k}: {v}" for k, v in choices.items()) + "."
+    return spec
+
+
+def _spec_prompt(spec) -> str:
+    """Render a batch spec (free text or a dict of choices) as an agent request."""
+    return f"{_spec_text(spec)}\n\n{_BATCH_INSTRUCTIONS}"
+
+
+def _checked(reply: str) -> str:
+    """Return a tool's reply, raising ValueError if the tool rejected its input."""
+    if reply.startswith("Error"):
+        raise ValueError(reply)
+    return reply
+
+
+def apply_character_choices(choices: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn a model's character choices into a finalized character record.
+    
+    Choices go through the same tools the interactive agent uses, so invalid
+    picks are rejected and every derived stat comes from the PHB rules.
+    
+    Args:
+        choices: Dict with the CHOICE_FIELDS keys; "ability_scores" maps
+                 ability names to standard array values
+    
+    Returns:
+        A new character record.
+    
+    Raises:
+        ValueError: If a tool rejects a choice (the message is the tool's reply).
+    """
+    with use_character() as character:
+        if choices.get("name"):
+            _checked(set_character_name(choices["name"]))
+        if choices.get("class"):
+            _checked(set_character_class(choices["class"], choices.get("level") or 1))
+        # Species before background: the species resets the language list
+        # and the background then adds its own languages
+        if choices.get("species"):
+            _checked(set_character_species(choices["species"], choices.get("subspecies")))
+        if choices.get("background"):
+            _checked(set_character_background(choices["background"]))
+        if choices.get("alignment"):
+            _checked(set_alignment(choices["alignment"]))
+        scores = choices.get("ability_scores") or {}
+        _checked(generate_standard_array_scores(**{k.lower(): v for k, v in scores.items()}))
+        _checked(set_background_personality(
+            choices.get("personality_trait"), choices.get("ideal"),
+            choices.get("bond"), choices.get("flaw")
+        ))
+        _checked(set_physical_description(
+            choices.get("age"), choices.get("height"), choices.get("weight"),
+            choices.get("eyes"), choices.get("skin"), choices.get("hair")
+        ))
+        if choices.get("backstory"):
+            _checked(set_backstory(choices["backstory"]))
+        _checked(finalize_character())
+    return character
+
+
+def _parse_choices(content: str) -> Dict[str, Any]:
+    """Decode a schema-constrained choices reply and check it against CHOICES_SCHEMA.
+    
+    Raises:
+        fastjsonschema.JsonSchemaValueException: If the reply does not match.
+    """
+    choices = json.loads(content)
+    _validate_choices(choices)
+    return choices
+
+
+@_on_agent_loop
+async def abuild_character_oneshot(spec, model: str = "gpt-4o-mini") -> Dict[str, Any]:
+    """
+    Build a complete character with a single structured-output LLM call.
+    
+    The prompt inlines the PHB tables, so no tool round-trips are needed.
+    The reply is constrained to CHOICES_SCHEMA by OpenAI (strict json_schema
+    response format) and the choices are then applied locally.
+    
+    Args:
+        spec: Character request, either free text or a dict of choices
+        model: Chat model to use
+    
+    Returns:
+        The finalized character record.
+    
+    Raises:
+        ValueError: If the reply is malformed or a choice is rejected.
+    """
+    from langchain_core.messages import HumanMessage, SystemMessage
+    
+    llm = _chat_model_cached(model, 0.7).bind(response_format=CHOICES_RESPONSE_FORMAT)
+    response = await llm.ainvoke([
+        SystemMessage(content=_ONESHOT_PROMPT),
+        HumanMessage(content=_spec_text(spec))
+    ])
+    return apply_character_choices(_parse_choices(response.content))
+
+
+async def agenerate_character_sheets(specs: List[Any], max_concurrency: int = 4,
+                                     mode: Literal["agent", "oneshot"] = "oneshot") -> List[Dict[str, Any]]:
+    """
+    Build several characters concurrently.
+    
+    In "oneshot" mode every character is a single structured-output call
+    with the rules inlined. In "agent" mode each spec is driven through the
+    tool-calling agent (one shared agent, a separate character record per
+    task); with smart routing on, each backstory is then written by the
+    strong model. Either way the builds overlap their OpenAI round-trips,
+    and a semaphore caps how many are in flight to respect rate limits.
+    
+    Args:
+        specs: Character requests, either free text or dicts of choices
+               (e.g. {"class": "Wizard", "species": "Gnome"})
+        max_concurrency: Maximum number of builds running at once
+        mode: "oneshot" (one LLM call per character) or "agent"
+    
+    Returns:
+        One dict per spec (in order) with "character_data" and "character_sheet".
+    """
+    agent = create_agent() if mode == "agent" else None
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def build(spec) -> Dict[str, Any]:
+        async with semaphore:
+            if agent is None:
+                character = await abuild_character_oneshot(spec)
+            else:
+                character = new_character_data()
+                # Each gather task runs in its own context copy
+                _current_character.set(character)
+                await agent.arun(_spec_prompt(spec))
+                await agent.awrite_narrative()
+            return {
+                "character_data": character,
+                "character_sheet": _generate_character_sheet(character)
+            }
+    
+    return await asyncio.gather(*(build(spec) for spec in specs))
+
+
+def generate_character_sheets(specs: List[Any], max_concurrency: int = 4,
+                              mode: Literal["agent", "oneshot"] = "oneshot") -> List[Dict[str, Any]]:
+    """Synchronous wrapper around `agenerate_character_sheets` (runs on the agent loop)."""
+    return _run_on_agent_loop(agenerate_character_sheets(specs, max_concurrency, mode))
+
+
+@_streams_on_agent_loop
+async def astream_character_sheet(spec, mode: Literal["agent", "oneshot"] = "oneshot",
+                                  model: str = "gpt-4o-mini") -> AsyncIterator[str]:
+    """
+    Build a character, yielding the model's output as it is generated.
+    
+    In "oneshot" mode the streamed text is the model's JSON choices; in
+    "agent" mode it is the agent's reply text. Either way the last chunk is
+    the rendered character sheet, so callers can show progress right away.
+    
+    Args:
+        spec: Character request, either free text or a dict of choices
+        mode: "oneshot" (one structured-output call) or "agent"
+        model: Chat model to use
+    
+    Yields:
+        Text chunks, ending with the character sheet.
+    """
+    if mode == "agent":
+        agent = create_agent(cheap_model=model)
+        character = agent.character
+        async for chunk in agent.astream(_spec_prompt(spec)):
+            yield chunk
+    else:
+        from langchain_core.messages import HumanMessage, SystemMessage
+        
+        llm = _chat_model_cached(model, 0.7).bind(response_format=CHOICES_RESPONSE_FORMAT)
+        parts = []
+        async for message_chunk in llm.astream([
+            SystemMessage(content=_ONESHOT_PROMPT),
+            HumanMessage(content=_spec_text(spec))
+        ]):
+            if message_chunk.content:
+                parts.append(message_chunk.content)
+                yield message_chunk.content
+        character = apply_character_choices(_parse_choices("".join(parts)))
+    
+    yield "\n\n" + _generate_character_sheet(character)
+
+
+async def _print_stream(chunks: AsyncIterator[str]) -> str:
+    """Write streamed text to stdout as it arrives and return all of it."""
+    parts = []
+    async for chunk in chunks:
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+        parts.append(chunk)
+    return "".join(parts)
 
 
 def main():
     """Main interactive loop for character creation."""
+    from langchain_core.messages import HumanMessage, AIMessage
+    
     print("=" * 60)
     print("D&D 5e Character Creation Assistant")
     print("=" * 60)
@@ -1693,12 +2736,13 @@ def main():
     print("\nType 'quit' or 'exit' when finished.\n")
     
     try:
-        agent_executor = create_agent()
+        agent = create_agent()
     except ValueError as e:
         print(f"\nError: {e}")
-        print("Please set your OPENAI_API_KEY in a .env file.")
+        print("Please set OPENAI_API_KEY (or put it in a .env file and set USE_DOTENV=1).")
         return
     
+    # A list, not a bounded deque: the agent compresses it in place each turn
     chat_history = []
     
     while True:
@@ -1712,28 +2756,24 @@ def main():
                 print("\n" + "=" * 60)
                 print("Final Character Sheet:")
                 print("=" * 60)
-                sheet = get_character_sheet()
+                sheet = _generate_character_sheet(agent.character)
                 print(sheet)
                 print("Thanks for using the Character Creation Assistant!")
                 break
             
-            # Run the agent
-            response = agent_executor.invoke({
-                "input": user_input,
-                "chat_history": chat_history
-            })
-            
-            # Display the response
-            print(f"\nAssistant: {response['output']}")
+            # Run the agent, printing the reply as it streams in
+            print("\nAssistant: ", end="", flush=True)
+            output = _run_on_agent_loop(_print_stream(agent.astream(user_input, chat_history)))
+            print()
             
             # Update chat history
             chat_history.append(HumanMessage(content=user_input))
-            chat_history.append(AIMessage(content=response['output']))
+            chat_history.append(AIMessage(content=output))
             
         except KeyboardInterrupt:
             print("\n\nInterrupted by user.")
             print("\nFinal Character Sheet:")
-            sheet = get_character_sheet()
+            sheet = _generate_character_sheet(agent.character)
             print(sheet)
             break
         except Exception as e:
@@ -0,0 +1,831 @@
+"""
+PHB rule tables: classes and backgrounds.
+
+Pure data, kept out of dnd_character_agent so the agent module stays about
+behaviour. The literals are compiled into this module's cached bytecode.
+"""
+
+import operator
+import re
+import sys
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Tuple
+
+import numpy as np
+
+
+def intern_strings(obj: Any) -> Any:
+    """
+    Intern every str key and leaf of a nested dict/list table in place.
+
+    The compiler already shares equal literals within one module; interning
+    extends that to every module, so a skill or language name repeated
+    across the class, background and species tables is a single object.
+
+    Args:
+        obj: A str, or a dict/list/tuple nesting of str and other values
+
+    Returns:
+        The interned str, a new tuple for a tuple, or `obj` itself with its
+        contents interned.
+    """
+    if isinstance(obj, str):
+        return sys.intern(obj)
+    if isinstance(obj, dict):
+        items = [(intern_strings(k), intern_strings(v)) for k, v in obj.items()]
+        obj.clear()
+        obj.update(items)
+    elif isinstance(obj, list):
+        obj[:] = [intern_strings(v) for v in obj]
+    elif isinstance(obj, tuple):
+        return tuple(intern_strings(v) for v in obj)
+    return obj
+
+
+def freeze(obj: Any) -> Any:
+    """
+    Recursively turn dicts into read-only mappings and lists into tuples.
+
+    Frozen tables can be shared between threads and forked workers without
+    defensive copies.
+
+    Args:
+        obj: A dict/list/tuple nesting of plain values
+
+    Returns:
+        A MappingProxyType/tuple copy of `obj`; other values are returned as is.
+        Equal sequences come back as the same tuple object.
+    """
+    if isinstance(obj, dict):
+        return MappingProxyType({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        frozen = tuple(freeze(v) for v in obj)
+        try:
+            # Equal sublists (e.g. two classes' saving throws) share one tuple
+            return _CANONICAL_TUPLES.setdefault(frozen, frozen)
+        except TypeError:  # holds a mapping, so it is not hashable
+            return frozen
+    return obj
+
+
+# One tuple object per distinct frozen list, across all tables
+_CANONICAL_TUPLES: Dict[tuple, tuple] = {}
+
+# Entries repeated across several backgrounds
+COMMON_CLOTHES = sys.intern("A set of common clothes")
+POUCH_10GP = sys.intern("A belt pouch containing 10 gp")
+POUCH_15GP = sys.intern("A belt pouch containing 15 gp")
+GAMING_SET = sys.intern("One type of gaming set")
+
+
+# PHB Classes with their features
+# Contains all 12 core classes from D&D 5e Player's Handbook with:
+# - Hit dice, saving throw proficiencies, skill choices
+# - Starting equipment options
+# - Class features by level
+#
+# Stored column-wise as nested tuple literals, one row per class in
+# _CLASS_NAMES order: pure constants that the cached .pyc loads in one
+# unmarshal, zipped into the PHB_CLASSES records below.
+_CLASS_NAMES = (
+    "Barbarian", "Bard", "Cleric", "Druid", "Fighter", "Monk",
+    "Paladin", "Ranger", "Rogue", "Sorcerer", "Warlock", "Wizard"
+)
+_HIT_DICE = ("d12", "d8", "d8", "d8", "d10", "d8", "d10", "d10", "d8", "d6", "d8", "d6")
+_SKILL_CHOICES = (2, 3, 2, 2, 2, 2, 2, 3, 4, 2, 2, 2)
+_SAVING_THROWS = (
+    ("Strength", "Constitution"),  # Barbarian
+    ("Dexterity", "Charisma"),  # Bard
+    ("Wisdom", "Charisma"),  # Cleric
+    ("Intelligence", "Wisdom"),  # Druid
+    ("Strength", "Constitution"),  # Fighter
+    ("Strength", "Dexterity"),  # Monk
+    ("Wisdom", "Charisma"),  # Paladin
+    ("Strength", "Dexterity"),  # Ranger
+    ("Dexterity", "Intelligence"),  # Rogue
+    ("Constitution", "Charisma"),  # Sorcerer
+    ("Wisdom", "Charisma"),  # Warlock
+    ("Intelligence", "Wisdom")  # Wizard
+)
+_SKILLS = (
+    ("Animal Handling", "Athletics", "Intimidation", "Nature", "Perception", "Survival"),  # Barbarian
+    ("Athletics", "Acrobatics", "Sleight of Hand", "Stealth", "Arcana", "History", "Investigation", "Nature", "Religion", "Animal Handling", "Insight", "Medicine", "Perception", "Survival", "Deception", "Intimidation", "Performance", "Persuasion"),  # Bard
+    ("History", "Insight", "Medicine", "Persuasion", "Religion"),  # Cleric
+    ("Arcana", "Animal Handling", "Insight", "Medicine", "Nature", "Perception", "Religion", "Survival"),  # Druid
+    ("Acrobatics", "Animal Handling", "Athletics", "History", "Insight", "Intimidation", "Perception", "Survival"),  # Fighter
+    ("Acrobatics", "Athletics", "History", "Insight", "Religion", "Stealth"),  # Monk
+    ("Athletics", "Insight", "Intimidation", "Medicine", "Persuasion", "Religion"),  # Paladin
+    ("Animal Handling", "Athletics", "Insight", "Investigation", "Nature", "Perception", "Stealth", "Survival"),  # Ranger
+    ("Acrobatics", "Athletics", "Deception", "Insight", "Intimidation", "Investigation", "Perception", "Performance", "Persuasion", "Sleight of Hand", "Stealth"),  # Rogue
+    ("Arcana", "Deception", "Insight", "Intimidation", "Persuasion", "Religion"),  # Sorcerer
+    ("Arcana", "Deception", "History", "Intimidation", "Investigation", "Nature", "Religion"),  # Warlock
+    ("Arcana", "History", "Insight", "Investigation", "Medicine", "Religion")  # Wizard
+)
+_ARMOR = (
+    ("Light armor", "Medium armor", "Shields"),  # Barbarian
+    ("Light armor",),  # Bard
+    ("Light armor", "Medium armor", "Shields"),  # Cleric
+    ("Light armor", "Medium armor", "Shields (nonmetal)"),  # Druid
+    ("All armor", "Shields"),  # Fighter
+    (),  # Monk
+    ("All armor", "Shields"),  # Paladin
+    ("Light armor", "Medium armor", "Shields"),  # Ranger
+    ("Light armor",),  # Rogue
+    (),  # Sorcerer
+    ("Light armor",),  # Warlock
+    ()  # Wizard
+)
+_WEAPONS = (
+    ("Simple weapons", "Martial weapons"),  # Barbarian
+    ("Simple weapons", "Hand crossbows", "Longswords", "Rapiers", "Shortswords"),  # Bard
+    ("Simple weapons",),  # Cleric
+    ("Clubs", "Daggers", "Darts", "Javelins", "Maces", "Quarterstaffs", "Scimitars", "Sickles", "Slings", "Spears"),  # Druid
+    ("Simple weapons", "Martial weapons"),  # Fighter
+    ("Simple weapons", "Shortswords"),  # Monk
+    ("Simple weapons", "Martial weapons"),  # Paladin
+    ("Simple weapons", "Martial weapons"),  # Ranger
+    ("Simple weapons", "Hand crossbows", "Longswords", "Rapiers", "Shortswords"),  # Rogue
+    ("Daggers", "Darts", "Slings", "Quarterstaffs", "Light crossbows"),  # Sorcerer
+    ("Simple weapons",),  # Warlock
+    ("Daggers", "Darts", "Slings", "Quarterstaffs", "Light crossbows")  # Wizard
+)
+_TOOLS = (
+    (),  # Barbarian
+    ("Three musical instruments of your choice",),  # Bard
+    (),  # Cleric
+    ("Herbalism kit",),  # Druid
+    (),  # Fighter
+    (),  # Monk
+    (),  # Paladin
+    (),  # Ranger
+    ("Thieves' tools",),  # Rogue
+    (),  # Sorcerer
+    (),  # Warlock
+    ()  # Wizard
+)
+_STARTING_EQUIPMENT = (
+    # Barbarian
+    (
+        "(a) a greataxe or (b) any martial melee weapon",
+        "(a) two handaxes or (b) any simple weapon",
+        "An explorer's pack and four javelins"
+    ),
+    # Bard
+    (
+        "(a) a rapier, (b) a longsword, or (c) any simple weapon",
+        "(a) a diplomat's pack or (b) an entertainer's pack",
+        "(a) a lute or (b) any other musical instrument",
+        "Leather armor and a dagger"
+    ),
+    # Cleric
+    (
+        "(a) a mace or (b) a warhammer (if proficient)",
+        "(a) scale mail, (b) leather armor, or (c) chain mail (if proficient)",
+        "(a) a light crossbow and 20 bolts or (b) any simple weapon",
+        "(a) a priest's pack or (b) an explorer's pack",
+        "A shield and a holy symbol"
+    ),
+    # Druid
+    (
+        "(a) a wooden shield or (b) any simple weapon",
+        "(a) a scimitar or (b) any simple melee weapon",
+        "Leather armor, an explorer's pack, and a druidic focus"
+    ),
+    # Fighter
+    (
+        "(a) chain mail or (b) leather armor, longbow, and 20 arrows",
+        "(a) a martial weapon and a shield or (b) a martial weapon and two martial weapons",
+        "(a) a light crossbow and 20 bolts or (b) two handaxes",
+        "(a) a dungeoneer's pack or (b) an explorer's pack"
+    ),
+    # Monk
+    (
+        "(a) a shortsword or (b) any simple weapon",
+        "(a) a dungeoneer's pack or (b) an explorer's pack",
+        "10 darts"
+    ),
+    # Paladin
+    (
+        "(a) a martial weapon and a shield or (b) two martial weapons",
+        "(a) five javelins or (b) any simple melee weapon",
+        "(a) a priest's pack or (b) an explorer's pack",
+        "Chain mail and a holy symbol"
+    ),
+    # Ranger
+    (
+        "(a) scale mail or (b) leather armor",
+        "(a) two shortswords or (b) two simple melee weapons",
+        "(a) a dungeoneer's pack or (b) an explorer's pack",
+        "A longbow and a quiver of 20 arrows"
+    ),
+    # Rogue
+    (
+        "(a) a rapier or (b) a shortsword",
+        "(a) a shortbow and quiver of 20 arrows or (b) a shortsword",
+        "(a) a burglar's pack, (b) a dungeoneer's pack, or (c) an explorer's pack",
+        "Leather armor, two daggers, and thieves' tools"
+    ),
+    # Sorcerer
+    (
+        "(a) a light crossbow and 20 bolts or (b) any simple weapon",
+        "(a) a component pouch or (b) an arcane focus",
+        "(a) a dungeoneer's pack or (b) an explorer's pack",
+        "Two daggers"
+    ),
+    # Warlock
+    (
+        "(a) a light crossbow and 20 bolts or (b) any simple weapon",
+        "(a) a component pouch or (b) an arcane focus",
+        "(a) a scholar's pack or (b) a dungeoneer's pack",
+        "Leather armor, any simple weapon, and two daggers"
+    ),
+    # Wizard
+    (
+        "(a) a quarterstaff or (b) a dagger",
+        "(a) a component pouch or (b) an arcane focus",
+        "(a) a scholar's pack or (b) an explorer's pack",
+        "A spellbook"
+    )
+)
+# (level, features gained) pairs
+_FEATURES = (
+    # Barbarian
+    (
+        (1, ("Rage", "Unarmored Defense")),
+        (2, ("Reckless Attack", "Danger Sense")),
+        (3, ("Primal Path", "Primal Knowledge"))
+    ),
+    # Bard
+    (
+        (1, ("Spellcasting", "Bardic Inspiration (d6)")),
+        (2, ("Jack of All Trades", "Song of Rest (d6)")),
+        (3, ("Bard College", "Expertise"))
+    ),
+    # Cleric
+    (
+        (1, ("Spellcasting", "Divine Domain")),
+        (2, ("Channel Divinity (1/rest)", "Divine Domain feature"))
+    ),
+    # Druid
+    (
+        (1, ("Spellcasting", "Druidic")),
+        (2, ("Wild Shape", "Druid Circle"))
+    ),
+    # Fighter
+    (
+        (1, ("Fighting Style", "Second Wind")),
+        (2, ("Action Surge (one use)",)),
+        (3, ("Martial Archetype",))
+    ),
+    # Monk
+    (
+        (1, ("Unarmored Defense", "Martial Arts")),
+        (2, ("Ki", "Unarmored Movement")),
+        (3, ("Monastic Tradition", "Deflect Missiles"))
+    ),
+    # Paladin
+    (
+        (1, ("Divine Sense", "Lay on Hands")),
+        (2, ("Fighting Style", "Spellcasting", "Divine Smite")),
+        (3, ("Divine Health", "Sacred Oath"))
+    ),
+    # Ranger
+    (
+        (1, ("Favored Enemy", "Natural Explorer")),
+        (2, ("Fighting Style", "Spellcasting")),
+        (3, ("Ranger Archetype", "Primeval Awareness"))
+    ),
+    # Rogue
+    (
+        (1, ("Expertise", "Sneak Attack (1d6)", "Thieves' Cant")),
+        (2, ("Cunning Action",)),
+        (3, ("Roguish Archetype",))
+    ),
+    # Sorcerer
+    (
+        (1, ("Spellcasting", "Sorcerous Origin")),
+        (2, ("Font of Magic",)),
+        (3, ("Metamagic",))
+    ),
+    # Warlock
+    (
+        (1, ("Otherworldly Patron", "Pact Magic")),
+        (2, ("Eldritch Invocations (2 known)",)),
+        (3, ("Pact Boon",))
+    ),
+    # Wizard
+    (
+        (1, ("Spellcasting", "Arcane Recovery")),
+        (2, ("Arcane Tradition",))
+    )
+)
+
+PHB_CLASSES = {
+    name: {
+        "hit_die": hit_die,
+        "saving_throws": saving_throws,
+        "skill_choices": skill_choices,
+        "skills": skills,
+        "armor": armor,
+        "weapons": weapons,
+        "tools": tools,
+        "starting_equipment": {"options": starting_equipment},
+        "features": dict(features)
+    }
+    for name, hit_die, saving_throws, skill_choices, skills, armor, weapons, tools,
+        starting_equipment, features in zip(
+            _CLASS_NAMES, _HIT_DICE, _SAVING_THROWS, _SKILL_CHOICES, _SKILLS, _ARMOR,
+            _WEAPONS, _TOOLS, _STARTING_EQUIPMENT, _FEATURES
+        )
+}
+
+# PHB Backgrounds
+PHB_BACKGROUNDS = {
+    "Acolyte": {
+        "skill_proficiencies": ["Insight", "Religion"],
+        "languages": ["Two of your choice"],
+        "equipment": ["A holy symbol", "A prayer book or prayer wheel", "5 sticks of incense", "Vestments", COMMON_CLOTHES, POUCH_15GP],
+        "feature": "Shelter of the Faithful",
+        "personality_traits": [
+            "I idolize a particular hero of my faith and constantly refer to that person's deeds and example.",
+            "I can find common ground between the fiercest enemies, empathizing with them and always working toward peace.",
+            "I see omens in every event and action. The gods try to speak to us, we just need to listen.",
+            "Nothing can shake my optimistic attitude.",
+            "I quote (or misquote) sacred texts and proverbs in almost every situation.",
+            "I am tolerant (or intolerant) of other faiths and respect (or condemn) the worship of other gods.",
+            "I've enjoyed fine food, drink, and high society among my temple's elite. Rough living grates on me.",
+            "I've spent so long in the temple that I have little practical experience dealing with people in the outside world."
+        ],
+        "ideals": [
+            "Tradition. The ancient traditions of worship and sacrifice must be preserved and upheld. (Lawful)",
+            "Charity. I always try to help those in need, no matter what the personal cost. (Good)",
+            "Change. We must help bring about the changes the gods are constantly working in the world. (Chaotic)",
+            "Power. I hope to one day rise to the top of my faith's religious hierarchy. (Lawful)",
+            "Faith. I trust that my deity will guide my actions. I have faith that if I work hard, things will go well. (Lawful)",
+            "Aspiration. I seek to prove myself worthy of my god's favor by matching my actions against their teachings. (Any)"
+        ],
+        "bonds": [
+            "I would die to recover an ancient relic of my faith that was lost long ago.",
+            "I will someday get revenge on the corrupt temple hierarchy who branded me a heretic.",
+            "I owe my life to the priest who took me in when my parents died.",
+            "Everything I do is for the common people.",
+            "I will do anything to protect the temple where I served.",
+            "I seek to preserve a sacred text that my enemies consider heretical and seek to destroy."
+        ],
+        "flaws": [
+            "I judge others harshly, and myself even more severely.",
+            "I put too much trust in those who wield power within my temple's hierarchy.",
+            "My piety sometimes leads me to blindly trust those that profess faith in my god.",
+            "I am inflexible in my thinking.",
+            "I am suspicious of strangers and expect the worst of them.",
+            "Once I pick a goal, I become obsessed with it to the detriment of everything else in my life."
+        ]
+    },
+    "Criminal": {
+        "skill_proficiencies": ["Deception", "Stealth"],
+        "tool_proficiencies": [GAMING_SET, "Thieves' tools"],
+        "equipment": ["A crowbar", "A set of dark common clothes including a hood", POUCH_15GP],
+        "feature": "Criminal Contact",
+        "personality_traits": [
+            "I always have a plan for what to do when things go wrong.",
+            "I am always calm, no matter what the situation. I never raise my voice or let my emotions control me.",
+            "The first thing I do in a new place is note the locations of everything valuable—or where such things could be hidden.",
+            "I would rather make a new friend than a new enemy.",
+            "I am incredibly slow to trust. Those who seem the fairest often have the most to hide.",
+            "I don't pay attention to the risks in a situation. Never tell me the odds.",
+            "The best way to get me to do something is to tell me I can't do it.",
+            "I blow up at the slightest insult."
+        ],
+        "ideals": [
+            "Honor. I don't steal from others in the trade. (Lawful)",
+            "Freedom. Chains are meant to be broken, as are those who would forge them. (Chaotic)",
+            "Charity. I steal from the wealthy so that I can help people in need. (Good)",
+            "Greed. I will do whatever it takes to become wealthy. (Evil)",
+            "People. I'm loyal to my friends, not to any ideals, and everyone else can take a trip down the Styx for all I care. (Neutral)",
+            "Redemption. There's a spark of good in everyone. (Good)"
+        ],
+        "bonds": [
+            "I'm trying to pay off an old debt I owe to a generous benefactor.",
+            "My ill-gotten gains go to support my family.",
+            "Something important was taken from me, and I aim to steal it back.",
+            "I will become the greatest thief that ever lived.",
+            "I'm guilty of a terrible crime. I hope I can redeem myself for it.",
+            "Someone I loved died because of a mistake I made. That will never happen again."
+        ],
+        "flaws": [
+            "When I see something valuable, I can't think about anything but how to steal it.",
+            "When faced with a choice between money and my friends, I usually choose the money.",
+            "If there's a plan, I'll forget it. If I don't forget it, I'll ignore it.",
+            "I have a 'tell' that reveals when I'm lying.",
+            "I turn tail and run when things look bad.",
+            "An innocent person is in prison for a crime that I committed. I'm okay with that."
+        ]
+    },
+    "Folk Hero": {
+        "skill_proficiencies": ["Animal Handling", "Survival"],
+        "tool_proficiencies": ["One type of artisan's tools", "Vehicles (land)"],
+        "equipment": ["A set of artisan's tools (one of your choice)", "A shovel", "An iron pot", COMMON_CLOTHES, POUCH_10GP],
+        "feature": "Rustic Hospitality",
+        "personality_traits": [
+            "I judge people by their actions, not their words.",
+            "If someone is in trouble, I'm always ready to lend help.",
+            "When I set my mind to something, I follow through no matter what gets in my way.",
+            "I have a strong sense of fair play and always try to find the most equitable solution to arguments.",
+            "I'm confident in my own abilities and do what I can to instill confidence in others.",
+            "Thinking is for other people. I prefer action.",
+            "I misuse long words in an attempt to sound smarter.",
+            "I get bored easily. When am I going to get on with my destiny?"
+        ],
+        "ideals": [
+            "Respect. People deserve to be treated with dignity and respect. (Good)",
+            "Fairness. No one should get preferential treatment before the law, and no one is above the law. (Lawful)",
+            "Freedom. Tyrants must not be allowed to oppress the people. (Chaotic)",
+            "Might. If I become strong, I will take what I want—what I deserve. (Evil)",
+            "Sincerity. There's no good in pretending to be something I'm not. (Neutral)",
+            "Destiny. Nothing and no one can steer me away from my higher calling. (Any)"
+        ],
+        "bonds": [
+            "I have a family, but I have no idea where they are. One day, I hope to see them again.",
+            "I worked the land, I love the land, and I will protect the land.",
+            "A proud noble once gave me a horrible beating, and I will take my revenge on any bully I encounter.",
+            "My tools are symbols of my past life, and I carry them so that I will never forget my roots.",
+            "I protect those who cannot protect themselves.",
+            "I wish my childhood sweetheart had come with me to pursue my destiny."
+        ],
+        "flaws": [
+            "The tyrant who rules my land will stop at nothing to see me killed.",
+            "I'm convinced of the significance of my destiny, and blind to my shortcomings and the risk of failure.",
+            "The people who knew me when I was young know my shameful secret, so I can never go home again.",
+            "I have a weakness for the vices of the city, especially hard drink.",
+            "Secretly, I believe that things would be better if I were a tyrant lording over the land.",
+            "I have trouble trusting in my allies."
+        ]
+    },
+    "Noble": {
+        "skill_proficiencies": ["History", "Persuasion"],
+        "tool_proficiencies": [GAMING_SET],
+        "languages": ["One of your choice"],
+        "equipment": ["Fine clothes", "A signet ring", "A scroll of pedigree", "A purse containing 25 gp"],
+        "feature": "Position of Privilege",
+        "personality_traits": [
+            "My eloquent flattery makes everyone I talk to feel like the most wonderful and important person in the world.",
+            "The common folk love me for my kindness and generosity.",
+            "No one could doubt by looking at my regal bearing that I am a cut above the unwashed masses.",
+            "I take great pains to always look my best and follow the latest fashions.",
+            "I don't like to get my hands dirty, and I won't be caught dead in unsuitable accommodations.",
+            "Despite my noble birth, I do not place myself above other folk. We all have the same blood.",
+            "My favor, once lost, is lost forever.",
+            "If you do me an injury, I will crush you, ruin your name, and salt your fields."
+        ],
+        "ideals": [
+            "Respect. Respect is due to me because of my position, but all people regardless of station deserve to be treated with dignity. (Good)",
+            "Responsibility. It is my duty to respect the authority of those above me, just as those below me must respect mine. (Lawful)",
+            "Independence. I must prove that I can handle myself without the coddling of my family. (Chaotic)",
+            "Power. If I can attain more power, no one will tell me what to do. (Evil)",
+            "Family. Blood runs thicker than water. (Any)",
+            "Noble Obligation. It is my duty to protect and care for the people beneath me. (Good)"
+        ],
+        "bonds": [
+            "I will face any challenge to win the approval of my family.",
+            "My house's alliance with another noble family must be sustained at all costs.",
+            "Nothing is more important than the other members of my family.",
+            "I am in love with the heir of a family that my family despises.",
+            "My loyalty to my sovereign is unwavering.",
+            "The common folk must see me as a hero of the people."
+        ],
+        "flaws": [
+            "I secretly believe that everyone is beneath me.",
+            "I hide a truly scandalous secret that could ruin my family forever.",
+            "I too often hear veiled insults and threats in every word addressed to me, and I'm quick to anger.",
+            "I have an insatiable desire for carnal pleasures.",
+            "In fact, the world does revolve around me.",
+            "By my words and actions, I often bring shame to my family."
+        ]
+    },
+    "Sage": {
+        "skill_proficiencies": ["Arcana", "History"],
+        "languages": ["Two of your choice"],
+        "equipment": ["A bottle of black ink", "A quill", "A small knife", "A letter from a dead colleague posing a question you have not yet been able to answer", COMMON_CLOTHES, POUCH_10GP],
+        "feature": "Researcher",
+        "personality_traits": [
+            "I use polysyllabic words that convey the impression of great erudition.",
+            "I've read every book in the world's greatest libraries—or I like to boast that I have.",
+            "I'm used to helping out those who aren't as smart as I am, and I patiently explain anything and everything to others.",
+            "There's nothing I like more than a good mystery.",
+            "I'm willing to listen to every side of an argument before I make my own judgment.",
+            "I... speak... slowly... when talking... to idiots... which... almost... everyone... is... compared... to me.",
+            "I am horribly, horribly awkward in social situations.",
+            "I'm convinced that people are always trying to steal my secrets."
+        ],
+        "ideals": [
+            "Knowledge. The path to power and self-improvement is through knowledge. (Neutral)",
+            "Beauty. What is beautiful points us beyond itself toward what is true. (Good)",
+            "Logic. Emotions must not cloud our logical thinking. (Lawful)",
+            "No Limits. Nothing should fetter the infinite possibility inherent in all existence. (Chaotic)",
+            "Power. Knowledge is the path to power and domination. (Evil)",
+            "Self-Improvement. The goal of a life of study is the betterment of oneself. (Any)"
+        ],
+        "bonds": [
+            "It is my duty to protect my students.",
+            "I have an ancient text that holds terrible secrets that must not fall into the wrong hands.",
+            "I work to preserve a library, university, scriptorium, or monastery.",
+            "My life's work is a series of tomes related to a specific field of lore.",
+            "I've been searching my whole life for the answer to a certain question.",
+            "I sold my soul for knowledge. I hope to do great deeds and win it back."
+        ],
+        "flaws": [
+            "I am easily distracted by the promise of information.",
+            "Most people scream and run when they see a demon. I stop and take notes on its anatomy.",
+            "Unlocking an ancient mystery is worth the price of a civilization.",
+            "I overlook obvious solutions in favor of complicated ones.",
+            "I speak without really thinking through my words, invariably insulting others.",
+            "I can't keep a secret to save my life, or anyone else's."
+        ]
+    },
+    "Soldier": {
+        "skill_proficiencies": ["Athletics", "Intimidation"],
+        "tool_proficiencies": [GAMING_SET, "Vehicles (land)"],
+        "equipment": ["An insignia of rank", "A trophy taken from a fallen enemy", "A set of bone dice or deck of cards", COMMON_CLOTHES, POUCH_10GP],
+        "feature": "Military Rank",
+        "personality_traits": [
+            "I'm always polite and respectful.",
+            "I'm haunted by memories of war. I can't get the images of violence out of my mind.",
+            "I've lost too many friends, and I'm slow to make new ones.",
+            "I'm full of inspiring and cautionary tales from my military experience relevant to almost every combat situation.",
+            "I can stare down a hell hound without flinching.",
+            "I enjoy being strong and like breaking things.",
+            "I have a crude sense of humor.",
+            "I face problems head-on. A simple, direct solution is the best path to success."
+        ],
+        "ideals": [
+            "Greater Good. Our lot is to lay down our lives in defense of others. (Good)",
+            "Responsibility. I do what I must and obey just authority. (Lawful)",
+            "Independence. When people follow orders blindly, they embrace a kind of tyranny. (Chaotic)",
+            "Might. In life as in war, the stronger force wins. (Evil)",
+            "Live and Let Live. Ideals aren't worth killing over or going to war for. (Neutral)",
+            "Nation. My city, nation, or people are all that matter. (Any)"
+        ],
+        "bonds": [
+            "I would still lay down my life for the people I served with.",
+            "Someone saved my life on the battlefield. To this day, I will never leave a friend behind.",
+            "My honor is my life.",
+            "I'll never forget the crushing defeat my company suffered or the enemies who dealt it.",
+            "Those who fight beside me are those worth dying for.",
+            "I fight for those who cannot fight for themselves."
+        ],
+        "flaws": [
+            "The monstrous enemy we faced in battle still leaves me quivering with fear.",
+            "I have little respect for anyone who is not a proven warrior.",
+            "I made a terrible mistake in battle that cost many lives—and I would do anything to keep that mistake secret.",
+            "My hatred of my enemies is blind and unreasoning.",
+            "I obey the law, even if the law causes misery.",
+            "I'd rather eat my armor than admit when I'm wrong."
+        ]
+    },
+    "Urchin": {
+        "skill_proficiencies": ["Sleight of Hand", "Stealth"],
+        "tool_proficiencies": ["Disguise kit", "Thieves' tools"],
+        "equipment": ["A small knife", "A map of the city you grew up in", "A pet mouse", "A token to remember your parents by", COMMON_CLOTHES, POUCH_10GP],
+        "feature": "City Secrets",
+        "personality_traits": [
+            "I hide scraps of food and trinkets away in my pockets.",
+            "I ask a lot of questions.",
+            "I like to squeeze into small places where no one else can get to me.",
+            "I sleep with my back to a wall or tree, with everything I own wrapped in a bundle in my arms.",
+            "I eat like a pig and have bad manners.",
+            "I think anyone who's nice to me is hiding evil intent.",
+            "I don't like to bathe.",
+            "I bluntly say what other people are hinting at or hiding."
+        ],
+        "ideals": [
+            "Respect. All people, rich or poor, deserve respect. (Good)",
+            "Community. We have to take care of each other, because no one else is going to do it. (Lawful)",
+            "Change. The low are lifted up, and the high and mighty are brought down. Change is the nature of things. (Chaotic)",
+            "Retribution. The rich need to be shown what life and death are like in the gutters. (Evil)",
+            "People. I help the people who help me—that's what keeps us alive. (Neutral)",
+            "Aspiration. I'm going to prove that I'm worthy of a better life. (Any)"
+        ],
+        "bonds": [
+            "My town or city is my home, and I'll fight to defend it.",
+            "I sponsor an orphanage to keep others from enduring what I was forced to endure.",
+            "I owe my survival to another urchin who taught me to live on the streets.",
+            "I owe a debt I can never repay to the person who took pity on me.",
+            "I escaped my life of poverty by robbing an important person, and I'm wanted for it.",
+            "No one else should have to endure the hardships I've been through."
+        ],
+        "flaws": [
+            "If I'm outnumbered, I will run away from a fight.",
+            "Gold seems like a lot of money to me, and I'll do just about anything for more of it.",
+            "I will never fully trust anyone other than myself.",
+            "I'd rather kill someone in their sleep than fight fair.",
+            "It's not stealing if I need it more than someone else.",
+            "People who can't take care of themselves get what they deserve."
+        ]
+    }
+}
+# Not every background grants tools or languages; give all of them the
+# keys (frozen to the shared empty tuple) so readers can subscript directly
+for _bg in PHB_BACKGROUNDS.values():
+    _bg.setdefault("tool_proficiencies", [])
+    _bg.setdefault("languages", [])
+del _bg
+PHB_BACKGROUNDS = freeze(intern_strings(PHB_BACKGROUNDS))
+
+intern_strings(PHB_CLASSES)
+
+# Deeply read-only tables: callers can hold and share references to any part
+# of them without defensive copies
+PHB_CLASSES = freeze(PHB_CLASSES)
+FROZEN_PHB_CLASSES = PHB_CLASSES
+
+# Frozensets for "is X a class option" checks; the tables keep the ordered
+# tuples for display and prompts
+CLASS_SAVING_THROWS = {name: frozenset(c["saving_throws"]) for name, c in PHB_CLASSES.items()}
+CLASS_SKILLS = {name: frozenset(c["skills"]) for name, c in PHB_CLASSES.items()}
+CLASS_ARMOR = {name: frozenset(c["armor"]) for name, c in PHB_CLASSES.items()}
+CLASS_WEAPONS = {name: frozenset(c["weapons"]) for name, c in PHB_CLASSES.items()}
+
+
+def _classes_by(field: str) -> Dict[str, FrozenSet[str]]:
+    """Invert one class list field into value -> names of the classes listing it."""
+    index: Dict[str, set] = {}
+    for name, c in PHB_CLASSES.items():
+        for value in c[field]:
+            index.setdefault(value, set()).add(name)
+    return {value: frozenset(names) for value, names in index.items()}
+
+
+# Reverse indexes, e.g. SKILL_TO_CLASSES["Stealth"] -> classes offering it
+SKILL_TO_CLASSES = _classes_by("skills")
+SAVE_TO_CLASSES = _classes_by("saving_throws")
+WEAPON_TO_CLASSES = _classes_by("weapons")
+
+# Class features as a tuple indexed by level (index 0 unused, 1-20 dense),
+# so a build reads FEATURES_BY_LEVEL[name][1:level + 1] without hashing
+MAX_LEVEL = 20
+FEATURES_BY_LEVEL = {
+    name: tuple(c["features"].get(level, ()) for level in range(MAX_LEVEL + 1))
+    for name, c in PHB_CLASSES.items()
+}
+
+# Splits "(a) X, (b) Y, or (c) Z" into its alternatives
+_OPTION_SPLIT = re.compile(r",?\s*(?:\bor\s+)?\([a-z]\)\s*")
+
+
+def _parse_options(option: str) -> Tuple[str, ...]:
+    """Parse one starting equipment line into its alternatives (one if fixed)."""
+    if not option.startswith("("):
+        return (option,)
+    return tuple(part for part in _OPTION_SPLIT.split(option.strip()) if part)
+
+
+# Starting equipment as one tuple of alternatives per line, parsed once
+EQUIPMENT_OPTIONS = {
+    name: tuple(_parse_options(option) for option in c["starting_equipment"]["options"])
+    for name, c in PHB_CLASSES.items()
+}
+
+
+@dataclass(frozen=True)
+class ClassDef:
+    """Immutable record of one PHB class, with attribute instead of key access."""
+
+    # Explicit slots: dataclass(slots=True) needs Python 3.10
+    __slots__ = ("name", "hit_die", "saving_throws", "skill_choices", "skills",
+                 "armor", "weapons", "tools", "starting_equipment", "features")
+
+    name: str
+    hit_die: str
+    saving_throws: Tuple[str, ...]
+    skill_choices: int
+    skills: FrozenSet[str]
+    armor: Tuple[str, ...]
+    weapons: Tuple[str, ...]
+    tools: Tuple[str, ...]
+    starting_equipment: Tuple[Tuple[str, ...], ...]
+    features: Tuple[Tuple[str, ...], ...]
+
+    @property
+    def hit_die_size(self) -> int:
+        """Number of faces of the hit die, e.g. 12 for "d12"."""
+        return int(self.hit_die[1:])
+
+
+CLASS_DEFS = {
+    name: ClassDef(
+        name=name,
+        hit_die=c["hit_die"],
+        saving_throws=c["saving_throws"],
+        skill_choices=c["skill_choices"],
+        skills=CLASS_SKILLS[name],
+        armor=c["armor"],
+        weapons=c["weapons"],
+        tools=c["tools"],
+        starting_equipment=EQUIPMENT_OPTIONS[name],
+        features=FEATURES_BY_LEVEL[name]
+    )
+    for name, c in PHB_CLASSES.items()
+}
+
+# Struct-of-arrays view for cross-class queries, aligned with CLASS_NAMES
+CLASS_NAMES = tuple(PHB_CLASSES)
+SKILL_NAMES = tuple(sorted(SKILL_TO_CLASSES))
+SKILL_IDX = {skill: i for i, skill in enumerate(SKILL_NAMES)}
+HIT_DICE = np.fromiter((CLASS_DEFS[name].hit_die_size for name in CLASS_NAMES),
+                       dtype=np.int8, count=len(CLASS_NAMES))
+SKILL_CHOICES = np.fromiter((PHB_CLASSES[name]["skill_choices"] for name in CLASS_NAMES),
+                            dtype=np.int8, count=len(CLASS_NAMES))
+# HAS_SKILL[class_index, skill_index] is True when the class offers the skill
+HAS_SKILL = np.zeros((len(CLASS_NAMES), len(SKILL_NAMES)), dtype=np.bool_)
+for _i, _name in enumerate(CLASS_NAMES):
+    HAS_SKILL[_i, [SKILL_IDX[skill] for skill in PHB_CLASSES[_name]["skills"]]] = True
+del _i, _name
+for _array in (HIT_DICE, SKILL_CHOICES, HAS_SKILL):
+    _array.flags.writeable = False
+del _array
+_CLASS_NAME_ARRAY = np.array(CLASS_NAMES)
+
+
+def classes_with_skill(skill: str) -> Tuple[str, ...]:
+    """Return the classes offering `skill`, in CLASS_NAMES order."""
+    return tuple(_CLASS_NAME_ARRAY[HAS_SKILL[:, SKILL_IDX[skill]]].tolist())
+
+# Every weapon and armor name any class is proficient with, matched in free
+# text by one precompiled alternation (longest first, so "Light crossbows"
+# wins over a shorter prefix)
+EQUIPMENT_VOCAB = frozenset(
+    item for c in PHB_CLASSES.values() for item in (*c["weapons"], *c["armor"])
+)
+EQUIPMENT_RE = re.compile(
+    r"\b(?:%s)\b" % "|".join(re.escape(item) for item in sorted(EQUIPMENT_VOCAB, key=len, reverse=True)),
+    re.IGNORECASE
+)
+
+
+def find_equipment(text: str) -> List[str]:
+    """Return the weapon and armor names mentioned in `text`, in order."""
+    return EQUIPMENT_RE.findall(text)
+
+# Small-int class IDs for tight loops: CLASS_TABLE[CLASS_ID[name]] is the
+# ClassDef, reached with an array index instead of a str hash probe
+CLASS_ID = {name: i for i, name in enumerate(CLASS_NAMES)}
+CLASS_TABLE = tuple(CLASS_DEFS[name] for name in CLASS_NAMES)
+
+# C-level extraction of the most used class fields from a PHB_CLASSES entry:
+# hit_die, saving_throws, skills = get_core(PHB_CLASSES["Wizard"])
+get_core = operator.itemgetter("hit_die", "saving_throws", "skills")
+
+
+# Single-slot memo for get_trait: re-roll loops keep asking for the same
+# entry. One (key, value) tuple so readers never see a torn pair.
+_last_trait: Tuple[Any, str] = (None, "")
+
+
+def get_trait(background: str, kind: str, index: int) -> str:
+    """
+    Return one suggested personality entry of a background.
+
+    Args:
+        background: PHB background name
+        kind: "personality_traits", "ideals", "bonds" or "flaws"
+        index: Position in that list
+
+    Returns:
+        The suggestion text.
+    """
+    global _last_trait
+    key = (background, kind, index)
+    last_key, last_value = _last_trait
+    if key == last_key:
+        return last_value
+    value = PHB_BACKGROUNDS[background][kind][index]
+    _last_trait = (key, value)
+    return value
+
+
+class Background(NamedTuple):
+    """Immutable record of one PHB background, with attribute access."""
+
+    name: str
+    skill_proficiencies: Tuple[str, ...]
+    languages: Tuple[str, ...]
+    tool_proficiencies: Tuple[str, ...]
+    equipment: Tuple[str, ...]
+    feature: str
+    personality_traits: Tuple[str, ...]
+    ideals: Tuple[str, ...]
+    bonds: Tuple[str, ...]
+    flaws: Tuple[str, ...]
+
+
+# Background records by name, like CLASS_DEFS
+BACKGROUND_DEFS = {
+    name: Background(name=name, **bg) for name, bg in PHB_BACKGROUNDS.items()
+}
+
+# Backgrounds numbered in table order, like CLASS_ID
+BACKGROUND_ID = {name: i for i, name in enumerate(BACKGROUND_DEFS)}
+
+# Background records indexed by BACKGROUND_ID, like CLASS_TABLE
+BACKGROUND_TABLE = tuple(BACKGROUND_DEFS.values())
@@ -0,0 +1,78 @@
+"""
+Compact text encodings for rule data embedded in LLM prompts.
+
+JSON repeats every key on every row; a CSV table states the columns once,
+which roughly halves the tokens spent on the PHB tables. These encoders are
+only meant for data *inside prompts* - tool outputs stay JSON.
+"""
+
+import csv
+import io
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence
+
+# Explains the cell encoding; put it once above the tables in a prompt
+CSV_LEGEND = (
+    "Tables below are CSV with a header row. "
+    "In a cell, '|' separates list items and ';' separates key:value pairs."
+)
+
+
+def _cell(value: Any) -> str:
+    """Flatten a single value into one CSV cell."""
+    if value is None:
+        return ""
+    if isinstance(value, Mapping):
+        return ";".join(f"{k}:{_cell(v)}" for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return "|".join(_cell(v) for v in value)
+    return str(value)
+
+
+def to_csv(table: Mapping[str, Mapping[str, Any]], columns: Optional[Sequence[str]] = None) -> str:
+    """
+    Encode a name -> record table as CSV.
+
+    Args:
+        table: Mapping of row name to a flat-ish record dict
+        columns: Record keys to include, in order. Defaults to every key
+                 seen across the records, in first-seen order.
+
+    Returns:
+        CSV text whose first column is "name", e.g.
+        "name,hit_die,saving_throws\\nFighter,d10,Strength|Constitution\\n..."
+    """
+    if columns is None:
+        columns = list(dict.fromkeys(k for record in table.values() for k in record))
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["name", *columns])
+    for name, record in table.items():
+        writer.writerow([name, *(_cell(record.get(col)) for col in columns)])
+    return out.getvalue()
+
+
+def flatten_subtables(table: Mapping[str, Mapping[str, Any]], sub_key: str,
+                      parent_column: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Lift nested sub-records (e.g. subspecies) into rows of their own.
+
+    A record listing names under `sub_key` and storing each of them as a
+    nested dict becomes one parent row (without the nested dicts) plus one
+    row per sub-record, whose `parent_column` names the parent.
+
+    Args:
+        table: Mapping of row name to record
+        sub_key: Key holding the list of sub-record names
+        parent_column: Column added to sub-rows pointing at their parent
+
+    Returns:
+        A new flat table suitable for to_csv.
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    for name, record in table.items():
+        subs: Iterable[str] = record.get(sub_key, ())
+        rows[name] = {k: v for k, v in record.items() if k not in subs}
+        for sub in subs:
+            rows[sub] = {parent_column: name, **record[sub]}
+    return rows
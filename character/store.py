@@ -0,0 +1,180 @@
+"""
+Column-oriented storage for many character records.
+
+A party, or the candidates of a batch generation run, is a list of
+character dicts: asking for "everyone's Strength" touches one nested dict
+per character. CharacterStore keeps the numeric fields as numpy columns
+(levels, a characters x abilities score matrix) and the identifying text
+fields as parallel tuples, so bulk queries are single array operations.
+The full records remain available, unchanged, through get_character().
+
+Character is the single-record counterpart: a __slots__ object for keeping
+many characters in memory, convertible to and from the record dict.
+"""
+
+import copy
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from character import dnd_character_agent as agent
+
+# Text fields stored as parallel columns
+_TEXT_FIELDS = ("name", "class", "species", "subspecies", "background", "alignment")
+
+# Stands for an unset (None) ability score in the score matrix
+_UNSET = 0
+
+
+def pack_scores(scores: Dict[str, Any]) -> array:
+    """Pack an ability scores dict into a 6-byte array in ABILITIES order (None -> 0)."""
+    return array("b", [scores.get(ability) or _UNSET for ability in agent.ABILITIES])
+
+
+def unpack_scores(packed: array) -> Dict[str, Any]:
+    """Inverse of pack_scores."""
+    return {ability: score or None for ability, score in zip(agent.ABILITIES, packed)}
+
+
+def get_score(packed: array, ability: str) -> int:
+    """Read one ability from packed scores (0 = not set)."""
+    return packed[agent._ABILITY_IDX[ability]]
+
+
+def set_score(packed: array, ability: str, score: int) -> None:
+    """Write one ability into packed scores."""
+    packed[agent._ABILITY_IDX[ability]] = score
+
+
+def _slot_name(field: str) -> str:
+    """Attribute name of a record field ("class" is a keyword)."""
+    return "class_" if field == "class" else field
+
+
+# Fields derived from others; Character computes them instead of storing them
+_DERIVED_FIELDS = ("ability_modifiers",)
+
+# (record field, attribute) pairs of the stored fields, in record order
+_FIELDS = tuple((field, _slot_name(field)) for field in agent._EMPTY_CHARACTER
+                if field not in _DERIVED_FIELDS)
+
+
+class Character:
+    """
+    Compact in-memory form of one character record.
+
+    Holds the record's fields in __slots__ instead of a 40-key dict, for
+    code that keeps many candidate characters alive. Convert at the edges:
+    the tools, the sheet renderer and storage all work on plain dicts.
+    Both conversions are shallow (list fields are shared, not copied),
+    except ability_scores, which is held packed (see pack_scores).
+    ability_modifiers is not stored at all: it is derived from the packed
+    scores when read.
+    """
+
+    __slots__ = tuple(attr for _, attr in _FIELDS)
+
+    def __init__(self, **fields: Any):
+        """
+        Args:
+            **fields: Attribute values (use `class_` for the class); missing
+                      fields take the empty record's defaults. Derived
+                      fields are ignored.
+        """
+        for field in _DERIVED_FIELDS:
+            fields.pop(field, None)
+        for field, attr in _FIELDS:
+            if attr in fields:
+                value = fields.pop(attr)
+            else:
+                value = copy.deepcopy(agent._EMPTY_CHARACTER[field])
+            if field == "ability_scores" and not isinstance(value, array):
+                value = pack_scores(value)
+            setattr(self, attr, value)
+        if fields:
+            raise TypeError(f"Unknown character fields: {', '.join(fields)}")
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> "Character":
+        """Build a Character from a record dict (unknown keys are dropped)."""
+        return cls(**{attr: record[field] for field, attr in _FIELDS if field in record})
+
+    @property
+    def ability_modifiers(self) -> Dict[str, Any]:
+        """Modifiers of the packed scores (None for unset scores)."""
+        return agent._ability_modifiers(unpack_scores(self.ability_scores))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the record dict the tools and the sheet renderer expect."""
+        scores = unpack_scores(self.ability_scores)
+        record = {}
+        for field in agent._EMPTY_CHARACTER:
+            if field == "ability_scores":
+                record[field] = scores
+            elif field == "ability_modifiers":
+                record[field] = agent._ability_modifiers(scores)
+            else:
+                record[field] = getattr(self, _slot_name(field))
+        return record
+
+    def __repr__(self) -> str:
+        return f"Character(name={self.name!r}, class_={self.class_!r}, level={self.level!r})"
+
+
+class CharacterStore:
+    """Read-only struct-of-arrays view over a sequence of character records."""
+
+    __slots__ = ("_records", "_text", "levels", "ability_scores")
+
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        """
+        Args:
+            records: Character records (see new_character_data)
+        """
+        self._records: Tuple[Dict[str, Any], ...] = tuple(records)
+        self._text: Dict[str, Tuple[Any, ...]] = {
+            field: tuple(record.get(field) for record in self._records)
+            for field in _TEXT_FIELDS
+        }
+        self.levels = np.fromiter((record.get("level") or 1 for record in self._records),
+                                  dtype=np.int8, count=len(self._records))
+        # (characters, 6) in agent.ABILITIES column order; 0 = not set
+        self.ability_scores = np.array(
+            [pack_scores(record.get("ability_scores") or {}) for record in self._records],
+            dtype=np.int8
+        ).reshape(len(self._records), len(agent.ABILITIES))
+        self.levels.flags.writeable = False
+        self.ability_scores.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._records)
+
+    @property
+    def ability_modifiers(self) -> np.ndarray:
+        """Modifiers for every score in one vectorized op (unset scores read as -5)."""
+        return (self.ability_scores.astype(np.int16) - 10) // 2
+
+    def column(self, field: str) -> Tuple[Any, ...]:
+        """
+        Return one text field for every character, e.g. column("class").
+
+        Raises:
+            KeyError: If `field` is not one of the stored text fields.
+        """
+        return self._text[field]
+
+    def ability(self, ability: str) -> np.ndarray:
+        """Return the (characters,) score column of one ability."""
+        return self.ability_scores[:, agent.ABILITIES.index(ability)]
+
+    def where(self, field: str, value: Any) -> List[int]:
+        """Return the indexes of the characters whose text `field` equals `value`."""
+        return [i for i, v in enumerate(self._text[field]) if v == value]
+
+    def get_character(self, index: int) -> Dict[str, Any]:
+        """Return the full record of one character, as it was stored."""
+        return self._records[index]
@@ -0,0 +1,274 @@
+"""
+Tests for the character rules and containers.
+
+Run with pytest, or directly: python character/test_character.py
+"""
+
+import sys
+import os
+# Add parent directory to path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+import fastjsonschema
+import numpy as np
+import pytest
+
+from character import dnd_character_agent as agent
+from character.store import Character, CharacterStore, pack_scores, unpack_scores
+
+
+BASE_SCORES = {
+    "Strength": 15, "Dexterity": 14, "Constitution": 13,
+    "Intelligence": 12, "Wisdom": 10, "Charisma": 8
+}
+
+
+@pytest.fixture
+def character():
+    """A fresh record bound for the duration of the test."""
+    record = agent.new_character_data()
+    token = agent._current_character.set(record)
+    yield record
+    agent._current_character.reset(token)
+
+
+# ============================================================================
+# SCHEMA AND update_character
+# ============================================================================
+
+def test_update_character_recomputes_modifiers(character):
+    agent.update_character(ability_scores=dict(BASE_SCORES))
+    assert character["ability_modifiers"] == {
+        "Strength": 2, "Dexterity": 2, "Constitution": 1,
+        "Intelligence": 1, "Wisdom": 0, "Charisma": -1
+    }
+    assert character["species_increases_applied"] is False
+
+
+@pytest.mark.parametrize("patch", [
+    {"level": 0},
+    {"level": 21},
+    {"hit_points": 0},
+    {"name": 42},
+    {"skill_proficiencies": "Perception"},
+    {"ability_scores": {**BASE_SCORES, "Strength": 31}},
+])
+def test_schema_rejects_bad_writes(character, patch):
+    before = dict(character)
+    with pytest.raises(fastjsonschema.JsonSchemaValueException):
+        agent.update_character(**patch)
+    assert character == before
+
+
+def test_legacy_bad_field_does_not_block_other_writes(character):
+    character["hit_points"] = 0
+    assert agent.set_character_name("Tordek") == "Character name set to: Tordek"
+    assert character["name"] == "Tordek"
+    agent.update_character(hit_points=12)
+    assert character["hit_points"] == 12
+
+def test_tools_report_schema_errors_instead_of_raising(character):
+    assert agent.set_physical_description(age=-1).startswith("Error: invalid character data")
+    assert character["age"] is None
+
+
+# ============================================================================
+# SPECIES ABILITY SCORE INCREASES
+# ============================================================================
+
+def test_species_increases_apply_once(character):
+    agent.update_character(ability_scores=dict(BASE_SCORES))
+    agent.set_character_species("Dwarf", "Hill Dwarf")
+    agent.set_character_species("Dwarf", "Hill Dwarf")
+    agent.finalize_character()
+    assert character["ability_scores"]["Constitution"] == 15
+    assert character["ability_scores"]["Wisdom"] == 11
+    assert character["species_increases_applied"] is True
+
+
+def test_changing_species_undoes_previous_increases(character):
+    agent.update_character(ability_scores=dict(BASE_SCORES))
+    agent.set_character_species("Dwarf", "Hill Dwarf")
+    agent.set_character_species("Half-Orc")
+    scores = character["ability_scores"]
+    assert scores["Constitution"] == 14
+    assert scores["Wisdom"] == 10
+    assert scores["Strength"] == 17
+
+
+def test_finalize_applies_increases_for_scores_set_after_species(character):
+    agent.set_character_species("Dwarf", "Hill Dwarf")
+    agent.update_character(ability_scores=dict(BASE_SCORES))
+    agent.finalize_character()
+    agent.finalize_character()
+    assert character["ability_scores"]["Constitution"] == 15
+
+
+# ============================================================================
+# ARMOR CLASS
+# ============================================================================
+
+@pytest.mark.parametrize("dex_mod, armor, expected", [
+    (2, None, 12),
+    (3, "Leather", 14),
+    (3, "studded leather armor", 15),
+    (3, "Half Plate", 17),
+    (1, "scale", 15),
+    (3, "Plate", 18),
+    (-1, "chain mail", 16),
+    (2, "mithral robes", 12),
+])
+def test_armor_class(dex_mod, armor, expected):
+    assert agent.calculate_armor_class(dex_mod, armor) == expected
+
+
+# ============================================================================
+# HIT POINTS, PASSIVE SKILLS AND THE SHEET CACHE
+# ============================================================================
+
+def test_hit_points():
+    assert agent.calculate_hit_points("Fighter", 1, 2) == (12, "1d10")
+    assert agent.calculate_hit_points("Fighter", 3, 2) == (24, "3d10")
+    assert agent.calculate_hit_points("Wizard", 1, -5) == (1, "1d6")
+
+
+def test_passive_skill():
+    assert agent.calculate_passive_skill(1, 2, False) == 11
+    assert agent.calculate_passive_skill(1, 2, True) == 13
+    # Cached results must not leak between argument combinations
+    assert agent.calculate_passive_skill(1, 3, True) == 14
+
+
+def test_finalize_derives_stats(character):
+    agent.set_character_class("Fighter", 1)
+    agent.update_character(ability_scores=dict(BASE_SCORES), skill_proficiencies=["Perception"])
+    agent.finalize_character()
+    assert character["hit_points"] == 11
+    assert character["armor_class"] == 12
+    assert character["passive_perception"] == 12
+    assert character["passive_insight"] == 10
+
+
+def test_sheet_cache_follows_updates(character):
+    agent.set_character_name("Bruenor")
+    assert "Bruenor" in agent._generate_character_sheet()
+    agent.set_character_name("Wulfgar")
+    sheet = agent._generate_character_sheet()
+    assert "Wulfgar" in sheet and "Bruenor" not in sheet
+
+
+# ============================================================================
+# ONE-SHOT CHOICES
+# ============================================================================
+
+VALID_CHOICES = {
+    "name": "Tordek", "class": "Fighter", "level": 3, "species": "Dwarf",
+    "subspecies": "Hill Dwarf", "background": "Soldier", "alignment": "Lawful Good",
+    "ability_scores": dict(BASE_SCORES),
+    "personality_trait": "Stubborn", "ideal": "Honor", "bond": "My clan", "flaw": "Proud",
+    "age": 80, "height": None, "weight": None, "eyes": None, "skin": None, "hair": None,
+    "backstory": "A veteran of the mountain wars."
+}
+
+
+def test_apply_character_choices():
+    character = agent.apply_character_choices(dict(VALID_CHOICES))
+    assert character["class"] == "Fighter" and character["level"] == 3
+    assert character["ability_scores"]["Constitution"] == 15
+    assert character["hit_points"] is not None
+
+
+@pytest.mark.parametrize("override, message", [
+    ({"level": 25}, "Level must be between 1 and 20"),
+    ({"subspecies": "Bogus"}, "'Bogus' is not a valid subspecies"),
+    ({"alignment": "Nope"}, "'Nope' is not a valid alignment"),
+    ({"ability_scores": {ability: 18 for ability in agent.ABILITIES}}, "standard array"),
+])
+def test_apply_character_choices_rejects_invalid_choices(override, message):
+    with pytest.raises(ValueError, match=message):
+        agent.apply_character_choices({**VALID_CHOICES, **override})
+
+
+
+@pytest.mark.parametrize("override", [
+    {"level": 25},
+    {"level": None},
+    {"ability_scores": {**BASE_SCORES, "Strength": 18}},
+])
+def test_choices_schema_rejects_out_of_range_numbers(override):
+    reply = agent._dumps({**VALID_CHOICES, **override})
+    with pytest.raises(ValueError):
+        agent._parse_choices(reply)
+    assert agent._parse_choices(agent._dumps(VALID_CHOICES)) == VALID_CHOICES
+
+
+# ============================================================================
+# ENVIRONMENT
+# ============================================================================
+
+@pytest.mark.parametrize("flag, expected", [(None, None), ("1", "from-dotenv")])
+def test_dotenv_only_read_with_use_dotenv(monkeypatch, flag, expected):
+    monkeypatch.setattr("dotenv.dotenv_values", lambda: {"DND_TEST_DOTENV_VALUE": "from-dotenv"})
+    monkeypatch.delenv("DND_TEST_DOTENV_VALUE", raising=False)
+    if flag is None:
+        monkeypatch.delenv("USE_DOTENV", raising=False)
+    else:
+        monkeypatch.setenv("USE_DOTENV", flag)
+    agent._load_env_once.cache_clear()
+    try:
+        agent._load_env_once()
+        assert os.environ.get("DND_TEST_DOTENV_VALUE") == expected
+    finally:
+        os.environ.pop("DND_TEST_DOTENV_VALUE", None)
+        agent._load_env_once.cache_clear()
+
+# ============================================================================
+# CHARACTER STORE
+# ============================================================================
+
+def _record(name, class_name, scores, level=1):
+    """A record with the given basics and matching modifiers."""
+    record = agent.new_character_data()
+    modifiers = {ability: agent.calculate_ability_modifier(score) for ability, score in scores.items()}
+    record.update(name=name, level=level, ability_scores=scores, ability_modifiers=modifiers)
+    record["class"] = class_name
+    return record
+
+
+def test_pack_scores_round_trip():
+    partial = {**BASE_SCORES, "Charisma": None}
+    assert unpack_scores(pack_scores(partial)) == partial
+
+
+def test_character_round_trip():
+    record = _record("Elminster", "Wizard", BASE_SCORES, level=5)
+    record["skill_proficiencies"] = ["Arcana", "History"]
+    character = Character.from_dict(record)
+    assert character.to_dict() == record
+    assert list(character.to_dict()) == list(agent._EMPTY_CHARACTER)
+    assert character.ability_modifiers == record["ability_modifiers"]
+
+
+def test_character_rejects_unknown_fields():
+    with pytest.raises(TypeError):
+        Character(favourite_colour="blue")
+
+
+def test_character_store_columns():
+    store = CharacterStore([
+        _record("Elminster", "Wizard", BASE_SCORES, level=5),
+        _record("Drizzt", "Ranger", {**BASE_SCORES, "Dexterity": 20}, level=3),
+    ])
+    assert len(store) == 2
+    assert store.column("class") == ("Wizard", "Ranger")
+    assert store.where("class", "Ranger") == [1]
+    np.testing.assert_array_equal(store.levels, [5, 3])
+    np.testing.assert_array_equal(store.ability("Dexterity"), [14, 20])
+    # Dexterity is the second score column
+    assert store.ability_modifiers[1, 1] == 5
+    assert store.get_character(0)["name"] == "Elminster"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -2,8 +2,8 @@
 Core database and utility modules.
 """
 
-from .db import db, utcnow, ensure_indexes
+from .db import db, get_coll, utcnow, ensure_indexes
 from .result_format import make_result, start_timer
 
-__all__ = ['db', 'utcnow', 'ensure_indexes', 'make_result', 'start_timer']
+__all__ = ['db', 'get_coll', 'utcnow', 'ensure_indexes', 'make_result', 'start_timer']
 
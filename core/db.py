@@ -6,86 +6,277 @@ for working with MongoDB in the D&D Dungeon Manager application.
 """
 
 import os
-from datetime import datetime
-from pymongo import MongoClient, ASCENDING
-from pymongo.errors import DuplicateKeyError
-from dotenv import load_dotenv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pymongo import MongoClient, ASCENDING, IndexModel, WriteConcern
+from pymongo.errors import DuplicateKeyError, PyMongoError
 
-load_dotenv()
 
-# MongoDB connection configuration from environment variables
-_MONGO_URI = os.environ["MONGODB_URI"]
-_DB_NAME = os.environ.get("DB_NAME", "dnd_dungeon")
+def load_dev_env():
+    """
+    Load a local .env file, but only when USE_DOTENV=1 (local development).
+
+    In production the platform injects the environment, so the upward
+    filesystem scan for a .env (and the risk of picking up a stale one)
+    is skipped entirely.
+    """
+    if os.environ.get("USE_DOTENV") == "1":
+        from dotenv import load_dotenv
+        load_dotenv()
 
-# Initialize MongoDB client and database connection (singleton pattern)
-_client = MongoClient(_MONGO_URI)
-_db = _client[_DB_NAME]
+
+load_dev_env()
+
+# MongoDB client and database, created on first use by db() (singleton
+# pattern), so importing this module does no DNS lookups or connecting
+_client = None
+_db = None
+_connect_lock = threading.Lock()
+
+
+def _connect():
+    """Create the client and database handle; called once, under _connect_lock."""
+    global _client, _db
+    # The pool is sized explicitly: minPoolSize keeps warm sockets so later
+    # requests don't pay for connecting, maxPoolSize bounds concurrent operations.
+    client = MongoClient(
+        os.environ["MONGODB_URI"],
+        maxPoolSize=int(os.environ.get("MONGO_MAX_POOL", "50")),
+        minPoolSize=int(os.environ.get("MONGO_MIN_POOL", "10")),
+        maxIdleTimeMS=60000,
+        connectTimeoutMS=5000,
+        serverSelectionTimeoutMS=5000,
+        retryWrites=True,
+        # Compress wire messages; the server picks the first one it supports
+        compressors=os.environ.get("MONGO_COMPRESSORS", "zstd,zlib"),
+        zlibCompressionLevel=6,
+        # Game data tolerates losing the last moments before a crash, so
+        # writes are acknowledged without waiting for the journal; writes
+        # that must be durable override this (see DURABLE). Reads may go to
+        # a secondary while the primary is unavailable.
+        w=1,
+        journal=False,
+        readPreference="primaryPreferred",
+        readConcernLevel="local"
+    )
+    # Connect now so the pool starts filling. An unreachable server is not
+    # fatal here; the driver keeps retrying and the first real query reports
+    # the error.
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        print(f"⚠ Warning: Could not reach MongoDB: {e}")
+    _client = client
+    _db = client[os.environ.get("DB_NAME", "dnd_dungeon")]
+
+
+# Write concern for data that must survive a crash or failover (accounts)
+DURABLE = WriteConcern(w="majority", j=True)
 
 
 def db():
-    """Return the MongoDB database instance."""
+    """Return the MongoDB database instance, connecting on the first call."""
+    if _db is None:
+        with _connect_lock:
+            if _db is None:
+                _connect()
     return _db
 
 
+# Collection handles by name. pymongo builds a new Collection object on
+# every `database.name` access, so hot paths fetch them from here instead.
+COLLECTIONS = {}
+
+
+def get_coll(name):
+    """Return the shared handle of a collection, creating it on first use."""
+    coll = COLLECTIONS.get(name)
+    if coll is None:
+        coll = COLLECTIONS[name] = db()[name]
+    return coll
+
+
+def __getattr__(name):
+    # `DB` was a module-level handle; keep it importable, connecting lazily
+    if name == "DB":
+        return db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Last formatted timestamp as (unix second, text). One tuple so readers
+# never see a torn pair.
+_last_utcnow = (0, "")
+
+
 def utcnow():
-    """Get current UTC datetime as a readable string in 24-hour format (YYYY-MM-DD HH:MM:SS)."""
-    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    """Get current UTC datetime as a readable string in 24-hour format (YYYY-MM-DD HH:MM:SS).
+    
+    The text only changes once a second, so it is formatted once per second,
+    straight from the time.gmtime() fields (no strftime format parsing).
+    """
+    global _last_utcnow
+    now = int(time.time())
+    second, text = _last_utcnow
+    if now != second:
+        t = time.gmtime(now)
+        text = f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} {t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
+        _last_utcnow = (now, text)
+    return text
+
+
+def utcnow_dt():
+    """Get the current UTC time as an aware datetime, stored by BSON as a native Date.
+    
+    Use it for fields that need date queries or a TTL index; the existing
+    created_at/updated_at fields keep utcnow()'s string format, which the
+    API returns as is.
+    """
+    return datetime.now(timezone.utc)
+
+
+# Marker document in the _meta collection recording that the current index
+# set was built. Bump it whenever the index definitions below change.
+INDEX_VERSION = "indexes_v2"
+
+
+def _create_missing_indexes(coll, models, superseded=()):
+    """
+    Create the indexes in `models` whose names `coll` doesn't have yet, then
+    drop the `superseded` indexes they replace, so writes stop maintaining them.
+    """
+    existing = {index["name"] for index in coll.list_indexes()}
+    missing = [model for model in models if model.document["name"] not in existing]
+    if missing:
+        coll.create_indexes(missing)
+    for name in superseded:
+        if name in existing:
+            coll.drop_index(name)
 
 
 def ensure_indexes():
     """
     Create indexes (idempotent). Run once on startup.
     We use partial unique indexes to ensure uniqueness for non-deleted items per user.
+    The lookup indexes end in `deleted`, so {..., "deleted": False} queries
+    are filtered within the index instead of after fetching documents, while
+    their user/dungeon prefix still serves the cascade updates and deletes.
+    They replace the auto-named single-purpose indexes of earlier builds
+    (user_id_1, ...), which are dropped once the new ones exist.
+    Indexes that already exist (by name) are skipped; the rest of a
+    collection's indexes are sent in one createIndexes command, built in the
+    background on servers older than 4.2, and the collections are handled
+    in parallel. After a successful run a marker document in `_meta` (see
+    INDEX_VERSION) makes later starts return after a single read.
     
     Note: On MongoDB Atlas free tier, you may need to create indexes manually
     through the Atlas UI if your database user doesn't have createIndex permission.
     """
     from pymongo.errors import OperationFailure
     
-    try:
+    # Built by an earlier start (see INDEX_VERSION): one read instead of
+    # checking every collection
+    if get_coll("_meta").find_one({"_id": INDEX_VERSION}):
+        return True
+    
+    # (collection, indexes, superseded index names) triples; the collections
+    # are independent, so their createIndexes commands are sent concurrently
+    indexes = [
         # Dungeons: unique name per user when not deleted
-        db().dungeons.create_index(
-            [("user_id", ASCENDING), ("name", ASCENDING)],
-            name="uniq_dungeon_name_per_user_active",
-            unique=True,
-            partialFilterExpression={"deleted": False}
-        )
-        db().dungeons.create_index([("user_id", ASCENDING)])
+        (get_coll("dungeons"), [
+            IndexModel(
+                [("user_id", ASCENDING), ("name", ASCENDING)],
+                name="uniq_dungeon_name_per_user_active",
+                unique=True,
+                partialFilterExpression={"deleted": False},
+                background=True
+            ),
+            IndexModel([("user_id", ASCENDING), ("deleted", ASCENDING)], name="dungeons_by_user",
+                       background=True)
+        ], ["user_id_1"]),
 
         # Rooms: unique per (user_id, dungeon_name, room_name) when not deleted
-        db().rooms.create_index(
-            [("user_id", ASCENDING), ("dungeon", ASCENDING), ("name", ASCENDING)],
-            name="uniq_room_per_user_dungeon_active",
-            unique=True,
-            partialFilterExpression={"deleted": False}
-        )
-        db().rooms.create_index([("user_id", ASCENDING), ("dungeon", ASCENDING)])
+        (get_coll("rooms"), [
+            IndexModel(
+                [("user_id", ASCENDING), ("dungeon", ASCENDING), ("name", ASCENDING)],
+                name="uniq_room_per_user_dungeon_active",
+                unique=True,
+                partialFilterExpression={"deleted": False},
+                background=True
+            ),
+            IndexModel([("user_id", ASCENDING), ("dungeon", ASCENDING), ("deleted", ASCENDING)],
+                       name="rooms_by_user_dungeon", background=True)
+        ], ["user_id_1_dungeon_1"]),
 
         # Items: unique per (user_id, dungeon, room, category, name) when not deleted
-        db().items.create_index(
-            [("user_id", ASCENDING), ("dungeon", ASCENDING), ("room", ASCENDING), ("category", ASCENDING), ("name", ASCENDING)],
-            name="uniq_item_per_user_cat_active",
-            unique=True,
-            partialFilterExpression={"deleted": False}
-        )
-        db().items.create_index([("user_id", ASCENDING), ("dungeon", ASCENDING), ("room", ASCENDING), ("category", ASCENDING)])
+        (get_coll("items"), [
+            IndexModel(
+                [("user_id", ASCENDING), ("dungeon", ASCENDING), ("room", ASCENDING), ("category", ASCENDING), ("name", ASCENDING)],
+                name="uniq_item_per_user_cat_active",
+                unique=True,
+                partialFilterExpression={"deleted": False},
+                background=True
+            ),
+            IndexModel([("user_id", ASCENDING), ("dungeon", ASCENDING), ("room", ASCENDING), ("category", ASCENDING),
+                        ("deleted", ASCENDING)], name="items_by_user_room_category", background=True)
+        ], ["user_id_1_dungeon_1_room_1_category_1"]),
 
         # Characters: unique name per user when not deleted
-        db().characters.create_index(
-            [("user_id", ASCENDING), ("name", ASCENDING)],
-            name="uniq_character_name_per_user_active",
-            unique=True,
-            partialFilterExpression={"deleted": False}
-        )
-        db().characters.create_index([("user_id", ASCENDING)])
+        (get_coll("characters"), [
+            IndexModel(
+                [("user_id", ASCENDING), ("name", ASCENDING)],
+                name="uniq_character_name_per_user_active",
+                unique=True,
+                partialFilterExpression={"deleted": False},
+                background=True
+            ),
+            IndexModel([("user_id", ASCENDING), ("deleted", ASCENDING)], name="characters_by_user",
+                       background=True)
+        ], ["user_id_1"])
+    ]
+    try:
+        with ThreadPoolExecutor(max_workers=len(indexes)) as pool:
+            # list() waits for every command and re-raises the first failure
+            list(pool.map(lambda spec: _create_missing_indexes(*spec), indexes))
     except OperationFailure as e:
         # If user doesn't have permission to create indexes, that's okay
         # They can create them manually through Atlas UI if needed
-        if "createIndex" in str(e):
+        if "createIndex" in str(e) or "dropIndexes" in str(e):
             print(f"⚠ Warning: Could not create indexes automatically: {e}")
             print("   You may need to create indexes manually through MongoDB Atlas UI.")
             print("   The application will still work, but duplicate checks may be slower.")
             return False
         raise
+    get_coll("_meta").update_one({"_id": INDEX_VERSION}, {"$set": {"built_at": utcnow_dt()}}, upsert=True)
     return True
 
+
+# Set once a background index build (ensure_indexes_in_background) has finished
+INDEXES_READY = threading.Event()
+
+
+def _ensure_indexes_task():
+    """Thread body for ensure_indexes_in_background."""
+    try:
+        if ensure_indexes():
+            print("✓ MongoDB indexes ensured.")
+    except Exception as e:
+        print(f"⚠ Warning: Could not ensure MongoDB indexes: {e}")
+    finally:
+        INDEXES_READY.set()
+
+
+def ensure_indexes_in_background():
+    """
+    Run ensure_indexes on a daemon thread so startup doesn't wait for it.
+    
+    The app works without the indexes (queries are just slower until they
+    exist). Wait on INDEXES_READY if something needs them built first.
+    
+    Returns:
+        The started thread.
+    """
+    thread = threading.Thread(target=_ensure_indexes_task, daemon=True, name="ensure-indexes")
+    thread.start()
+    return thread
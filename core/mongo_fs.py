@@ -9,7 +9,7 @@ import time
 from datetime import datetime
 from typing import Optional, List, Dict, Union
 from pymongo.errors import DuplicateKeyError
-from .db import db, utcnow
+from .db import get_coll, utcnow
 from .result_format import make_result, start_timer
 
 # Valid item categories (fixed set)
@@ -55,7 +55,7 @@ def create_dungeon(*, name: str, summary: Optional[str] = None, exists_ok: bool
             target={"type": "dungeon", "path": f"/{name}", "name": name},
             started=t0
         )
-    coll = db().dungeons
+    coll = get_coll("dungeons")
     doc = {
         "name": name,
         "summary": summary,
@@ -111,7 +111,7 @@ def list_dungeons(*, user_id: Optional[str] = None, raw: str = "") -> dict:
             target={"type": "dungeon", "path": "/", "name": ""},
             started=t0
         )
-    docs = list(db().dungeons.find({"user_id": user_id, "deleted": False}))
+    docs = list(get_coll("dungeons").find({"user_id": user_id, "deleted": False}))
     dungeons = [{"name": d["name"], "summary": d.get("summary"), "deleted": d.get("deleted", False)} for d in docs]
     return make_result(
         status="ok", code="LIST", message=f"{len(dungeons)} dungeons.",
@@ -136,7 +136,7 @@ def rename_dungeon(*, dungeon: str, new_name: str, user_id: Optional[str] = None
             target={"type": "dungeon", "path": f"/{dungeon}", "name": dungeon},
             started=t0
         )
-    coll = db().dungeons
+    coll = get_coll("dungeons")
     old = coll.find_one({"name": dungeon, "user_id": user_id, "deleted": False})
     if not old:
         return make_result(
@@ -156,8 +156,8 @@ def rename_dungeon(*, dungeon: str, new_name: str, user_id: Optional[str] = None
         )
     coll.update_one({"_id": old["_id"]}, {"$set": {"name": new_name, "updated_at": utcnow()}})
     # Cascade rename in rooms/items (stored as strings)
-    db().rooms.update_many({"dungeon": dungeon, "user_id": user_id}, {"$set": {"dungeon": new_name}})
-    db().items.update_many({"dungeon": dungeon, "user_id": user_id}, {"$set": {"dungeon": new_name}})
+    get_coll("rooms").update_many({"dungeon": dungeon, "user_id": user_id}, {"$set": {"dungeon": new_name}})
+    get_coll("items").update_many({"dungeon": dungeon, "user_id": user_id}, {"$set": {"dungeon": new_name}})
     return make_result(
         status="ok", code="RENAMED", message="Dungeon renamed.",
         command={"raw": raw, "name": "dungeon.rename", "args": {"old_name": dungeon, "new_name": new_name}},
@@ -179,7 +179,7 @@ def update_dungeon(*, dungeon: str, patch: dict, user_id: Optional[str] = None,
             target={"type": "dungeon", "path": f"/{dungeon}", "name": dungeon},
             started=t0
         )
-    coll = db().dungeons
+    coll = get_coll("dungeons")
     doc = coll.find_one({
         "name": dungeon,
         "user_id": user_id,
@@ -215,8 +215,8 @@ def update_dungeon(*, dungeon: str, patch: dict, user_id: Optional[str] = None,
         update_fields["name"] = new_name
         changes.append({"op": "update", "path": "/", "node_type": "dungeon", "name": dungeon, "to": new_name})
         # Cascade rename in rooms/items
-        db().rooms.update_many({"dungeon": dungeon, "user_id": user_id}, {"$set": {"dungeon": new_name}})
-        db().items.update_many({"dungeon": dungeon, "user_id": user_id}, {"$set": {"dungeon": new_name}})
+        get_coll("rooms").update_many({"dungeon": dungeon, "user_id": user_id}, {"$set": {"dungeon": new_name}})
+        get_coll("items").update_many({"dungeon": dungeon, "user_id": user_id}, {"$set": {"dungeon": new_name}})
     
     # Handle summary field
     if "summary" in patch:
@@ -258,7 +258,7 @@ def delete_dungeon(*, dungeon: str, token: Optional[str] = None, user_id: Option
             command={"raw": raw, "name": "dungeon.delete", "args": {"name": dungeon}},
             target={"type": "dungeon", "path": f"/{dungeon}", "name": dungeon}, started=t0
         )
-    coll = db().dungeons
+    coll = get_coll("dungeons")
     doc = coll.find_one({"name": dungeon, "user_id": user_id})
     if not doc:
         return make_result(
@@ -277,8 +277,8 @@ def delete_dungeon(*, dungeon: str, token: Optional[str] = None, user_id: Option
         )
     # Cascade delete: remove all items first, then rooms, then dungeon
     # This ensures proper cascade deletion in the database
-    items_deleted = db().items.delete_many({"dungeon": dungeon, "user_id": user_id})
-    rooms_deleted = db().rooms.delete_many({"dungeon": dungeon, "user_id": user_id})
+    items_deleted = get_coll("items").delete_many({"dungeon": dungeon, "user_id": user_id})
+    rooms_deleted = get_coll("rooms").delete_many({"dungeon": dungeon, "user_id": user_id})
     dungeon_deleted = coll.delete_one({"_id": doc["_id"]})
     
     return make_result(
@@ -310,7 +310,7 @@ def create_room(*, dungeon: str, name: str, summary: Optional[str] = None, exist
             command={"raw": raw, "name": "room.create", "args": {"dungeon": dungeon, "name": name, "summary": summary}},
             target={"type": "room", "path": f"/{dungeon}/{name}", "name": name}, started=t0
         )
-    if not db().dungeons.find_one({"name": dungeon, "user_id": user_id, "deleted": False}):
+    if not get_coll("dungeons").find_one({"name": dungeon, "user_id": user_id, "deleted": False}):
         return make_result(
             status="error", code="ERROR_NOT_FOUND", message=f"No dungeon '{dungeon}'.",
             command={"raw": raw, "name": "room.create", "args": {"dungeon": dungeon, "name": name, "summary": summary}},
@@ -326,7 +326,7 @@ def create_room(*, dungeon: str, name: str, summary: Optional[str] = None, exist
         "deleted": False,
     }
     try:
-        db().rooms.insert_one(doc)
+        get_coll("rooms").insert_one(doc)
         code, msg = "CREATED", "Room created."
     except DuplicateKeyError:
         if not exists_ok:
@@ -357,14 +357,14 @@ def list_rooms(*, dungeon: str, user_id: Optional[str] = None, raw: str = "") ->
             target={"type": "dungeon", "path": f"/{dungeon}", "name": dungeon},
             started=t0
         )
-    if not db().dungeons.find_one({"name": dungeon, "user_id": user_id, "deleted": False}):
+    if not get_coll("dungeons").find_one({"name": dungeon, "user_id": user_id, "deleted": False}):
         return make_result(
             status="error", code="ERROR_NOT_FOUND", message=f"No dungeon '{dungeon}'.",
             command={"raw": raw, "name": "room.list", "args": {"dungeon": dungeon}},
             target={"type": "dungeon", "path": f"/{dungeon}", "name": dungeon},
             started=t0
         )
-    docs = list(db().rooms.find({"dungeon": dungeon, "user_id": user_id, "deleted": False}))
+    docs = list(get_coll("rooms").find({"dungeon": dungeon, "user_id": user_id, "deleted": False}))
     rooms = [{"name": d["name"], "dungeon": d["dungeon"], "summary": d.get("summary"), "deleted": d.get("deleted", False)} for d in docs]
     return make_result(
         status="ok", code="LIST", message=f"{len(rooms)} rooms.",
@@ -383,14 +383,14 @@ def rename_room(*, dungeon: str, room: str, new_name: str, user_id: Optional[str
             target={"type": "room", "path": f"/{dungeon}/{room}", "name": room},
             started=t0
         )
-    if not db().dungeons.find_one({"name": dungeon, "user_id": user_id, "deleted": False}):
+    if not get_coll("dungeons").find_one({"name": dungeon, "user_id": user_id, "deleted": False}):
         return make_result(
             status="error", code="ERROR_NOT_FOUND", message=f"No dungeon '{dungeon}'.",
             command={"raw": raw, "name": "room.rename", "args": {"dungeon": dungeon, "old_name": room, "new_name": new_name}},
             target={"type": "room", "path": f"/{dungeon}/{room}", "name": room},
             started=t0
         )
-    coll = db().rooms
+    coll = get_coll("rooms")
     old = coll.find_one({"dungeon": dungeon, "name": room, "user_id": user_id, "deleted": False})
     if not old:
         return make_result(
@@ -409,7 +409,7 @@ def rename_room(*, dungeon: str, room: str, new_name: str, user_id: Optional[str
         )
     coll.update_one({"_id": old["_id"]}, {"$set": {"name": new_name, "updated_at": utcnow()}})
     # Cascade rename in items
-    db().items.update_many({"dungeon": dungeon, "room": room, "user_id": user_id}, {"$set": {"room": new_name}})
+    get_coll("items").update_many({"dungeon": dungeon, "room": room, "user_id": user_id}, {"$set": {"room": new_name}})
     return make_result(
         status="ok", code="RENAMED", message="Room renamed.",
         command={"raw": raw, "name": "room.rename", "args": {"dungeon": dungeon, "old_name": room, "new_name": new_name}},
@@ -431,7 +431,7 @@ def update_room(*, dungeon: str, room: str, patch: dict, user_id: Optional[str]
             target={"type": "room", "path": f"/{dungeon}/{room}", "name": room},
             started=t0
         )
-    coll = db().rooms
+    coll = get_coll("rooms")
     doc = coll.find_one({
         "dungeon": dungeon,
         "name": room,
@@ -469,7 +469,7 @@ def update_room(*, dungeon: str, room: str, patch: dict, user_id: Optional[str]
         update_fields["name"] = new_name
         changes.append({"op": "update", "path": f"/{dungeon}", "node_type": "room", "name": room, "to": new_name})
         # Cascade rename in items
-        db().items.update_many({"dungeon": dungeon, "room": room, "user_id": user_id}, {"$set": {"room": new_name}})
+        get_coll("items").update_many({"dungeon": dungeon, "room": room, "user_id": user_id}, {"$set": {"room": new_name}})
     
     # Handle summary field
     if "summary" in patch:
@@ -512,7 +512,7 @@ def delete_room(*, dungeon: str, room: str, token: Optional[str] = None, user_id
             target={"type": "room", "path": f"/{dungeon}/{room}", "name": room},
             started=t0
         )
-    coll = db().rooms
+    coll = get_coll("rooms")
     doc = coll.find_one({"dungeon": dungeon, "name": room, "user_id": user_id})
     if not doc:
         return make_result(
@@ -532,7 +532,7 @@ def delete_room(*, dungeon: str, room: str, token: Optional[str] = None, user_id
         )
     # Cascade delete: remove all items in the room first, then the room
     # This ensures proper cascade deletion in the database
-    items_deleted = db().items.delete_many({"dungeon": dungeon, "room": room, "user_id": user_id})
+    items_deleted = get_coll("items").delete_many({"dungeon": dungeon, "room": room, "user_id": user_id})
     room_deleted = coll.delete_one({"_id": doc["_id"]})
     
     return make_result(
@@ -577,7 +577,7 @@ def create_item(
             command={"raw": raw, "name": "item.create", "args": {"dungeon": dungeon, "room": room, "category": category}},
             target={"type": "category", "path": f"/{dungeon}/{room}/{category}", "name": category}, started=t0
         )
-    if not db().rooms.find_one({"dungeon": dungeon, "name": room, "user_id": user_id, "deleted": False}):
+    if not get_coll("rooms").find_one({"dungeon": dungeon, "name": room, "user_id": user_id, "deleted": False}):
         return make_result(
             status="error", code="ERROR_NOT_FOUND", message=f"Room '{room}' not found in '{dungeon}'.",
             command={"raw": raw, "name": "item.create", "args": {"dungeon": dungeon, "room": room, "category": category}},
@@ -604,7 +604,7 @@ def create_item(
         "updated_at": utcnow(),
         "deleted": False,
     }
-    coll = db().items
+    coll = get_coll("items")
     try:
         coll.insert_one(doc)
         code, msg, applied = "CREATED", "Item created.", True
@@ -649,7 +649,7 @@ def read_item(*, dungeon: str, room: str, category: str, item: str, user_id: Opt
             target={"type": "item", "path": f"/{dungeon}/{room}/{category}/{item}", "name": item},
             started=t0
         )
-    doc = db().items.find_one({
+    doc = get_coll("items").find_one({
         "dungeon": dungeon,
         "room": room,
         "category": category,
@@ -690,7 +690,7 @@ def update_item(*, dungeon: str, room: str, category: str, item: str, patch: dic
             target={"type": "item", "path": f"/{dungeon}/{room}/{category}/{item}", "name": item},
             started=t0
         )
-    coll = db().items
+    coll = get_coll("items")
     doc = coll.find_one({
         "dungeon": dungeon,
         "room": room,
@@ -791,7 +791,7 @@ def delete_item(*, dungeon: str, room: str, category: str, item: str, token: Opt
             target={"type": "item", "path": f"/{dungeon}/{room}/{category}/{item}", "name": item},
             started=t0
         )
-    coll = db().items
+    coll = get_coll("items")
     doc = coll.find_one({
         "dungeon": dungeon,
         "room": room,
@@ -854,7 +854,7 @@ def move_item(
     
     # Check destination (if not overwrite)
     if not overwrite:
-        conflict = db().items.find_one({
+        conflict = get_coll("items").find_one({
             "dungeon": dst_dungeon,
             "room": dst_room,
             "category": dst_category,
@@ -924,7 +924,7 @@ def copy_item(
     
     # Check destination (if not overwrite)
     if not overwrite:
-        conflict = db().items.find_one({
+        conflict = get_coll("items").find_one({
             "dungeon": dst_dungeon,
             "room": dst_room,
             "category": dst_category,
@@ -983,7 +983,7 @@ def ensure_category(*, dungeon: str, room: str, category: str, user_id: Optional
             target={"type": "category", "path": f"/{dungeon}/{room}/{category}", "name": category},
             started=t0
         )
-    if not db().rooms.find_one({"dungeon": dungeon, "name": room, "user_id": user_id, "deleted": False}):
+    if not get_coll("rooms").find_one({"dungeon": dungeon, "name": room, "user_id": user_id, "deleted": False}):
         return make_result(
             status="error", code="ERROR_NOT_FOUND", message=f"Room '{room}' not found in '{dungeon}'.",
             command={"raw": raw, "name": "category.ensure", "args": {"dungeon": dungeon, "room": room, "category": category}},
@@ -1016,14 +1016,14 @@ def list_category_items(*, dungeon: str, room: str, category: str, user_id: Opti
             target={"type": "category", "path": f"/{dungeon}/{room}/{category}", "name": category},
             started=t0
         )
-    if not db().rooms.find_one({"dungeon": dungeon, "name": room, "user_id": user_id, "deleted": False}):
+    if not get_coll("rooms").find_one({"dungeon": dungeon, "name": room, "user_id": user_id, "deleted": False}):
         return make_result(
             status="error", code="ERROR_NOT_FOUND", message=f"Room '{room}' not found in '{dungeon}'.",
             command={"raw": raw, "name": "category.list", "args": {"dungeon": dungeon, "room": room, "category": category}},
             target={"type": "room", "path": f"/{dungeon}/{room}", "name": room},
             started=t0
         )
-    docs = list(db().items.find({
+    docs = list(get_coll("items").find({
         "dungeon": dungeon,
         "room": room,
         "category": category,
@@ -1066,7 +1066,7 @@ def search(*, query: str, dungeon: Optional[str] = None, tags_any: Optional[List
         filter_query["dungeon"] = dungeon
     
     # Search items
-    all_items = list(db().items.find(filter_query))
+    all_items = list(get_coll("items").find(filter_query))
     
     for item in all_items:
         # Text search
@@ -1107,7 +1107,7 @@ def stat(*, dungeon: str, room: Optional[str] = None, category: Optional[str] =
             started=t0
         )
     # Check dungeon exists
-    dungeon_doc = db().dungeons.find_one({"name": dungeon, "user_id": user_id, "deleted": False})
+    dungeon_doc = get_coll("dungeons").find_one({"name": dungeon, "user_id": user_id, "deleted": False})
     if not dungeon_doc:
         return make_result(
             status="error", code="ERROR_NOT_FOUND", message=f"No dungeon '{dungeon}'.",
@@ -1126,7 +1126,7 @@ def stat(*, dungeon: str, room: Optional[str] = None, category: Optional[str] =
         )
     
     # Check room exists
-    room_doc = db().rooms.find_one({"dungeon": dungeon, "name": room, "user_id": user_id, "deleted": False})
+    room_doc = get_coll("rooms").find_one({"dungeon": dungeon, "name": room, "user_id": user_id, "deleted": False})
     if not room_doc:
         return make_result(
             status="error", code="ERROR_NOT_FOUND", message=f"No room '{room}'.",
@@ -1154,7 +1154,7 @@ def stat(*, dungeon: str, room: Optional[str] = None, category: Optional[str] =
         )
     
     # Check item exists
-    item_doc = db().items.find_one({
+    item_doc = get_coll("items").find_one({
         "dungeon": dungeon,
         "room": room,
         "category": category,
@@ -1188,7 +1188,7 @@ def list_children(*, dungeon: str, room: Optional[str] = None, category: Optiona
             target={"type": "dungeon", "path": f"/{dungeon}", "name": dungeon},
             started=t0
         )
-    if not db().dungeons.find_one({"name": dungeon, "user_id": user_id, "deleted": False}):
+    if not get_coll("dungeons").find_one({"name": dungeon, "user_id": user_id, "deleted": False}):
         return make_result(
             status="error", code="ERROR_NOT_FOUND", message=f"No dungeon '{dungeon}'.",
             command={"raw": raw, "name": "list", "args": {"dungeon": dungeon, "room": room, "category": category}},
@@ -1227,7 +1227,7 @@ def export_dungeon(*, dungeon: str, user_id: Optional[str] = None, raw: str = ""
             target={"type": "dungeon", "path": f"/{dungeon}", "name": dungeon},
             started=t0
         )
-    dungeon_doc = db().dungeons.find_one({"name": dungeon, "user_id": user_id, "deleted": False})
+    dungeon_doc = get_coll("dungeons").find_one({"name": dungeon, "user_id": user_id, "deleted": False})
     if not dungeon_doc:
         return make_result(
             status="error", code="ERROR_NOT_FOUND", message=f"No dungeon '{dungeon}'.",
@@ -1237,10 +1237,10 @@ def export_dungeon(*, dungeon: str, user_id: Optional[str] = None, raw: str = ""
         )
     
     # Get all rooms
-    room_docs = list(db().rooms.find({"dungeon": dungeon, "user_id": user_id, "deleted": False}))
+    room_docs = list(get_coll("rooms").find({"dungeon": dungeon, "user_id": user_id, "deleted": False}))
     
     # Get all items
-    item_docs = list(db().items.find({"dungeon": dungeon, "user_id": user_id, "deleted": False}))
+    item_docs = list(get_coll("items").find({"dungeon": dungeon, "user_id": user_id, "deleted": False}))
     
     # Build export structure
     export_data = {
@@ -1326,7 +1326,7 @@ def import_dungeon(*, data: dict, strategy: str = "skip", user_id: Optional[str]
             started=t0
         )
     
-    coll_dungeons = db().dungeons
+    coll_dungeons = get_coll("dungeons")
     existing = coll_dungeons.find_one({"name": name, "user_id": user_id, "deleted": False})
     
     if existing:
@@ -1392,7 +1392,7 @@ def import_dungeon(*, data: dict, strategy: str = "skip", user_id: Optional[str]
             "updated_at": utcnow(),
             "deleted": room_data.get("deleted", False)
         }
-        db().rooms.insert_one(room_doc)
+        get_coll("rooms").insert_one(room_doc)
         
         # Import items
         categories_data = room_data.get("categories", {})
@@ -1412,7 +1412,7 @@ def import_dungeon(*, data: dict, strategy: str = "skip", user_id: Optional[str]
                     "updated_at": utcnow(),
                     "deleted": item_data.get("deleted", False)
                 }
-                db().items.insert_one(item_doc)
+                get_coll("items").insert_one(item_doc)
     
     # Determine import action
     import_action = "imported"
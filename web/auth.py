@@ -6,7 +6,7 @@ Handles user registration, login, and session management
 import hashlib
 from functools import wraps
 from flask import session, jsonify
-from core.db import db, utcnow
+from core.db import DURABLE, get_coll, utcnow
 
 
 def hash_password(password: str) -> str:
@@ -24,8 +24,9 @@ def create_user(username: str, password: str) -> dict:
     Create a new user account.
     
     Returns error if username already exists, otherwise returns user_id.
+    The account is written with the DURABLE write concern.
     """
-    users_coll = db().users
+    users_coll = get_coll("users").with_options(write_concern=DURABLE)
     
     # Check if user already exists
     existing = users_coll.find_one({"username": username})
@@ -49,7 +50,7 @@ def verify_user(username: str, password: str) -> dict:
     
     Returns user info if valid, error status if invalid.
     """
-    users_coll = db().users
+    users_coll = get_coll("users")
     user = users_coll.find_one({"username": username})
     
     if not user:
@@ -94,7 +95,7 @@ def require_auth(f):
 def ensure_users_index():
     """Ensure unique index on username."""
     try:
-        db().users.create_index("username", unique=True)
+        get_coll("users").create_index("username", unique=True)
     except Exception as e:
         # Index might already exist, that's okay
         pass
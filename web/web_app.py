@@ -9,21 +9,20 @@ import os
 import sys
 from flask import Flask, render_template, request, jsonify, session
 from flask_cors import CORS
-from dotenv import load_dotenv
 
 # Add parent directory to path
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, parent_dir)
 
-from core.db import ensure_indexes, db, utcnow
+from core.db import ensure_indexes_in_background, get_coll, load_dev_env, utcnow
 from web.auth import create_user, verify_user, get_current_user_id, get_current_username, require_auth, ensure_users_index
 from dungeon import dungeon_manager as dm
-from character.dnd_character_agent import create_agent, character_data, _generate_character_sheet
+from character.dnd_character_agent import ABILITIES, create_agent, format_modifier, new_character_data, _generate_character_sheet
 from langchain_core.messages import HumanMessage, AIMessage
 from bson import ObjectId
 import uuid
 
-load_dotenv()
+load_dev_env()
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -44,13 +43,11 @@ def setup_indexes():
     
     Creates indexes for dungeons, rooms, items, characters, and users
     to ensure uniqueness constraints and improve query performance.
+    The main collections are indexed on a background thread so the server
+    can take requests right away.
     """
-    try:
-        ensure_indexes()
-        ensure_users_index()
-        print("✓ MongoDB indexes ensured.")
-    except Exception as e:
-        print(f"⚠ Warning: Could not ensure MongoDB indexes: {e}")
+    ensure_indexes_in_background()
+    ensure_users_index()
 
 # Setup indexes when module is imported (runs on server startup)
 setup_indexes()
@@ -638,72 +635,15 @@ def get_agent_session(session_id: str, user_id: str, initial_character_data: dic
         initial_character_data: Optional existing character data to load (for editing)
     """
     if session_id not in _agent_sessions:
-        # Create a new agent executor
-        agent_executor = create_agent()
-        # Initialize character data for this session
-        # character_data is already imported at the top of the file
         if initial_character_data:
             # Use provided character data (for editing)
             session_character_data = initial_character_data.copy()
         else:
             # Initialize empty character data (for creation)
-            session_character_data = {
-                "name": None,
-                "class": None,
-                "level": 1,
-                "species": None,
-                "subspecies": None,
-                "background": None,
-                "alignment": None,
-                "experience_points": 0,
-                "ability_scores": {
-                    "Strength": None,
-                    "Dexterity": None,
-                    "Constitution": None,
-                    "Intelligence": None,
-                    "Wisdom": None,
-                    "Charisma": None
-                },
-                "ability_modifiers": {
-                    "Strength": None,
-                    "Dexterity": None,
-                    "Constitution": None,
-                    "Intelligence": None,
-                    "Wisdom": None,
-                    "Charisma": None
-                },
-                "saving_throw_proficiencies": [],
-                "skill_proficiencies": [],
-                "armor_proficiencies": [],
-                "weapon_proficiencies": [],
-                "tool_proficiencies": [],
-                "language_proficiencies": [],
-                "passive_perception": None,
-                "passive_investigation": None,
-                "passive_insight": None,
-                "armor_class": None,
-                "initiative": None,
-                "speed": None,
-                "hit_points": None,
-                "hit_dice": None,
-                "equipment": [],
-                "personality_trait": None,
-                "ideal": None,
-                "bond": None,
-                "flaw": None,
-                "background_feature": None,
-                "class_features": [],
-                "subclass": None,
-                "species_traits": [],
-                "age": None,
-                "height": None,
-                "weight": None,
-                "eyes": None,
-                "skin": None,
-                "hair": None,
-                "backstory": None,
-                "generation_method": None
-            }
+            session_character_data = new_character_data()
+        # The agent edits this session's record in place, so concurrent
+        # sessions never share character state
+        agent_executor = create_agent(character=session_character_data)
         _agent_sessions[session_id] = {
             "agent_executor": agent_executor,
             "chat_history": [],
@@ -720,7 +660,7 @@ def list_characters():
     """List all characters for the current user."""
     try:
         user_id = get_current_user_id()
-        characters = list(db().characters.find(
+        characters = list(get_coll("characters").find(
             {"user_id": user_id, "deleted": False},
             {"user_id": 0, "deleted": 0}
         ).sort("created_at", -1))
@@ -764,7 +704,7 @@ def get_character(character_id):
         except:
             return jsonify({"status": "error", "message": "Invalid character ID"}), 400
         
-        character = db().characters.find_one(
+        character = get_coll("characters").find_one(
             {"_id": obj_id, "user_id": user_id, "deleted": False},
             {"user_id": 0, "deleted": 0}
         )
@@ -792,7 +732,7 @@ def update_character(character_id):
             return jsonify({"status": "error", "message": "Invalid character ID"}), 400
         
         # Check if character exists and belongs to user
-        character = db().characters.find_one(
+        character = get_coll("characters").find_one(
             {"_id": obj_id, "user_id": user_id, "deleted": False}
         )
         
@@ -810,15 +750,7 @@ def update_character(character_id):
         char_data.update(patch)
         
         # Regenerate character sheet
-        original_character_data = character_data.copy()
-        character_data.clear()
-        character_data.update(char_data)
-        
-        try:
-            character_sheet = _generate_character_sheet()
-        finally:
-            character_data.clear()
-            character_data.update(original_character_data)
+        character_sheet = _generate_character_sheet(char_data)
         
         # Update in database
         update_doc = {
@@ -831,7 +763,7 @@ def update_character(character_id):
         if "name" in patch:
             update_doc["name"] = patch["name"]
         
-        result = db().characters.update_one(
+        result = get_coll("characters").update_one(
             {"_id": obj_id, "user_id": user_id, "deleted": False},
             {"$set": update_doc}
         )
@@ -840,7 +772,7 @@ def update_character(character_id):
             return jsonify({"status": "error", "message": "Character not found"}), 404
         
         # Fetch updated character
-        updated_character = db().characters.find_one(
+        updated_character = get_coll("characters").find_one(
             {"_id": obj_id, "user_id": user_id, "deleted": False},
             {"user_id": 0, "deleted": 0}
         )
@@ -863,7 +795,7 @@ def delete_character(character_id):
             return jsonify({"status": "error", "message": "Invalid character ID"}), 400
         
         # First verify the character exists and belongs to the user
-        character = db().characters.find_one(
+        character = get_coll("characters").find_one(
             {"_id": obj_id, "user_id": user_id, "deleted": False}
         )
         
@@ -871,7 +803,7 @@ def delete_character(character_id):
             return jsonify({"status": "error", "message": "Character not found"}), 404
         
         # Permanently delete the character from the database
-        result = db().characters.delete_one(
+        result = get_coll("characters").delete_one(
             {"_id": obj_id, "user_id": user_id}
         )
         
@@ -904,36 +836,19 @@ def agent_chat():
         # Get or create session
         session = get_agent_session(session_id, user_id)
         
-        # Temporarily set the global character_data to this session's data
-        # This is needed because the agent tools use the global character_data
-        original_character_data = character_data.copy()
-        character_data.clear()
-        character_data.update(session["character_data"])
+        # Run the agent (async executor driven to completion); its tools
+        # update session["character_data"] in place
+        output = session["agent_executor"].run(message, session["chat_history"])
         
-        try:
-            # Invoke the agent
-            response = session["agent_executor"].invoke({
-                "input": message,
-                "chat_history": session["chat_history"]
-            })
-            
-            # Update session character data
-            session["character_data"] = character_data.copy()
-            
-            # Update chat history
-            session["chat_history"].append(HumanMessage(content=message))
-            session["chat_history"].append(AIMessage(content=response['output']))
-            
-            return jsonify({
-                "status": "ok",
-                "response": response['output'],
-                "character_data": session["character_data"]
-            })
-        finally:
-            # Restore original character_data
-            character_data.clear()
-            character_data.update(original_character_data)
-            
+        # Update chat history
+        session["chat_history"].append(HumanMessage(content=message))
+        session["chat_history"].append(AIMessage(content=output))
+        
+        return jsonify({
+            "status": "ok",
+            "response": output,
+            "character_data": session["character_data"]
+        })
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -972,15 +887,7 @@ def save_character():
             return jsonify({"status": "error", "message": "Character must have a name"}), 400
         
         # Get character sheet
-        original_character_data = character_data.copy()
-        character_data.clear()
-        character_data.update(char_data)
-        
-        try:
-            character_sheet = _generate_character_sheet()
-        finally:
-            character_data.clear()
-            character_data.update(original_character_data)
+        character_sheet = _generate_character_sheet(char_data)
         
         if character_id:
             # Update existing character
@@ -990,7 +897,7 @@ def save_character():
                 return jsonify({"status": "error", "message": "Invalid character ID"}), 400
             
             # Check if character exists and belongs to user
-            existing = db().characters.find_one(
+            existing = get_coll("characters").find_one(
                 {"_id": obj_id, "user_id": user_id, "deleted": False}
             )
             
@@ -999,14 +906,14 @@ def save_character():
             
             # Check if name changed and conflicts with another character
             if char_data["name"] != existing.get("name"):
-                name_conflict = db().characters.find_one(
+                name_conflict = get_coll("characters").find_one(
                     {"user_id": user_id, "name": char_data["name"], "deleted": False, "_id": {"$ne": obj_id}}
                 )
                 if name_conflict:
                     return jsonify({"status": "error", "message": f"Character '{char_data['name']}' already exists"}), 409
             
             # Update character
-            result = db().characters.update_one(
+            result = get_coll("characters").update_one(
                 {"_id": obj_id, "user_id": user_id, "deleted": False},
                 {"$set": {
                     "name": char_data["name"],
@@ -1030,7 +937,7 @@ def save_character():
         else:
             # Create new character
             # Check if character with this name already exists
-            existing = db().characters.find_one(
+            existing = get_coll("characters").find_one(
                 {"user_id": user_id, "name": char_data["name"], "deleted": False}
             )
             
@@ -1048,7 +955,7 @@ def save_character():
                 "deleted": False
             }
             
-            result = db().characters.insert_one(character_doc)
+            result = get_coll("characters").insert_one(character_doc)
             
             # Clean up session
             del _agent_sessions[session_id]
@@ -1095,12 +1002,12 @@ def _generate_character_context_message(char_data: dict) -> str:
     scores = char_data.get("ability_scores", {})
     if any(scores.values()):
         ability_strs = []
-        for ability in ["Strength", "Dexterity", "Constitution", "Intelligence", "Wisdom", "Charisma"]:
+        for ability in ABILITIES:
             score = scores.get(ability)
             if score is not None:
                 mod = char_data.get("ability_modifiers", {}).get(ability)
                 if mod is not None:
-                    mod_str = f"+{mod}" if mod >= 0 else str(mod)
+                    mod_str = format_modifier(mod)
                     ability_strs.append(f"{ability[:3]}: {score} ({mod_str})")
         if ability_strs:
             context_parts.append(f"Ability Scores: {' '.join(ability_strs)}")
@@ -1167,7 +1074,7 @@ def start_character_edit(character_id):
             return jsonify({"status": "error", "message": "Invalid character ID"}), 400
         
         # Get character from database
-        character = db().characters.find_one(
+        character = get_coll("characters").find_one(
             {"_id": obj_id, "user_id": user_id, "deleted": False}
         )
         
@@ -1188,15 +1095,7 @@ def start_character_edit(character_id):
         session["chat_history"].append(AIMessage(content=context_message))
         
         # Generate character sheet for reference
-        original_character_data = character_data.copy()
-        character_data.clear()
-        character_data.update(char_data)
-        
-        try:
-            character_sheet = _generate_character_sheet()
-        finally:
-            character_data.clear()
-            character_data.update(original_character_data)
+        character_sheet = _generate_character_sheet(char_data)
         
         return jsonify({
             "status": "ok",